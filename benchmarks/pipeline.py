@@ -0,0 +1,309 @@
+"""
+Сквозной офлайн-бенчмарк конвейера: сбор → скачивание → обработка → публикация.
+
+Живые платформы не нужны: во временной SQLite создаются синтетические
+тематики, источники, аккаунты и расписания; исходные ролики генерируются
+локально (кадры numpy → cv2.VideoWriter), сборщик и публикатор — заглушки.
+Стадии идут через настоящие ContentManager и PublicationScheduler.
+
+По каждой стадии — wall time, CPU time (вместе с дочерними процессами ffmpeg),
+пиковый RSS процесса, для обработки — fps кодирования. Результат — JSON, который удобно сравнивать между коммитами.
+
+Запуск:
+    python -m benchmarks.pipeline --topics 2 --sources 2 --videos 3 --output bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from unittest import mock
+
+import cv2
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from config import settings
+from database import create_db_engine
+from database.migrations import run_migrations
+from database.models import (
+    Account, Base, ContentSource, PlatformType, PublicationSlot, Schedule, Topic, Video, VideoStatus
+)
+from modules.content_collector.base_collector import BaseCollector
+from modules.content_manager import ContentManager
+from modules.scheduler import PublicationScheduler
+
+
+def make_clip(path: Path, seconds: float, fps: int, width: int, height: int, seed: int) -> int:
+    """Записать синтетический ролик (движущийся градиент + шум); возвращает число кадров."""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"cv2.VideoWriter не открыл {path}")
+    frames = int(seconds * fps)
+    ramp = np.linspace(0, 255, width, dtype=np.float32)
+    try:
+        for i in range(frames):
+            row = (ramp + i * 4) % 256
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            frame[:, :, 0] = row.astype(np.uint8)
+            frame[:, :, 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+            frame[:, :, 2] = (seed * 37 + i) % 256
+            frame[::8, ::8] = rng.integers(0, 256, size=frame[::8, ::8].shape, dtype=np.uint8)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return frames
+
+
+class StubCollector(BaseCollector):
+    """Сборщик без сети: отдаёт заранее сгенерированные ролики."""
+
+    clips: List[Path] = []
+    videos_per_source: int = 3
+
+    def __init__(self, source: ContentSource, proxy: Optional[str] = None):
+        super().__init__(source)
+
+    def collect_videos(self, limit: Optional[int] = None, exclude_source_ids=None) -> List[Dict[str, Any]]:
+        count = min(limit or self.videos_per_source, self.videos_per_source)
+        results = []
+        for i in range(count):
+            clip = self.clips[(self.source.id + i) % len(self.clips)]
+            post_id = f"bench-{self.source.id}-{i}"
+            results.append({
+                "source_url": str(clip),
+                "source_post_id": post_id,
+                "source_author": "bench",
+                "title": post_id,
+                "description": "",
+                "tags": [],
+                "duration": None,
+                "video_url": str(clip),
+                "thumbnail_url": None,
+                "metadata": {"view_count": 1_000_000 + i, "likes": 50_000, "timestamp": 1_700_000_000},
+            })
+        return results
+
+    def download_video(self, video_url: str, output_path: str) -> bool:
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(video_url, output_path)
+        return True
+
+
+class StubPublisher:
+    """Публикатор без сети: всегда успешно."""
+
+    def publish(self, video: Video, description: str, tags: List[str]):
+        return True, None, {"post_id": f"bench-post-{video.id}", "url": f"https://example.invalid/{video.id}"}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS процесса, МБ (None, если платформа не даёт узнать)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux — КиБ, macOS — байты
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def _cpu_seconds() -> float:
+    """CPU процесса и его завершившихся дочерних процессов (ffmpeg), секунды."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: дочерние процессы не учитываются
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+@contextmanager
+def measure(stages: Dict[str, Dict[str, Any]], name: str) -> Iterator[Dict[str, Any]]:
+    """Замерить стадию: wall, CPU, пиковый RSS; в словарь можно дописать свои поля."""
+    result: Dict[str, Any] = {}
+    wall = time.perf_counter()
+    cpu = _cpu_seconds()
+    try:
+        yield result
+    finally:
+        result["wall_seconds"] = round(time.perf_counter() - wall, 3)
+        result["cpu_seconds"] = round(_cpu_seconds() - cpu, 3)
+        result["peak_rss_mb"] = _peak_rss_mb()
+        stages[name] = result
+
+
+def _count_frames(path: Optional[str]) -> int:
+    if not path or not Path(path).exists():
+        return 0
+    capture = cv2.VideoCapture(path)
+    try:
+        return int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def seed_database(db, topics: int, sources: int) -> None:
+    """Тематики с источниками, аккаунтом и расписанием."""
+    for t in range(topics):
+        topic = Topic(name=f"bench-{t}", brightness_adjustment=5.0, contrast_adjustment=5.0)
+        db.add(topic)
+        db.flush()
+        for s in range(sources):
+            db.add(ContentSource(
+                topic_id=topic.id, source_type="youtube_shorts", source_value=f"#bench{s}", min_views=0, min_likes=0
+            ))
+        db.add(Account(topic_id=topic.id, platform=PlatformType.PLATFORM_B, username=f"bench{t}"))
+        for hour in (9, 13, 17, 21):
+            db.add(Schedule(topic_id=topic.id, time_slot=f"{hour:02d}:00"))
+    db.commit()
+
+
+def run_pipeline(
+    topics: int,
+    sources: int,
+    videos: int,
+    clip_seconds: float,
+    fps: int,
+    width: int,
+    height: int,
+) -> Dict[str, Any]:
+    """Прогнать конвейер на свежей временной БД и вернуть метрики стадий."""
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    with tempfile.TemporaryDirectory() as tmp, ExitStack() as stack:
+        tmp_path = Path(tmp)
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        stack.enter_context(mock.patch.object(settings, "DOWNLOADS_DIR", tmp_path / "downloads", create=True))
+        stack.enter_context(mock.patch.object(settings, "PROCESSED_DIR", tmp_path / "processed", create=True))
+        for name in ("YouTubeShortsCollector", "TikTokCollector", "InstagramCollector"):
+            stack.enter_context(mock.patch(f"modules.content_manager.manager.{name}", StubCollector))
+        stack.enter_context(mock.patch.object(PublicationScheduler, "_create_publisher", lambda self, account: StubPublisher()))
+
+        with measure(stages, "generate_clips") as stage:
+            clips_dir = tmp_path / "clips"
+            clips_dir.mkdir()
+            StubCollector.clips = []
+            StubCollector.videos_per_source = videos
+            frames = 0
+            for i in range(min(4, topics * sources * videos)):
+                clip = clips_dir / f"clip{i}.mp4"
+                frames += make_clip(clip, clip_seconds, fps, width, height, seed=i)
+                StubCollector.clips.append(clip)
+            stage["clips"] = len(StubCollector.clips)
+            stage["frames"] = frames
+
+        db = Session()
+        try:
+            seed_database(db, topics, sources)
+            manager = ContentManager(db)
+
+            with measure(stages, "collect") as stage:
+                source_ids = [s.id for s in db.query(ContentSource).all()]
+                created = sum(len(manager.collect_content_from_source(sid, limit=videos)) for sid in source_ids)
+                stage["videos"] = created
+
+            video_ids = [v for (v,) in db.query(Video.id).order_by(Video.id).all()]
+
+            with measure(stages, "download") as stage:
+                ok = sum(1 for video_id in video_ids if manager.download_video(video_id))
+                stage["videos"] = ok
+                stage["failed"] = len(video_ids) - ok
+
+            with measure(stages, "process") as stage:
+                ok = sum(1 for video_id in video_ids if manager.process_video(video_id))
+                encoded_frames = sum(
+                    _count_frames(path) for (path,) in
+                    db.query(Video.processed_file_path).filter(Video.status == VideoStatus.PROCESSED).all()
+                )
+                stage["videos"] = ok
+                stage["failed"] = len(video_ids) - ok
+                stage["frames"] = encoded_frames
+
+            scheduler = PublicationScheduler(db)
+            with measure(stages, "schedule") as stage:
+                stage["slots"] = scheduler.materialize_slots()
+                # Синтетические наступившие слоты — по одному на каждое готовое видео
+                now = datetime.utcnow()
+                ready = db.query(Video.topic_id).filter(Video.status == VideoStatus.PROCESSED).all()
+                db.add_all(
+                    PublicationSlot(topic_id=topic_id, slot_time=now - timedelta(seconds=i + 1))
+                    for i, (topic_id,) in enumerate(ready)
+                )
+                db.commit()
+                published = 0
+                for slot in scheduler.claim_due_slots(now=now):
+                    published += 1 if scheduler.publish_slot(slot) else 0
+                stage["published"] = published
+        finally:
+            db.close()
+            engine.dispose()
+
+    process = stages["process"]
+    process["encoded_fps"] = (
+        round(process["frames"] / process["wall_seconds"], 1) if process["wall_seconds"] else 0.0
+    )
+    pipeline_stages = ("collect", "download", "process", "schedule")
+    return {
+        "commit": _git_commit(),
+        "params": {
+            "topics": topics, "sources_per_topic": sources, "videos_per_source": videos,
+            "clip_seconds": clip_seconds, "fps": fps, "size": f"{width}x{height}",
+        },
+        "stages": stages,
+        "total_wall_seconds": round(sum(stages[s]["wall_seconds"] for s in pipeline_stages), 3),
+        "total_cpu_seconds": round(sum(stages[s]["cpu_seconds"] for s in pipeline_stages), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сквозной офлайн-бенчмарк конвейера")
+    parser.add_argument("--topics", type=int, default=2)
+    parser.add_argument("--sources", type=int, default=2, help="источников на тематику")
+    parser.add_argument("--videos", type=int, default=3, help="видео на источник")
+    parser.add_argument("--clip-seconds", type=float, default=3.0)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--size", default="720x1280", help="ШxВ исходных роликов")
+    parser.add_argument("--output", type=Path, default=None, help="сохранить JSON в файл")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    result = run_pipeline(args.topics, args.sources, args.videos, args.clip_seconds, args.fps, width, height)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Бенчмарк конкурентной записи в SQLite: движок по умолчанию против профиля
+из database.create_db_engine (WAL, synchronous=NORMAL, busy_timeout, mmap, кеш).
+
+Несколько потоков-писателей (как Celery-воркеры) вставляют и обновляют видео,
+параллельно потоки-читатели (как Telegram-бот) считают статусы.
+
+Запуск:
+    python -m benchmarks.sqlite_concurrency --writers 8 --readers 2 --ops 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import create_db_engine
+from database.models import Base, Topic, Video, VideoStatus
+
+
+def run_workload(tuned: bool, writers: int, readers: int, ops: int) -> Dict[str, Any]:
+    """Прогнать нагрузку на свежей временной БД и вернуть метрики."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_db_engine(url, tuned=tuned)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        with Session() as db:
+            db.add(Topic(name="bench"))
+            db.commit()
+
+        committed = 0
+        lock_errors = 0
+        reads = 0
+        counter_lock = threading.Lock()
+        stop_readers = threading.Event()
+
+        def writer(worker: int) -> None:
+            nonlocal committed, lock_errors
+            for i in range(ops):
+                with Session() as db:
+                    try:
+                        video = Video(
+                            topic_id=1,
+                            status=VideoStatus.FOUND,
+                            source_platform="bench",
+                            source_post_id=f"{worker}-{i}",
+                        )
+                        db.add(video)
+                        db.commit()
+                        video.status = VideoStatus.DOWNLOADED
+                        db.commit()
+                        with counter_lock:
+                            committed += 2
+                    except OperationalError:
+                        db.rollback()
+                        with counter_lock:
+                            lock_errors += 1
+
+        def reader() -> None:
+            nonlocal reads, lock_errors
+            while not stop_readers.is_set():
+                with Session() as db:
+                    try:
+                        db.query(Video.status, func.count(Video.id)).group_by(Video.status).all()
+                        with counter_lock:
+                            reads += 1
+                    except OperationalError:
+                        with counter_lock:
+                            lock_errors += 1
+
+        reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+        writer_threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+
+        started = time.perf_counter()
+        for t in reader_threads + writer_threads:
+            t.start()
+        for t in writer_threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        stop_readers.set()
+        for t in reader_threads:
+            t.join()
+        engine.dispose()
+
+    return {
+        "profile": "tuned" if tuned else "default",
+        "seconds": round(elapsed, 3),
+        "commits": committed,
+        "commits_per_sec": round(committed / elapsed, 1) if elapsed else 0.0,
+        "reads": reads,
+        "lock_errors": lock_errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Конкурентная запись в SQLite: до/после профиля")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--ops", type=int, default=200, help="вставок на писателя")
+    args = parser.parse_args()
+
+    results = [
+        run_workload(tuned, args.writers, args.readers, args.ops)
+        for tuned in (False, True)
+    ]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
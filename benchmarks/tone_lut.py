@@ -0,0 +1,92 @@
+"""
+Микробенчмарк яркости/контраста кадра: PIL (ImageEnhance) против таблиц подстановки.
+
+Для каждого варианта — среднее время на кадр и расхождение с PIL
+(максимальная и средняя абсолютная разница). Кадры — как в benchmarks.pipeline:
+градиент с шумом, плюс тёмный и светлый кадр (на них сильнее всего обрезка).
+
+Запуск:
+    python -m benchmarks.tone_lut --size 1080x1920 --brightness 5 --contrast 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from benchmarks.pipeline import _git_commit
+from modules.video_processor.tone import ToneCurve
+
+
+def pil_adjust(frame: np.ndarray, brightness: float, contrast: float) -> np.ndarray:
+    """Прежняя реализация яркости/контраста moviepy-пути (ImageEnhance)."""
+    img = Image.fromarray(frame)
+    if brightness != 0:
+        img = ImageEnhance.Brightness(img).enhance(1 + brightness / 100)
+    if contrast != 0:
+        img = ImageEnhance.Contrast(img).enhance(1 + contrast / 100)
+    return np.array(img)
+
+
+def make_frames(width: int, height: int, seed: int = 1) -> List[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+    frame[:, :, 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    frame[:, :, 2] = 128
+    frame[::8, ::8] = rng.integers(0, 256, size=frame[::8, ::8].shape, dtype=np.uint8)
+    dark = (frame // 6).astype(np.uint8)
+    bright = (255 - frame // 6).astype(np.uint8)
+    return [frame, dark, bright]
+
+
+def time_per_frame(func: Callable[[np.ndarray], np.ndarray], frames: List[np.ndarray], repeat: int) -> float:
+    func(frames[0])
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            func(frame)
+    return (time.perf_counter() - started) / (repeat * len(frames))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Яркость/контраст: PIL против LUT")
+    parser.add_argument("--size", default="1080x1920", help="ШxВ кадра")
+    parser.add_argument("--brightness", type=float, default=5.0)
+    parser.add_argument("--contrast", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    frames = make_frames(width, height)
+    curve = ToneCurve(args.brightness, args.contrast)
+    out = np.empty_like(frames[0])
+
+    variants: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+        "pil": lambda f: pil_adjust(f, args.brightness, args.contrast),
+        "lut": curve.apply,
+        "lut_preallocated": lambda f: curve.apply(f, out=out),
+    }
+    reference = [pil_adjust(f, args.brightness, args.contrast) for f in frames]
+    result: Dict[str, dict] = {}
+    for name, func in variants.items():
+        diffs = [np.abs(func(f).astype(np.int16) - ref) for f, ref in zip(frames, reference)]
+        result[name] = {
+            "ms_per_frame": round(time_per_frame(func, frames, args.repeat) * 1000, 3),
+            "max_abs_diff": int(max(d.max() for d in diffs)),
+            "mean_abs_diff": round(float(np.mean([d.mean() for d in diffs])), 5),
+        }
+    print(json.dumps({
+        "commit": _git_commit(),
+        "params": vars(args),
+        "variants": result,
+        "speedup": round(result["pil"]["ms_per_frame"] / result["lut"]["ms_per_frame"], 1),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Сравнение бэкендов VideoProcessor: moviepy и ffmpeg-filtergraph.
+
+Один синтетический ролик обрабатывается обоими бэкендами с одинаковыми
+настройками тематики. Для каждого бэкенда — wall time, CPU (вместе с дочерними
+процессами ffmpeg) и fps кодирования; для пары — расхождение кадров (PSNR и
+средняя абсолютная разница по первым кадрам).
+
+Запуск:
+    python -m benchmarks.video_backends --seconds 5 --size 1080x1920 --audio
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from benchmarks.pipeline import _cpu_seconds, _git_commit, make_clip
+from modules.video_processor import TopicProcessingSettings, VideoProcessor
+from modules.video_processor.ffmpeg_backend import find_ffmpeg, probe_media
+
+
+def add_tone(path: Path, seconds: float) -> Path:
+    """Домешать к ролику синус (AAC), чтобы проверялась и звуковая дорожка."""
+    output = path.with_name(path.stem + "_audio.mp4")
+    subprocess.run(
+        [
+            find_ffmpeg(), "-hide_banner", "-nostdin", "-y", "-loglevel", "error",
+            "-i", str(path), "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-c:v", "copy", "-c:a", "aac", "-shortest", str(output),
+        ],
+        check=True,
+    )
+    return output
+
+
+def run_backend(topic: TopicProcessingSettings, backend: str, source: Path, output: Path) -> Dict[str, Any]:
+    """Обработать ролик выбранным бэкендом и снять замеры."""
+    processor = VideoProcessor(replace(topic, processing_backend=backend))
+    wall = time.perf_counter()
+    cpu = _cpu_seconds()
+    success, error = processor._process_moviepy(str(source), str(output)) if backend == "moviepy" \
+        else processor.process_video(str(source), str(output))
+    wall = time.perf_counter() - wall
+    cpu = _cpu_seconds() - cpu
+    result: Dict[str, Any] = {
+        "success": success,
+        "error": error,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+    }
+    if success:
+        info = probe_media(str(output))
+        frames = info.duration * info.fps
+        result.update({
+            "encoded_fps": round(frames / wall, 1) if wall else None,
+            "size": f"{info.width}x{info.height}",
+            "duration": info.duration,
+            "audio_codec": info.audio_codec,
+            "bytes": output.stat().st_size,
+        })
+    return result
+
+
+def compare_outputs(first: Path, second: Path, max_frames: int) -> Optional[Dict[str, Any]]:
+    """PSNR и средняя абсолютная разница по первым max_frames кадрам."""
+    cap_a, cap_b = cv2.VideoCapture(str(first)), cv2.VideoCapture(str(second))
+    psnrs, diffs = [], []
+    try:
+        for _ in range(max_frames):
+            ok_a, frame_a = cap_a.read()
+            ok_b, frame_b = cap_b.read()
+            if not (ok_a and ok_b):
+                break
+            if frame_a.shape != frame_b.shape:
+                return {"error": f"размеры кадров различаются: {frame_a.shape} и {frame_b.shape}"}
+            psnrs.append(cv2.PSNR(frame_a, frame_b))
+            diffs.append(float(np.mean(cv2.absdiff(frame_a, frame_b))))
+    finally:
+        cap_a.release()
+        cap_b.release()
+    if not psnrs:
+        return None
+    return {
+        "frames": len(psnrs),
+        "psnr_mean": round(float(np.mean(psnrs)), 2),
+        "psnr_min": round(float(np.min(psnrs)), 2),
+        "mean_abs_diff": round(float(np.mean(diffs)), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов обработки видео")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--size", default="720x1280", help="ШxВ исходного ролика")
+    parser.add_argument("--audio", action="store_true", help="добавить звуковую дорожку")
+    parser.add_argument("--speed", type=float, default=0.0, help="video_speed_change, %%")
+    parser.add_argument("--brightness", type=float, default=5.0)
+    parser.add_argument("--contrast", type=float, default=5.0)
+    parser.add_argument("--crop", default=None, help="x,y,ширина,высота")
+    parser.add_argument("--logo", default=None, help="PNG логотипа (по умолчанию — текстовая плашка)")
+    parser.add_argument("--no-branding", action="store_true")
+    parser.add_argument("--compare-frames", type=int, default=60)
+    parser.add_argument("--output", type=Path, default=None, help="сохранить JSON в файл")
+    args = parser.parse_args()
+
+    if not find_ffmpeg():
+        raise SystemExit("ffmpeg не найден (FFMPEG_BINARY, PATH или imageio-ffmpeg)")
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    crop = None
+    if args.crop:
+        x, y, w, h = (int(v) for v in args.crop.split(","))
+        crop = {"x": x, "y": y, "width": w, "height": h}
+    topic = TopicProcessingSettings(
+        id=0,
+        name="bench",
+        video_speed_change=args.speed,
+        brightness_adjustment=args.brightness,
+        contrast_adjustment=args.contrast,
+        crop_settings=crop,
+        branding_enabled=not args.no_branding,
+        branding_logo_path=args.logo,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        source = tmp_path / "source.mp4"
+        make_clip(source, args.seconds, args.fps, width, height, seed=1)
+        if args.audio:
+            source = add_tone(source, args.seconds)
+
+        outputs = {name: tmp_path / f"{name}.mp4" for name in ("moviepy", "ffmpeg")}
+        backends = {name: run_backend(topic, name, source, path) for name, path in outputs.items()}
+        parity = None
+        if all(result["success"] for result in backends.values()):
+            parity = compare_outputs(outputs["moviepy"], outputs["ffmpeg"], args.compare_frames)
+
+    speedup = None
+    if all(result["success"] for result in backends.values()) and backends["ffmpeg"]["wall_seconds"]:
+        speedup = round(backends["moviepy"]["wall_seconds"] / backends["ffmpeg"]["wall_seconds"], 2)
+
+    result = {
+        "commit": _git_commit(),
+        "params": {
+            "seconds": args.seconds, "fps": args.fps, "size": args.size, "audio": args.audio,
+            "speed": args.speed, "brightness": args.brightness, "contrast": args.contrast,
+            "crop": args.crop, "branding": "none" if args.no_branding else ("logo" if args.logo else "text"),
+        },
+        "backends": backends,
+        "speedup": speedup,
+        "parity": parity,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
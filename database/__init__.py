@@ -1,21 +1,90 @@
 """Модуль базы данных."""
 from .models import (
     Base, Topic, Account, ContentSource, Video, 
-    Publication, Schedule, DailyReport,
+    Publication, Schedule, DailyReport, SchemaMigration, VideoStatusCounter,
     VideoStatus, PlatformType
 )
-from sqlalchemy import create_engine
+# Импорт регистрирует слушатель сессии, поддерживающий счётчики статусов
+from .counters import get_status_counts, reconcile_status_counters
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
 from config import settings
-from typing import Generator
+from typing import Any, Dict, Generator
 
-# Создаем движок БД
-# Для SQLite добавляем connect_args для поддержки внешних ключей
-connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
 
-engine = create_engine(settings.DATABASE_URL, echo=False, connect_args=connect_args)
+def _is_sqlite_memory(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def _sqlite_pragmas() -> Dict[str, Any]:
+    """PRAGMA, выполняемые на каждом новом соединении SQLite."""
+    cache_size_kb = int(getattr(settings, "SQLITE_CACHE_SIZE_KB", 65536))
+    return {
+        # WAL: читатели не блокируют писателя, бот/Celery/скрипты работают параллельно
+        "journal_mode": "WAL",
+        # В режиме WAL NORMAL безопасен при падении процесса и в разы быстрее FULL
+        "synchronous": "NORMAL",
+        "busy_timeout": int(getattr(settings, "SQLITE_BUSY_TIMEOUT_MS", 30000)),
+        "mmap_size": int(getattr(settings, "SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        # Отрицательное значение — размер в КиБ, а не в страницах
+        "cache_size": -cache_size_kb,
+        "temp_store": "MEMORY",
+    }
+
+
+def create_db_engine(url: str, tuned: bool = True) -> Engine:
+    """
+    Создать движок БД с профилем под конкурентную работу.
+
+    SQLite: WAL, synchronous=NORMAL, busy_timeout, mmap и кеш страниц на каждом
+    соединении. PostgreSQL и др.: размер пула из настроек (DB_POOL_SIZE,
+    DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE) и pre-ping.
+
+    Args:
+        url: URL базы данных
+        tuned: False — движок как раньше, без профиля (для сравнения в бенчмарке)
+    """
+    if url.startswith("sqlite"):
+        # Для SQLite соединения используются из разных потоков (бот, планировщик)
+        connect_args: Dict[str, Any] = {"check_same_thread": False}
+        if not tuned:
+            return create_engine(url, echo=False, connect_args=connect_args)
+
+        pragmas = _sqlite_pragmas()
+        connect_args["timeout"] = pragmas["busy_timeout"] / 1000
+        engine = create_engine(url, echo=False, connect_args=connect_args)
+        if _is_sqlite_memory(url):
+            pragmas.pop("journal_mode")
+            pragmas.pop("mmap_size")
+
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+
+        return engine
+
+    if not tuned:
+        return create_engine(url, echo=False)
+
+    return create_engine(
+        url,
+        echo=False,
+        pool_size=int(getattr(settings, "DB_POOL_SIZE", 10)),
+        max_overflow=int(getattr(settings, "DB_MAX_OVERFLOW", 20)),
+        pool_timeout=int(getattr(settings, "DB_POOL_TIMEOUT", 30)),
+        pool_recycle=int(getattr(settings, "DB_POOL_RECYCLE", 1800)),
+        pool_pre_ping=True,
+    )
+
+
+# Создаем движок БД
+engine = create_db_engine(settings.DATABASE_URL)
 
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -31,5 +100,8 @@ def get_db() -> Generator[Session, None, None]:
 
 
 def init_db():
-    """Инициализировать базу данных (создать таблицы)."""
+    """Инициализировать базу данных (создать таблицы и применить миграции)."""
+    from .migrations import run_migrations
+    
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -0,0 +1,124 @@
+"""Перенос завершённых видео из горячих таблиц в архив.
+
+Видео в конечных статусах (PUBLISHED, ERROR, BLOCKED), не менявшиеся дольше
+заданного срока, переносятся в ``videos_archive`` вместе со своими публикациями
+(``publications_archive``). Ключ источника остаётся в ``archived_source_keys``,
+чтобы дедупликация по source_post_id продолжала видеть архивные ролики.
+Счётчики статусов (video_status_counters) уменьшаются в той же транзакции:
+они показывают только горячую таблицу, то есть текущую очередь.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from .counters import apply_status_deltas
+from .sql import dialect_insert
+from .models import (
+    Video, VideoStatus, Publication, VideoArchive, PublicationArchive, ArchivedSourceKey
+)
+
+TERMINAL_STATUSES = (VideoStatus.PUBLISHED, VideoStatus.ERROR, VideoStatus.BLOCKED)
+
+# Аренда (lease_*) — рабочее состояние горячей таблицы, в архив не переносится
+_VIDEO_COLUMNS = [c.name for c in Video.__table__.columns if c.name in VideoArchive.__table__.c]
+_PUBLICATION_COLUMNS = [c.name for c in Publication.__table__.columns]
+
+
+def _insert_ignore(table, dialect_name: str):
+    """INSERT, пропускающий конфликты уникальности (если диалект умеет)."""
+    insert_func = dialect_insert(dialect_name)
+    if insert_func is None:
+        return insert(table)
+    return insert_func(table).on_conflict_do_nothing()
+
+
+def _archive_batch(db: Session, video_ids: List[int], now: datetime) -> int:
+    """Перенести пачку видео и их публикаций; возвращает число публикаций."""
+    conn = db.connection()
+    videos = Video.__table__
+    publications = Publication.__table__
+
+    conn.execute(insert(VideoArchive.__table__).from_select(
+        _VIDEO_COLUMNS + ["archived_at"],
+        select(*[videos.c[name] for name in _VIDEO_COLUMNS], literal(now))
+        .where(videos.c.id.in_(video_ids)),
+    ))
+    result = conn.execute(insert(PublicationArchive.__table__).from_select(
+        _PUBLICATION_COLUMNS + ["archived_at"],
+        select(*[publications.c[name] for name in _PUBLICATION_COLUMNS], literal(now))
+        .where(publications.c.video_id.in_(video_ids)),
+    ))
+    conn.execute(_insert_ignore(ArchivedSourceKey.__table__, conn.dialect.name).from_select(
+        ["topic_id", "source_post_id", "source_platform"],
+        select(videos.c.topic_id, videos.c.source_post_id, videos.c.source_platform)
+        .where(videos.c.id.in_(video_ids), videos.c.source_post_id.isnot(None)),
+    ))
+    moved = conn.execute(
+        select(videos.c.topic_id, videos.c.status, func.count())
+        .where(videos.c.id.in_(video_ids))
+        .group_by(videos.c.topic_id, videos.c.status)
+    ).all()
+    conn.execute(delete(publications).where(publications.c.video_id.in_(video_ids)))
+    conn.execute(delete(videos).where(videos.c.id.in_(video_ids)))
+    # Удаление выражением идёт мимо flush — счётчики уменьшаем явно
+    apply_status_deltas(conn, {(topic_id, status): -n for topic_id, status, n in moved})
+    return result.rowcount or 0
+
+
+def archive_finished_videos(
+    db: Session,
+    older_than: Optional[timedelta] = None,
+    batch_size: int = 500,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Перенести завершённые видео старше срока в архив.
+
+    Каждая пачка переносится в отдельной транзакции, так что прерванный запуск
+    безопасно продолжить.
+
+    Args:
+        db: Сессия БД
+        older_than: Минимальный возраст по updated_at (по умолчанию
+            ARCHIVE_AFTER_DAYS из настроек, 60 дней — больше окна обновления метрик)
+        batch_size: Видео в одной транзакции
+        now: Текущее время (UTC)
+
+    Returns:
+        {"videos": перенесено видео, "publications": перенесено публикаций}
+    """
+    now = now or datetime.utcnow()
+    if older_than is None:
+        older_than = timedelta(days=int(getattr(settings, "ARCHIVE_AFTER_DAYS", 60)))
+    cutoff = now - older_than
+
+    moved_videos = 0
+    moved_publications = 0
+    while True:
+        video_ids = db.execute(
+            select(Video.id).where(
+                Video.status.in_(TERMINAL_STATUSES),
+                Video.updated_at < cutoff,
+            ).order_by(Video.id).limit(batch_size)
+        ).scalars().all()
+        if not video_ids:
+            break
+        try:
+            moved_publications += _archive_batch(db, video_ids, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        moved_videos += len(video_ids)
+
+    # Объекты перенесённых видео в этой сессии больше не существуют
+    db.expire_all()
+    if moved_videos:
+        logger.info(f"В архив перенесено видео: {moved_videos}, публикаций: {moved_publications}")
+    return {"videos": moved_videos, "publications": moved_publications}
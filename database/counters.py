@@ -0,0 +1,185 @@
+"""Счётчики видео по (тематика, статус).
+
+Счётчики меняются в той же транзакции, что и сами видео: слушатель ``after_flush``
+считает дельты по новым, удалённым и сменившим статус объектам Video и применяет
+их одним UPSERT. Массовые операции в обход ORM (INSERT/UPDATE выражениями)
+должны вызывать :func:`apply_status_deltas` сами. :func:`reconcile_status_counters`
+пересобирает таблицу из ``videos`` — на случай ручных правок БД.
+Счётчики описывают только горячую таблицу (текущую очередь): архивация
+(database/archive.py) вычитает перенесённые видео.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .models import Video, VideoStatus, VideoStatusCounter
+from .sql import dialect_insert
+
+StatusKey = Tuple[int, VideoStatus]
+
+_counters = VideoStatusCounter.__table__
+
+# Движки, в БД которых уже есть таблица счётчиков (до миграции 003 слушатель молчит)
+_ready_engines: set[int] = set()
+
+
+def apply_status_deltas(conn: Connection, deltas: Dict[StatusKey, int]) -> None:
+    """
+    Атомарно прибавить дельты к счётчикам (в текущей транзакции conn).
+
+    Args:
+        conn: Соединение (для сессии — ``session.connection()``)
+        deltas: {(topic_id, status): изменение}
+    """
+    rows = [
+        {"topic_id": topic_id, "status": status, "count": delta}
+        for (topic_id, status), delta in deltas.items()
+        if delta and topic_id is not None and status is not None
+    ]
+    if not rows:
+        return
+
+    upsert = dialect_insert(conn.dialect.name)
+    if upsert is not None:
+        stmt = upsert(_counters)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[_counters.c.topic_id, _counters.c.status],
+            set_={"count": _counters.c.count + stmt.excluded.count},
+        )
+        conn.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = conn.execute(
+            update(_counters)
+            .where(_counters.c.topic_id == row["topic_id"], _counters.c.status == row["status"])
+            .values(count=_counters.c.count + row["count"])
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(_counters).values(**row))
+
+
+def count_inserted(videos: Iterable[Video]) -> Dict[StatusKey, int]:
+    """Дельты для пачки только что вставленных видео."""
+    return Counter((v.topic_id, v.status or VideoStatus.FOUND) for v in videos)
+
+
+def _counters_table_ready(conn: Connection) -> bool:
+    key = id(conn.engine)
+    if key in _ready_engines:
+        return True
+    if inspect(conn).has_table(_counters.name):
+        _ready_engines.add(key)
+        return True
+    logger.warning("Таблица video_status_counters не найдена — запустите scripts/init_database.py")
+    return False
+
+
+def _first(values, default):
+    return values[0] if values else default
+
+
+def _collect_flush_deltas(session: Session) -> Counter:
+    deltas: Counter = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Video):
+            deltas[(obj.topic_id, obj.status or VideoStatus.FOUND)] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Video):
+            state = inspect(obj)
+            topic_id = _first(state.attrs.topic_id.history.deleted, obj.topic_id)
+            status = _first(state.attrs.status.history.deleted, obj.status)
+            deltas[(topic_id, status)] -= 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, Video) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        status_hist = state.attrs.status.history
+        topic_hist = state.attrs.topic_id.history
+        if not status_hist.has_changes() and not topic_hist.has_changes():
+            continue
+        old_key = (
+            _first(topic_hist.deleted, obj.topic_id),
+            _first(status_hist.deleted, obj.status),
+        )
+        new_key = (obj.topic_id, obj.status)
+        if old_key != new_key:
+            deltas[old_key] -= 1
+            deltas[new_key] += 1
+
+    return deltas
+
+
+# active_history: при присвоении статуса у истёкшего после commit объекта
+# старое значение подгружается из БД, иначе дельту не посчитать
+@event.listens_for(Video.status, "set", active_history=True)
+@event.listens_for(Video.topic_id, "set", active_history=True)
+def _track_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+@event.listens_for(Session, "after_flush")
+def _update_counters_after_flush(session: Session, flush_context) -> None:
+    deltas = _collect_flush_deltas(session)
+    if deltas:
+        conn = session.connection()
+        if _counters_table_ready(conn):
+            apply_status_deltas(conn, deltas)
+
+
+def reconcile_status_counters(db: Session) -> int:
+    """
+    Пересобрать счётчики из таблицы videos (архив не считается).
+
+    Returns:
+        Количество строк счётчиков после пересборки
+    """
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        # Не даём параллельным транзакциям менять счётчики во время пересборки
+        conn.exec_driver_sql("LOCK TABLE video_status_counters IN EXCLUSIVE MODE")
+    conn.execute(_counters.delete())
+    conn.execute(_counters.insert().from_select(
+        ["topic_id", "status", "count"],
+        select(Video.topic_id, Video.status, func.count())
+        .where(Video.status.isnot(None))
+        .group_by(Video.topic_id, Video.status),
+    ))
+    db.commit()
+    total = db.query(func.count()).select_from(_counters).scalar() or 0
+    logger.info(f"Счётчики статусов видео пересобраны: {total} строк")
+    return total
+
+
+def get_status_counts(db: Session, topic_id: Optional[int] = None) -> Dict[StatusKey, int]:
+    """
+    Прочитать счётчики одним запросом.
+
+    Args:
+        db: Сессия БД
+        topic_id: Только для этой тематики (по умолчанию — все)
+
+    Returns:
+        {(topic_id, status): количество}
+    """
+    query = db.query(VideoStatusCounter.topic_id, VideoStatusCounter.status, VideoStatusCounter.count)
+    if topic_id is not None:
+        query = query.filter(VideoStatusCounter.topic_id == topic_id)
+    return {(t, s): n for t, s, n in query.all()}
+
+
+def totals_by_status(counts: Dict[StatusKey, int]) -> Counter:
+    """Свернуть счётчики по всем тематикам: {status: количество}."""
+    totals: Counter = Counter()
+    for (_, status), n in counts.items():
+        totals[status] += n
+    return totals
@@ -0,0 +1,63 @@
+"""Журнал событий жизненного цикла видео (таблица video_events)."""
+from __future__ import annotations
+
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from .models import Video, VideoEvent, VideoStatus
+
+
+def get_worker_id() -> str:
+    """Идентификатор текущего воркера: WORKER_ID из окружения или host:pid."""
+    return os.environ.get("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def file_size(path: Optional[str]) -> Optional[int]:
+    """Размер файла в байтах или None, если файла нет."""
+    if not path:
+        return None
+    try:
+        return Path(path).stat().st_size
+    except OSError:
+        return None
+
+
+def record_video_event(
+    db: Session,
+    video: Video,
+    stage: str,
+    from_status: Optional[VideoStatus],
+    started: Optional[float] = None,
+    bytes_touched: Optional[int] = None,
+    error_message: Optional[str] = None,
+) -> VideoEvent:
+    """
+    Добавить событие в сессию (фиксируется тем же commit, что и переход статуса).
+
+    Args:
+        db: Сессия БД
+        video: Видео (to_status берётся из текущего video.status)
+        stage: Стадия: download, process, publish
+        from_status: Статус до перехода
+        started: Значение time.perf_counter() в начале стадии
+        bytes_touched: Сколько байт прочитано/записано стадией
+        error_message: Текст ошибки, если стадия не удалась
+    """
+    event = VideoEvent(
+        video_id=video.id,
+        topic_id=video.topic_id,
+        stage=stage,
+        from_status=from_status,
+        to_status=video.status,
+        worker_id=get_worker_id(),
+        duration=(time.perf_counter() - started) if started is not None else None,
+        bytes_touched=bytes_touched,
+        error_message=error_message,
+    )
+    db.add(event)
+    return event
@@ -0,0 +1,237 @@
+"""Аренда видео воркерами.
+
+Воркер захватывает видео одним атомарным UPDATE: строка в нужном статусе без
+действующей аренды получает ``lease_owner`` (см. :func:`get_worker_id`) и
+``lease_expires``. На PostgreSQL кандидаты выбираются с ``FOR UPDATE SKIP LOCKED``,
+так что параллельные воркеры не ждут друг друга; на SQLite запись и так
+сериализована. Пока стадия идёт, :func:`lease_heartbeat` продлевает аренду из
+фонового потока; упавший воркер её не продлит — :func:`reap_expired_leases`
+вернёт такие видео в очередь.
+"""
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from loguru import logger
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from .counters import apply_status_deltas
+from .events import get_worker_id
+from .models import Video, VideoStatus
+
+# Статус, в который возвращается видео с просроченной арендой
+_REQUEUE_STATUS = {VideoStatus.PROCESSING: VideoStatus.DOWNLOADED}
+
+
+def lease_seconds(stage: str, duration: Optional[float] = None) -> int:
+    """
+    Срок аренды для стадии: DOWNLOAD_LEASE_SECONDS / PROCESS_LEASE_SECONDS.
+
+    Для обработки срок не меньше длительности клипа, умноженной на
+    PROCESS_LEASE_PER_CLIP_SECOND (по умолчанию 30 секунд на секунду видео).
+    """
+    if stage == "download":
+        return int(getattr(settings, "DOWNLOAD_LEASE_SECONDS", 15 * 60))
+    base = int(getattr(settings, "PROCESS_LEASE_SECONDS", 60 * 60))
+    if duration:
+        per_second = float(getattr(settings, "PROCESS_LEASE_PER_CLIP_SECOND", 30))
+        return max(base, int(duration * per_second))
+    return base
+
+
+def extend_lease(
+    db: Session,
+    video_id: int,
+    lease_for: int,
+    worker_id: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> bool:
+    """
+    Продлить аренду видео, если она всё ещё наша.
+
+    Пишет своим соединением и сразу коммитит, сессию db не трогает — поэтому
+    безопасно вызывать из другого потока. updated_at не меняется.
+
+    Returns:
+        False, если аренду сняли или перехватили
+    """
+    now = now or datetime.utcnow()
+    with db.get_bind().connect() as conn:
+        result = conn.execute(
+            update(Video)
+            .where(Video.id == video_id, Video.lease_owner == (worker_id or get_worker_id()))
+            .values(lease_expires=now + timedelta(seconds=lease_for), updated_at=Video.updated_at)
+        )
+        conn.commit()
+    return bool(result.rowcount)
+
+
+@contextmanager
+def lease_heartbeat(db: Session, video_id: int, lease_for: int) -> Iterator[None]:
+    """
+    Продлевать аренду видео, пока выполняется тело with.
+
+    Фоновый поток каждые lease_for / 3 секунд сдвигает lease_expires на lease_for
+    вперёд, так что долгое кодирование не уходит в reap_expired_leases, а упавший
+    воркер теряет аренду не позже чем через lease_for.
+    """
+    worker_id = get_worker_id()
+    stop = threading.Event()
+
+    def beat() -> None:
+        while not stop.wait(max(1.0, lease_for / 3)):
+            try:
+                if not extend_lease(db, video_id, lease_for, worker_id=worker_id) and not stop.is_set():
+                    logger.warning(f"Аренда видео {video_id} потеряна, продление остановлено")
+                    return
+            except Exception as e:
+                logger.warning(f"Не удалось продлить аренду видео {video_id}: {e}")
+
+    thread = threading.Thread(target=beat, name=f"lease-{video_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        # Не ждём бесконечно: продление, вставшее за блокировкой строки, после
+        # коммита вызывающего не найдёт нашей аренды и ничего не изменит
+        thread.join(timeout=5)
+
+
+def claim_videos(
+    db: Session,
+    status: VideoStatus,
+    lease_for: int,
+    video_ids: Optional[Iterable[int]] = None,
+    limit: int = 1,
+    set_status: Optional[VideoStatus] = None,
+    worker_id: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> List[int]:
+    """
+    Атомарно взять в аренду свободные видео в статусе status.
+
+    Коммит остаётся за вызывающим: до коммита аренду не видят другие воркеры.
+
+    Args:
+        db: Сессия БД
+        status: Статус, из которого берём
+        lease_for: Срок аренды, секунды
+        video_ids: Только эти видео (иначе — самые давно не менявшиеся)
+        limit: Максимум видео за раз (без video_ids)
+        set_status: Новый статус захваченных видео (по умолчанию не меняется)
+        worker_id: Владелец аренды (по умолчанию текущий воркер)
+        now: Текущее время (UTC)
+
+    Returns:
+        ID захваченных видео
+    """
+    now = now or datetime.utcnow()
+    free = and_(
+        Video.status == status,
+        or_(Video.lease_expires.is_(None), Video.lease_expires < now),
+    )
+
+    candidates = select(Video.id).where(free)
+    if video_ids is not None:
+        video_ids = list(video_ids)
+        if not video_ids:
+            return []
+        candidates = candidates.where(Video.id.in_(video_ids))
+    else:
+        candidates = candidates.order_by(Video.updated_at.asc()).limit(limit)
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    values = {"lease_owner": worker_id or get_worker_id(), "lease_expires": now + timedelta(seconds=lease_for)}
+    if set_status is not None:
+        values["status"] = set_status
+
+    # Условие free повторяется снаружи: без SKIP LOCKED подзапрос не защищает от гонки
+    rows = db.execute(
+        update(Video)
+        .where(Video.id.in_(candidates.scalar_subquery()), free)
+        .values(**values)
+        .returning(Video.id, Video.topic_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    if set_status is not None and set_status != status and rows:
+        deltas: Counter = Counter()
+        for _, topic_id in rows:
+            deltas[(topic_id, status)] -= 1
+            deltas[(topic_id, set_status)] += 1
+        apply_status_deltas(db.connection(), deltas)
+
+    claimed = [row.id for row in rows]
+    # Объекты этих видео, уже загруженные в сессию, устарели
+    for video in list(db.identity_map.values()):
+        if isinstance(video, Video) and video.id in claimed:
+            db.expire(video)
+    return claimed
+
+
+def release_lease(video: Video) -> None:
+    """Снять аренду (фиксируется тем же commit, что и результат стадии)."""
+    video.lease_owner = None
+    video.lease_expires = None
+
+
+def reap_expired_leases(db: Session, now: Optional[datetime] = None) -> Dict[VideoStatus, List[int]]:
+    """
+    Вернуть в очередь видео, чья аренда истекла (воркер упал или завис).
+
+    PROCESSING возвращается в DOWNLOADED; у остальных статусов аренда просто
+    снимается. PROCESSING без аренды (зависшие до появления аренд) считается
+    просроченным, если не менялось дольше PROCESS_LEASE_SECONDS.
+
+    Returns:
+        {статус после возврата: [id видео]}
+    """
+    now = now or datetime.utcnow()
+    stale_before = now - timedelta(seconds=lease_seconds("process"))
+    expired = or_(
+        Video.lease_expires < now,
+        and_(
+            Video.status == VideoStatus.PROCESSING,
+            Video.lease_expires.is_(None),
+            Video.updated_at < stale_before,
+        ),
+    )
+
+    rows = db.execute(
+        select(Video.id, Video.topic_id, Video.status).where(expired)
+    ).all()
+    if not rows:
+        return {}
+
+    requeued: Dict[VideoStatus, List[int]] = {}
+    deltas: Counter = Counter()
+    for video_id, topic_id, status in rows:
+        new_status = _REQUEUE_STATUS.get(status, status)
+        values = {"lease_owner": None, "lease_expires": None, "status": new_status}
+        result = db.execute(
+            update(Video)
+            .where(Video.id == video_id, Video.status == status, expired)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            continue
+        requeued.setdefault(new_status, []).append(video_id)
+        if new_status != status:
+            deltas[(topic_id, status)] -= 1
+            deltas[(topic_id, new_status)] += 1
+    apply_status_deltas(db.connection(), deltas)
+    db.commit()
+
+    total = sum(len(ids) for ids in requeued.values())
+    if total:
+        logger.warning(f"Сняты просроченные аренды видео: {total}")
+    return requeued
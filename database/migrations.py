@@ -0,0 +1,455 @@
+"""Версионированные миграции схемы БД.
+
+Каждая миграция — функция ``(conn) -> None``, выполняемая в отдельной транзакции.
+Номер применённой миграции записывается в ``schema_migrations``, поэтому повторный
+запуск ничего не делает. Миграции идемпотентны (``checkfirst``), так что на свежей
+базе, созданной через ``create_all``, они просто отмечаются как применённые.
+Работают и на SQLite, и на PostgreSQL.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from loguru import logger
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .source_metrics import source_metric_columns
+from .models import (
+    new_trace_id, SchemaMigration, Topic, ContentSource, Video, Publication, DailyReport, VideoStatusCounter,
+    VideoEvent, VideoArchive, PublicationArchive, ArchivedSourceKey, PublicationSlot, CollectionRun
+)
+
+MigrationFunc = Callable[[Connection], None]
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Снимок modules.content_manager.source_platform на момент миграции 012:
+# миграции не зависят от кода приложения, который может меняться.
+_URL_PLATFORMS = (
+    ("instagram.com", "instagram"),
+    ("tiktok.com", "tiktok"),
+    ("youtube.com", "youtube"),
+    ("youtu.be", "youtube"),
+)
+_SOURCE_TYPE_PLATFORMS = {
+    "profile": "instagram",
+    "hashtag": "instagram",
+    "reels": "instagram",
+    "url_list": "instagram",
+    "keywords": "instagram",
+    "youtube_shorts": "youtube",
+    "tiktok": "tiktok",
+}
+
+
+def _ensure_indexes(conn: Connection, table, names: List[str]) -> None:
+    """Создать индексы модели по именам, если их ещё нет."""
+    wanted = {index.name: index for index in table.indexes}
+    for name in names:
+        wanted[name].create(conn, checkfirst=True)
+
+
+def _ensure_columns(conn: Connection, table, names: List[str]) -> None:
+    """Добавить колонки модели через ALTER TABLE, если их ещё нет."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+
+
+def _backfill_source_metrics(conn: Connection, table) -> None:
+    """Заполнить source_* из metadata_json пачками по id."""
+    last_id = 0
+    filled = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.metadata_json)
+            .where(
+                table.c.id > last_id,
+                table.c.metadata_json.isnot(None),
+                table.c.source_views.is_(None),
+                table.c.source_likes.is_(None),
+                table.c.source_published_at.is_(None),
+            )
+            .order_by(table.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            values = source_metric_columns(row.metadata_json if isinstance(row.metadata_json, dict) else None)
+            if any(value is not None for value in values.values()):
+                updates.append({"row_id": row.id, **values})
+        if updates:
+            conn.execute(
+                table.update()
+                .where(table.c.id == bindparam("row_id"))
+                .values(
+                    source_views=bindparam("source_views"),
+                    source_likes=bindparam("source_likes"),
+                    source_published_at=bindparam("source_published_at"),
+                ),
+                updates,
+            )
+            filled += len(updates)
+    if filled:
+        logger.info(f"{table.name}: метрики источника заполнены из metadata_json для {filled} строк")
+
+
+def _backfill_trace_ids(conn: Connection, table) -> None:
+    """Выдать trace_id строкам без него, пачками по id."""
+    last_id = 0
+    filled = 0
+    while True:
+        ids = conn.execute(
+            select(table.c.id)
+            .where(table.c.id > last_id, table.c.trace_id.is_(None))
+            .order_by(table.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+        conn.execute(
+            table.update().where(table.c.id == bindparam("row_id")).values(trace_id=bindparam("trace_id")),
+            [{"row_id": row_id, "trace_id": new_trace_id()} for row_id in ids],
+        )
+        filled += len(ids)
+    if filled:
+        logger.info(f"{table.name}: trace_id выдан {filled} строкам")
+
+
+def _dedupe_video_source_keys(conn: Connection) -> None:
+    """
+    Развести дубли (topic_id, source_post_id, source_platform) перед уникальным индексом.
+
+    Строки не удаляем (на них могут ссылаться публикации): у всех дублей, кроме
+    самого раннего, к source_post_id дописывается ":dup:<id>".
+    """
+    rows = conn.execute(text(
+        "SELECT v.id FROM videos v "
+        "JOIN ("
+        "  SELECT topic_id, source_post_id, source_platform, MIN(id) AS keep_id "
+        "  FROM videos WHERE source_post_id IS NOT NULL "
+        "  GROUP BY topic_id, source_post_id, source_platform HAVING COUNT(*) > 1"
+        ") d ON v.topic_id = d.topic_id AND v.source_post_id = d.source_post_id "
+        "AND (v.source_platform = d.source_platform "
+        "     OR (v.source_platform IS NULL AND d.source_platform IS NULL)) "
+        "WHERE v.id <> d.keep_id"
+    )).scalars().all()
+    if not rows:
+        return
+    logger.warning(f"Найдено дублей видео по source_post_id: {len(rows)} — помечаю суффиксом :dup:<id>")
+    for video_id in rows:
+        conn.execute(
+            text(
+                "UPDATE videos SET source_post_id = source_post_id || :suffix WHERE id = :id"
+            ),
+            {"suffix": f":dup:{video_id}", "id": video_id},
+        )
+
+
+def _topic_platforms(conn: Connection) -> dict[int, str]:
+    """Платформа тематики, если все её источники с одной платформы."""
+    platforms: dict[int, set] = {}
+    for topic_id, source_type in conn.execute(
+        select(ContentSource.__table__.c.topic_id, ContentSource.__table__.c.source_type)
+    ):
+        platforms.setdefault(topic_id, set()).add(_SOURCE_TYPE_PLATFORMS.get(source_type))
+    return {
+        topic_id: next(iter(found))
+        for topic_id, found in platforms.items()
+        if len(found) == 1 and None not in found
+    }
+
+
+def _guess_platform(source_url: str | None, topic_id: int, topic_platforms: dict[int, str]) -> str:
+    url = (source_url or "").lower()
+    for marker, platform in _URL_PLATFORMS:
+        if marker in url:
+            return platform
+    return topic_platforms.get(topic_id, "")
+
+
+def _backfill_source_platform(conn: Connection, table, topic_platforms: dict[int, str]) -> int:
+    """Заполнить NULL в source_platform по source_url или источникам тематики ("" — не определить)."""
+    has_url = "source_url" in table.c
+    filled = 0
+    while True:
+        columns = [table.c.id, table.c.topic_id] + ([table.c.source_url] if has_url else [])
+        rows = conn.execute(
+            select(*columns)
+            .where(table.c.source_platform.is_(None))
+            .order_by(table.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            table.update().where(table.c.id == bindparam("row_id")).values(source_platform=bindparam("platform")),
+            [
+                {
+                    "row_id": row.id,
+                    "platform": _guess_platform(row.source_url if has_url else None, row.topic_id, topic_platforms),
+                }
+                for row in rows
+            ],
+        )
+        filled += len(rows)
+    return filled
+
+
+def _archived_key_platforms(conn: Connection, topic_platforms: dict[int, str]) -> int:
+    """Платформа архивных ключей — из video_archive по (topic_id, source_post_id), иначе по тематике."""
+    keys = ArchivedSourceKey.__table__
+    archive = VideoArchive.__table__
+    filled = 0
+    while True:
+        rows = conn.execute(
+            select(keys.c.id, keys.c.topic_id, keys.c.source_post_id)
+            .where(keys.c.source_platform.is_(None))
+            .order_by(keys.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            platform = conn.execute(
+                select(archive.c.source_platform)
+                .where(
+                    archive.c.topic_id == row.topic_id,
+                    archive.c.source_post_id == row.source_post_id,
+                    archive.c.source_platform.isnot(None),
+                )
+                .limit(1)
+            ).scalar()
+            updates.append({"row_id": row.id, "platform": platform or topic_platforms.get(row.topic_id, "")})
+        conn.execute(
+            keys.update().where(keys.c.id == bindparam("row_id")).values(source_platform=bindparam("platform")),
+            updates,
+        )
+        filled += len(updates)
+    return filled
+
+
+def _require_not_null(conn: Connection, table, column: str) -> None:
+    """
+    NOT NULL DEFAULT '' для колонки.
+
+    SQLite не меняет ограничения колонок без пересборки таблицы — там NULL
+    не допускает приложение (default и @validates у Video, bulk_insert_videos).
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column} SET DEFAULT ''"))
+    conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column} SET NOT NULL"))
+
+
+def _m001_video_publication_indexes(conn: Connection) -> None:
+    """Составные индексы горячих запросов и уникальность источника видео."""
+    _ensure_indexes(conn, Video.__table__, [
+        "ix_videos_topic_status_processed",
+        "ix_videos_status_updated",
+    ])
+    _dedupe_video_source_keys(conn)
+    _ensure_indexes(conn, Video.__table__, ["uq_videos_topic_post_platform"])
+    _ensure_indexes(conn, Publication.__table__, [
+        "ix_publications_status_published",
+        "ix_publications_account_status",
+    ])
+
+
+def _m002_report_range_indexes(conn: Connection) -> None:
+    """Индексы по временным меткам для диапазонных запросов отчётов."""
+    _ensure_indexes(conn, Video.__table__, [
+        "ix_videos_found_at",
+        "ix_videos_downloaded_at",
+        "ix_videos_processed_at",
+    ])
+    _ensure_indexes(conn, Publication.__table__, ["ix_publications_status_updated"])
+    _ensure_indexes(conn, DailyReport.__table__, ["ix_daily_reports_report_date"])
+
+
+def _fill_status_counters(conn: Connection) -> None:
+    """Заполнить счётчики статусов заново из videos."""
+    conn.execute(VideoStatusCounter.__table__.delete())
+    conn.execute(text(
+        "INSERT INTO video_status_counters (topic_id, status, count) "
+        "SELECT topic_id, status, COUNT(id) FROM videos "
+        "WHERE status IS NOT NULL GROUP BY topic_id, status"
+    ))
+
+
+def _m003_video_status_counters(conn: Connection) -> None:
+    """Таблица счётчиков статусов, заполненная из текущих videos."""
+    VideoStatusCounter.__table__.create(conn, checkfirst=True)
+    _fill_status_counters(conn)
+
+
+def _m004_video_events(conn: Connection) -> None:
+    """Журнал событий жизненного цикла видео."""
+    VideoEvent.__table__.create(conn, checkfirst=True)
+
+
+def _m005_archive_tables(conn: Connection) -> None:
+    """Архивные таблицы видео/публикаций и ключи архивных источников."""
+    VideoArchive.__table__.create(conn, checkfirst=True)
+    PublicationArchive.__table__.create(conn, checkfirst=True)
+    ArchivedSourceKey.__table__.create(conn, checkfirst=True)
+
+
+def _m006_publication_slots(conn: Connection) -> None:
+    """Календарь слотов публикации."""
+    PublicationSlot.__table__.create(conn, checkfirst=True)
+
+
+def _m007_video_source_metrics(conn: Connection) -> None:
+    """Колонки source_views/source_likes/source_published_at с индексами и бэкфиллом."""
+    columns = ["source_views", "source_likes", "source_published_at"]
+    _ensure_columns(conn, Video.__table__, columns)
+    _ensure_columns(conn, VideoArchive.__table__, columns)
+    _backfill_source_metrics(conn, Video.__table__)
+    _backfill_source_metrics(conn, VideoArchive.__table__)
+    _ensure_indexes(conn, Video.__table__, [
+        "ix_videos_topic_status_views",
+        "ix_videos_source_likes",
+        "ix_videos_source_published_at",
+    ])
+
+
+def _m008_collection_runs(conn: Connection) -> None:
+    """Журнал запусков сбора контента."""
+    CollectionRun.__table__.create(conn, checkfirst=True)
+
+
+def _m009_video_leases(conn: Connection) -> None:
+    """Колонки аренды видео воркером."""
+    _ensure_columns(conn, Video.__table__, ["lease_owner", "lease_expires"])
+    _ensure_indexes(conn, Video.__table__, ["ix_videos_status_lease"])
+
+
+def _m010_video_trace_ids(conn: Connection) -> None:
+    """Колонка trace_id; существующие видео получают свой trace_id сразу."""
+    _ensure_columns(conn, Video.__table__, ["trace_id"])
+    _ensure_columns(conn, VideoArchive.__table__, ["trace_id"])
+    _backfill_trace_ids(conn, Video.__table__)
+    _ensure_indexes(conn, Video.__table__, ["ix_videos_trace_id"])
+
+
+def _m011_topic_processing_backend(conn: Connection) -> None:
+    """Выбор бэкенда обработки видео на уровне тематики."""
+    _ensure_columns(conn, Topic.__table__, ["processing_backend"])
+
+
+def _m012_video_source_platform_not_null(conn: Connection) -> None:
+    """
+    source_platform без NULL: в уникальном индексе NULL не совпадает ни с чем,
+    и старые строки без платформы не ловились ON CONFLICT при повторном сборе.
+
+    Индексы на время заполнения снимаются: заполненная платформа может совпасть
+    с уже существующей строкой — такие дубли разводятся как в миграции 001.
+    """
+    topic_platforms = _topic_platforms(conn)
+    conn.execute(text("DROP INDEX IF EXISTS uq_videos_topic_post_platform"))
+    conn.execute(text("DROP INDEX IF EXISTS uq_archived_source_keys_topic_post_platform"))
+
+    filled = _backfill_source_platform(conn, Video.__table__, topic_platforms)
+    _backfill_source_platform(conn, VideoArchive.__table__, topic_platforms)
+    filled += _archived_key_platforms(conn, topic_platforms)
+    if filled:
+        logger.info(f"source_platform заполнена у {filled} строк")
+
+    _dedupe_video_source_keys(conn)
+    conn.execute(text(
+        "DELETE FROM archived_source_keys WHERE id NOT IN ("
+        "  SELECT MIN(id) FROM archived_source_keys GROUP BY topic_id, source_post_id, source_platform"
+        ")"
+    ))
+    _require_not_null(conn, Video.__table__, "source_platform")
+    _require_not_null(conn, ArchivedSourceKey.__table__, "source_platform")
+    _ensure_indexes(conn, Video.__table__, ["uq_videos_topic_post_platform"])
+    _ensure_indexes(conn, ArchivedSourceKey.__table__, ["uq_archived_source_keys_topic_post_platform"])
+
+
+def _m013_archive_report_indexes(conn: Connection) -> None:
+    """Индексы архива по временным меткам: отчёты за старые дни читают и его."""
+    _ensure_indexes(conn, VideoArchive.__table__, [
+        "ix_videos_archive_found_at",
+        "ix_videos_archive_downloaded_at",
+        "ix_videos_archive_processed_at",
+        "ix_videos_archive_status_updated",
+    ])
+    _ensure_indexes(conn, PublicationArchive.__table__, [
+        "ix_publications_archive_status_published",
+        "ix_publications_archive_status_updated",
+    ])
+
+
+def _m014_status_counters_hot_only(conn: Connection) -> None:
+    """Счётчики статусов без архива: раньше архивация их не уменьшала."""
+    _fill_status_counters(conn)
+
+
+def _m015_video_trace_ids_backfill(conn: Connection) -> None:
+    """trace_id для видео, оставшихся без него после ранней версии миграции 010."""
+    _backfill_trace_ids(conn, Video.__table__)
+
+
+# (версия, имя, функция). Новые миграции добавлять строго в конец.
+MIGRATIONS: List[Tuple[int, str, MigrationFunc]] = [
+    (1, "video_publication_indexes", _m001_video_publication_indexes),
+    (2, "report_range_indexes", _m002_report_range_indexes),
+    (3, "video_status_counters", _m003_video_status_counters),
+    (4, "video_events", _m004_video_events),
+    (5, "archive_tables", _m005_archive_tables),
+    (6, "publication_slots", _m006_publication_slots),
+    (7, "video_source_metrics", _m007_video_source_metrics),
+    (8, "collection_runs", _m008_collection_runs),
+    (9, "video_leases", _m009_video_leases),
+    (10, "video_trace_ids", _m010_video_trace_ids),
+    (11, "topic_processing_backend", _m011_topic_processing_backend),
+    (12, "video_source_platform_not_null", _m012_video_source_platform_not_null),
+    (13, "archive_report_indexes", _m013_archive_report_indexes),
+    (14, "status_counters_hot_only", _m014_status_counters_hot_only),
+    (15, "video_trace_ids_backfill", _m015_video_trace_ids_backfill),
+]
+
+
+def get_applied_versions(bind: Engine) -> set[int]:
+    """Получить номера уже применённых миграций."""
+    SchemaMigration.__table__.create(bind, checkfirst=True)
+    with bind.connect() as conn:
+        return set(conn.execute(select(SchemaMigration.version)).scalars().all())
+
+
+def run_migrations(bind: Engine) -> List[int]:
+    """
+    Применить все неприменённые миграции.
+
+    Args:
+        bind: Движок БД
+
+    Returns:
+        Список применённых в этот запуск версий
+    """
+    applied = get_applied_versions(bind)
+    done: List[int] = []
+    for version, name, func in MIGRATIONS:
+        if version in applied:
+            continue
+        with bind.begin() as conn:
+            func(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        logger.info(f"Применена миграция {version:03d}: {name}")
+        done.append(version)
+    return done
@@ -2,16 +2,22 @@
 from datetime import datetime
 from typing import Optional
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, Text, 
-    ForeignKey, JSON, Float, Enum as SQLEnum
+    Column, Integer, BigInteger, String, Boolean, DateTime, Text, 
+    ForeignKey, JSON, Float, Index, Enum as SQLEnum
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 import enum
+import uuid
 
 Base = declarative_base()
 
 
+def new_trace_id() -> str:
+    """Идентификатор трассы видео (modules/monitoring/tracing.py)."""
+    return uuid.uuid4().hex
+
+
 class VideoStatus(enum.Enum):
     """Статусы видео."""
     FOUND = "found"
@@ -47,6 +53,7 @@ class Topic(Base):
     brightness_adjustment = Column(Float, default=0.0)
     contrast_adjustment = Column(Float, default=0.0)
     crop_settings = Column(JSON, nullable=True)  # {"x": 0, "y": 0, "width": 1080, "height": 1920}
+    processing_backend = Column(String(20), nullable=True)  # moviepy / ffmpeg; None — VIDEO_PROCESSING_BACKEND
     
     # Брендирование
     branding_enabled = Column(Boolean, default=True)
@@ -122,7 +129,8 @@ class Video(Base):
     
     # Информация об источнике
     source_url = Column(String(1000), nullable=True)
-    source_platform = Column(String(50), nullable=True)  # instagram, tiktok и т.д.
+    # instagram, tiktok и т.д.; "" — неизвестна (NULL не участвовал бы в уникальном индексе)
+    source_platform = Column(String(50), nullable=False, default="", server_default="")
     source_post_id = Column(String(200), nullable=True)
     source_author = Column(String(200), nullable=True)
     
@@ -138,6 +146,18 @@ class Video(Base):
     resolution = Column(String(50), nullable=True)  # "1080x1920"
     metadata_json = Column(JSON, nullable=True)  # Дополнительные метаданные из источника
     
+    # Метрики из источника на момент сбора (дублируют metadata_json для SQL-фильтров)
+    source_views = Column(BigInteger, nullable=True)
+    source_likes = Column(BigInteger, nullable=True)
+    source_published_at = Column(DateTime, nullable=True)  # UTC
+    
+    # Аренда видео воркером (database/leases.py): кто взял и до какого времени
+    lease_owner = Column(String(200), nullable=True)
+    lease_expires = Column(DateTime, nullable=True)
+    
+    # Трасса жизненного цикла: спаны сбора, скачивания, обработки и публикации
+    trace_id = Column(String(32), nullable=True, default=new_trace_id)
+    
     # Ошибки
     error_message = Column(Text, nullable=True)
     
@@ -152,6 +172,77 @@ class Video(Base):
     # Связи
     topic = relationship("Topic", back_populates="videos")
     publications = relationship("Publication", back_populates="video")
+    
+    __table_args__ = (
+        # Очередь публикации: topic_id + status, сортировка по processed_at
+        Index("ix_videos_topic_status_processed", "topic_id", "status", "processed_at"),
+        # Ошибки/статусы за период (бот, аналитика)
+        Index("ix_videos_status_updated", "status", "updated_at"),
+        # Диапазонные выборки ежедневного отчёта по меткам жизненного цикла
+        Index("ix_videos_found_at", "found_at"),
+        Index("ix_videos_downloaded_at", "downloaded_at"),
+        Index("ix_videos_processed_at", "processed_at"),
+        # Очередь по популярности в источнике и фильтры по метрикам
+        Index("ix_videos_topic_status_views", "topic_id", "status", "source_views"),
+        Index("ix_videos_source_likes", "source_likes"),
+        Index("ix_videos_source_published_at", "source_published_at"),
+        # Захват свободных видео и поиск просроченных аренд
+        Index("ix_videos_status_lease", "status", "lease_expires"),
+        Index("ix_videos_trace_id", "trace_id"),
+        # Дедупликация. source_post_id идёт перед source_platform, чтобы префикс
+        # (topic_id, source_post_id) обслуживал поиск без указания платформы.
+        Index(
+            "uq_videos_topic_post_platform",
+            "topic_id", "source_post_id", "source_platform",
+            unique=True,
+        ),
+    )
+    
+    @validates("source_platform")
+    def _validate_source_platform(self, key, value):
+        """None → "" (см. комментарий к колонке)."""
+        return value or ""
+
+
+class VideoStatusCounter(Base):
+    """
+    Количество видео по тематике и статусу.
+    
+    Обновляется в той же транзакции, что и смена статуса (database/counters.py),
+    и периодически сверяется с таблицей videos.
+    """
+    __tablename__ = "video_status_counters"
+    
+    topic_id = Column(Integer, ForeignKey("topics.id"), primary_key=True)
+    status = Column(SQLEnum(VideoStatus), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class VideoEvent(Base):
+    """
+    Событие жизненного цикла видео: переход статуса с замером стадии.
+    
+    Журнал только дополняется. video_id без внешнего ключа — события
+    переживают перенос видео в архив.
+    """
+    __tablename__ = "video_events"
+    
+    id = Column(Integer, primary_key=True)
+    video_id = Column(Integer, nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    stage = Column(String(50), nullable=False)  # download, process, publish
+    from_status = Column(SQLEnum(VideoStatus), nullable=True)
+    to_status = Column(SQLEnum(VideoStatus), nullable=True)
+    worker_id = Column(String(200), nullable=True)  # host:pid
+    duration = Column(Float, nullable=True)  # секунды
+    bytes_touched = Column(BigInteger, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_video_events_stage_created", "stage", "created_at"),
+        Index("ix_video_events_video_created", "video_id", "created_at"),
+    )
 
 
 class Publication(Base):
@@ -187,6 +278,12 @@ class Publication(Base):
     # Связи
     video = relationship("Video", back_populates="publications")
     account = relationship("Account", back_populates="publications")
+    
+    __table_args__ = (
+        Index("ix_publications_status_published", "status", "published_at"),
+        Index("ix_publications_account_status", "account_id", "status"),
+        Index("ix_publications_status_updated", "status", "updated_at"),
+    )
 
 
 class Schedule(Base):
@@ -204,12 +301,161 @@ class Schedule(Base):
     topic = relationship("Topic", back_populates="schedules")
 
 
+class VideoArchive(Base):
+    """
+    Архив завершённых видео (PUBLISHED/ERROR/BLOCKED), вынесенных из videos.
+    
+    Колонки повторяют Video; id сохраняется исходный. См. database/archive.py.
+    """
+    __tablename__ = "videos_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    topic_id = Column(Integer, nullable=False)
+    status = Column(SQLEnum(VideoStatus))
+    
+    source_url = Column(String(1000), nullable=True)
+    source_platform = Column(String(50), nullable=True)
+    source_post_id = Column(String(200), nullable=True)
+    source_author = Column(String(200), nullable=True)
+    
+    original_file_path = Column(String(1000), nullable=True)
+    processed_file_path = Column(String(1000), nullable=True)
+    
+    title = Column(String(500), nullable=True)
+    description = Column(Text, nullable=True)
+    tags = Column(JSON, default=list)
+    duration = Column(Float, nullable=True)
+    resolution = Column(String(50), nullable=True)
+    metadata_json = Column(JSON, nullable=True)
+    
+    source_views = Column(BigInteger, nullable=True)
+    source_likes = Column(BigInteger, nullable=True)
+    source_published_at = Column(DateTime, nullable=True)
+    trace_id = Column(String(32), nullable=True)
+    
+    error_message = Column(Text, nullable=True)
+    
+    found_at = Column(DateTime, nullable=True)
+    downloaded_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+    published_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        # Отчёты за старые дни читают архив по тем же меткам, что и videos
+        Index("ix_videos_archive_found_at", "found_at"),
+        Index("ix_videos_archive_downloaded_at", "downloaded_at"),
+        Index("ix_videos_archive_processed_at", "processed_at"),
+        Index("ix_videos_archive_status_updated", "status", "updated_at"),
+    )
+
+
+class PublicationArchive(Base):
+    """Архив публикаций, вынесенных вместе со своими видео."""
+    __tablename__ = "publications_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    video_id = Column(Integer, nullable=False, index=True)
+    account_id = Column(Integer, nullable=False)
+    platform = Column(SQLEnum(PlatformType), nullable=False)
+    
+    status = Column(String(50))
+    platform_post_id = Column(String(200), nullable=True)
+    platform_url = Column(String(1000), nullable=True)
+    
+    views = Column(Integer, default=0)
+    likes = Column(Integer, default=0)
+    comments = Column(Integer, default=0)
+    shares = Column(Integer, default=0)
+    last_metrics_update = Column(DateTime, nullable=True)
+    
+    error_message = Column(Text, nullable=True)
+    
+    scheduled_at = Column(DateTime, nullable=True)
+    published_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_publications_archive_status_published", "status", "published_at"),
+        Index("ix_publications_archive_status_updated", "status", "updated_at"),
+    )
+
+
+class ArchivedSourceKey(Base):
+    """Ключ источника архивного видео — чтобы дедупликация видела архив, не читая его."""
+    __tablename__ = "archived_source_keys"
+    
+    id = Column(Integer, primary_key=True)
+    topic_id = Column(Integer, nullable=False)
+    source_post_id = Column(String(200), nullable=False)
+    source_platform = Column(String(50), nullable=False, default="", server_default="")
+    
+    __table_args__ = (
+        Index(
+            "uq_archived_source_keys_topic_post_platform",
+            "topic_id", "source_post_id", "source_platform",
+            unique=True,
+        ),
+    )
+
+
+class PublicationSlot(Base):
+    """
+    Слот публикации, материализованный из Schedule на несколько дней вперёд.
+    
+    Состояния: pending → claimed → published / failed / empty (не было видео);
+    просроченные неотработанные слоты помечаются missed. Захват, брошенный
+    упавшим воркером, по claimed_at возвращается в pending (claim_due_slots).
+    """
+    __tablename__ = "publication_slots"
+    
+    id = Column(Integer, primary_key=True)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    schedule_id = Column(Integer, nullable=True)  # без FK: расписание можно удалить
+    slot_time = Column(DateTime, nullable=False)  # UTC
+    state = Column(String(20), nullable=False, default="pending")
+    video_id = Column(Integer, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("uq_publication_slots_topic_time", "topic_id", "slot_time", unique=True),
+        # Выборка наступивших слотов: state = 'pending' AND slot_time <= now
+        Index("ix_publication_slots_state_time", "state", "slot_time"),
+    )
+
+
+class CollectionRun(Base):
+    """Итоги одного запуска сбора контента (все источники параллельно)."""
+    __tablename__ = "collection_runs"
+    
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, nullable=False, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    wall_seconds = Column(Float, nullable=True)  # от постановки задач до последнего источника
+    
+    sources = Column(Integer, default=0)
+    videos_found = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    
+    # Самый медленный источник — он и определяет длительность запуска
+    slowest_source_id = Column(Integer, nullable=True)
+    slowest_seconds = Column(Float, nullable=True)
+    
+    platform_stats = Column(JSON, nullable=True)  # {"youtube": {"sources": 3, "videos": 10, "errors": 0, "seconds": 42.0}}
+
+
 class DailyReport(Base):
     """Ежедневный отчёт."""
     __tablename__ = "daily_reports"
     
     id = Column(Integer, primary_key=True)
-    report_date = Column(DateTime, nullable=False)
+    report_date = Column(DateTime, nullable=False, index=True)
     
     # Статистика по тематикам
     topics_stats = Column(JSON, nullable=True)  # {"topic_id": {"found": 10, "published": 5, ...}}
@@ -225,3 +471,12 @@ class DailyReport(Base):
     warnings = Column(JSON, default=list)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SchemaMigration(Base):
+    """Применённая миграция схемы (см. database/migrations.py)."""
+    __tablename__ = "schema_migrations"
+    
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
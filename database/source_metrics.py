@@ -0,0 +1,61 @@
+"""Метрики источника (просмотры, лайки, дата публикации) из metadata сборщиков.
+
+Сборщики кладут метрики в ``metadata`` под разными ключами (``view_count``/``views``,
+``likes``/``like_count``, ``timestamp``/``upload_date``). Здесь они приводятся
+к значениям колонок Video ``source_views``, ``source_likes``, ``source_published_at``.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+def _first(metadata: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        value = metadata.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_utc_datetime(value: Any) -> Optional[datetime]:
+    """Unix-время, YYYYMMDD (yt-dlp upload_date) или ISO 8601 → naive UTC."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.utcfromtimestamp(value)
+        value = str(value).strip()
+        if len(value) == 8 and value.isdigit():
+            return datetime.strptime(value, "%Y%m%d")
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def source_metric_columns(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Значения колонок source_* для Video из metadata сборщика.
+
+    Returns:
+        {"source_views": ..., "source_likes": ..., "source_published_at": ...}
+        (None, если метрики нет)
+    """
+    metadata = metadata or {}
+    return {
+        "source_views": _to_int(_first(metadata, "view_count", "views")),
+        "source_likes": _to_int(_first(metadata, "likes", "like_count")),
+        "source_published_at": _to_utc_datetime(
+            _first(metadata, "timestamp", "upload_date", "published_at")
+        ),
+    }
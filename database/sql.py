@@ -0,0 +1,20 @@
+"""Вспомогательные SQL-конструкции, зависящие от диалекта БД."""
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+
+def dialect_insert(dialect_name: str) -> Optional[Callable]:
+    """
+    Конструктор INSERT с ON CONFLICT для диалекта (PostgreSQL, SQLite 3.24+).
+
+    Returns:
+        Функция ``insert(table)`` диалекта или None, если ON CONFLICT не поддерживается
+    """
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
@@ -6,6 +6,7 @@ from config import settings
 from modules.telegram_bot import TelegramBot
 from modules.analytics import Analytics
 from modules.scheduler import celery_app, collect_content_task, process_publication_queue
+from modules.monitoring import install_metrics, start_metrics_server
 from celery.schedules import crontab
 
 # Настройка логирования
@@ -25,10 +26,34 @@ def setup_celery():
             'task': 'modules.scheduler.scheduler.collect_content_task',
             'schedule': crontab(minute='*/30'),  # Каждые 30 минут
         },
+        'dispatch-pipeline': {
+            'task': 'modules.scheduler.scheduler.dispatch_pipeline_task',
+            'schedule': crontab(minute='*/10'),  # Подбор потерянных задач конвейера
+        },
+        'reap-expired-leases': {
+            'task': 'modules.scheduler.scheduler.reap_expired_leases_task',
+            'schedule': crontab(minute='*/5'),  # Видео упавших воркеров — обратно в очередь
+        },
         'process-publications': {
             'task': 'modules.scheduler.scheduler.process_publication_queue',
             'schedule': crontab(minute='*/5'),  # Каждые 5 минут
         },
+        'materialize-publication-slots': {
+            'task': 'modules.scheduler.scheduler.materialize_publication_slots_task',
+            'schedule': crontab(minute=0),  # Раз в час, окно — несколько дней вперёд
+        },
+        'reconcile-status-counters': {
+            'task': 'modules.scheduler.scheduler.reconcile_status_counters_task',
+            'schedule': crontab(minute=15),  # Раз в час
+        },
+        'update-publication-metrics': {
+            'task': 'modules.scheduler.scheduler.update_publication_metrics_task',
+            'schedule': crontab(minute='*/15'),  # Кому пора — решают возрастные интервалы
+        },
+        'archive-finished-videos': {
+            'task': 'modules.scheduler.scheduler.archive_finished_videos_task',
+            'schedule': crontab(hour=4, minute=30),  # Раз в сутки, ночью
+        },
     }
     celery_app.conf.timezone = settings.DEFAULT_TIMEZONE
 
@@ -45,6 +70,10 @@ def main():
     logger.info("Настройка Celery...")
     setup_celery()
     
+    # Метрики Prometheus (если порт уже занят воркером — отдаёт он)
+    install_metrics()
+    start_metrics_server()
+    
     # Запуск Telegram-бота
     logger.info("Запуск Telegram-бота...")
     db_session = next(get_db())
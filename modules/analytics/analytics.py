@@ -1,15 +1,37 @@
 """Модуль аналитики и отчетности."""
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Any, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, or_
 from loguru import logger
 
+from config import settings
 from database.models import (
-    Topic, Video, VideoStatus, Publication, DailyReport, Account, Schedule
+    Topic, Video, VideoStatus, Publication, DailyReport, Account, Schedule, PlatformType,
+    VideoEvent, VideoArchive, PublicationArchive
 )
+from modules.monitoring import profiled
 from modules.publisher import TikTokPublisher, YouTubePublisher, InstagramPublisher
 
+# Возрастные интервалы обновления метрик: (пост моложе, обновлять не чаще чем раз в).
+# Старше последнего интервала — раз в сутки до METRICS_MAX_AGE_DAYS, затем никогда.
+METRICS_REFRESH_TIERS = [
+    (timedelta(days=1), timedelta(hours=1)),
+    (timedelta(days=7), timedelta(hours=6)),
+]
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль с линейной интерполяцией (как percentile_cont)."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
 
 class Analytics:
     """Аналитика и отчетность."""
@@ -23,6 +45,7 @@ class Analytics:
         """
         self.db = db
     
+    @profiled("Analytics.generate_daily_report")
     def generate_daily_report(self, report_date: Optional[datetime] = None) -> DailyReport:
         """
         Сгенерировать ежедневный отчёт.
@@ -34,107 +57,155 @@ class Analytics:
             Объект DailyReport
         """
         if report_date is None:
-            report_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Проверяем, не существует ли уже отчёт за эту дату
-        existing = self.db.query(DailyReport).filter(
-            func.date(DailyReport.report_date) == report_date.date()
-        ).first()
+            report_date = datetime.utcnow()
+        return self.generate_reports(report_date, report_date)[0]
+    
+    def generate_reports(self, start_date: datetime, end_date: datetime) -> List[DailyReport]:
+        """
+        Сгенерировать ежедневные отчёты за диапазон дат (включительно).
         
-        if existing:
-            return existing
+        Все счётчики считаются несколькими запросами GROUP BY topic_id, день —
+        по одному на каждую временную метку жизненного цикла — независимо от
+        числа тематик и длины диапазона. Фильтры — полуоткрытые интервалы
+        [начало, конец), поэтому используются индексы по временным меткам.
+        Видео и публикации, уже перенесённые в архив (database.archive),
+        считаются вместе с горячими таблицами. Уже существующие отчёты не
+        пересчитываются.
         
-        # Статистика по тематикам
-        topics_stats = {}
-        topics = self.db.query(Topic).all()
+        Args:
+            start_date: Первый день диапазона
+            end_date: Последний день диапазона
+            
+        Returns:
+            Список DailyReport по дням, по возрастанию даты
+        """
+        first_day = start_date.date()
+        last_day = end_date.date()
+        range_start = datetime.combine(first_day, time.min)
+        range_end = datetime.combine(last_day, time.min) + timedelta(days=1)
+        days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+        
+        # Уже существующие отчёты
+        existing: Dict[date, DailyReport] = {}
+        for report in self.db.query(DailyReport).filter(
+            DailyReport.report_date >= range_start,
+            DailyReport.report_date < range_end,
+        ).order_by(DailyReport.report_date.asc()):
+            existing.setdefault(report.report_date.date(), report)
+        
+        missing = [day for day in days if day not in existing]
+        if not missing:
+            return [existing[day] for day in days]
+        
+        # Агрегаты по (день, тематика) за весь диапазон
+        found = self._count_by_day_and_topic("found_at", range_start, range_end)
+        downloaded = self._count_by_day_and_topic("downloaded_at", range_start, range_end)
+        processed = self._count_by_day_and_topic("processed_at", range_start, range_end)
+        published = self._count_published_by_day_and_topic(range_start, range_end)
+        
+        topic_ids = [row[0] for row in self.db.query(Topic.id).all()]
+        errors_by_day = self._get_errors(range_start, range_end)
+        warnings = self._get_warnings()
+        
+        created = []
+        for day in missing:
+            topics_stats = {}
+            for topic_id in topic_ids:
+                key = (day, topic_id)
+                topics_stats[topic_id] = {
+                    "found": found.get(key, 0),
+                    "downloaded": downloaded.get(key, 0),
+                    "processed": processed.get(key, 0),
+                    "published": published.get(key, 0),
+                }
+            
+            report = DailyReport(
+                report_date=datetime.combine(day, time.min),
+                topics_stats=topics_stats,
+                total_found=self._day_total(found, day),
+                total_downloaded=self._day_total(downloaded, day),
+                total_processed=self._day_total(processed, day),
+                total_published=self._day_total(published, day),
+                errors=errors_by_day.get(day, []),
+                warnings=warnings
+            )
+            self.db.add(report)
+            existing[day] = report
+            created.append(report)
         
-        for topic in topics:
-            stats = self._get_topic_stats(topic.id, report_date)
-            topics_stats[topic.id] = stats
-        
-        # Общая статистика
-        total_found = self.db.query(func.count(Video.id)).filter(
-            func.date(Video.found_at) == report_date.date()
-        ).scalar() or 0
-        
-        total_downloaded = self.db.query(func.count(Video.id)).filter(
-            func.date(Video.downloaded_at) == report_date.date()
-        ).scalar() or 0
-        
-        total_processed = self.db.query(func.count(Video.id)).filter(
-            func.date(Video.processed_at) == report_date.date()
-        ).scalar() or 0
-        
-        total_published = self.db.query(func.count(Publication.id)).filter(
-            func.date(Publication.published_at) == report_date.date(),
-            Publication.status == "published"
-        ).scalar() or 0
-        
-        # Ошибки и предупреждения
-        errors = self._get_errors(report_date)
-        warnings = self._get_warnings(report_date)
-        
-        # Создаем отчёт
-        report = DailyReport(
-            report_date=report_date,
-            topics_stats=topics_stats,
-            total_found=total_found,
-            total_downloaded=total_downloaded,
-            total_processed=total_processed,
-            total_published=total_published,
-            errors=errors,
-            warnings=warnings
-        )
-        
-        self.db.add(report)
         self.db.commit()
-        self.db.refresh(report)
+        for report in created:
+            self.db.refresh(report)
+            logger.info(f"Сгенерирован ежедневный отчёт за {report.report_date.date()}")
         
-        logger.info(f"Сгенерирован ежедневный отчёт за {report_date.date()}")
-        return report
+        return [existing[day] for day in days]
+    
+    @staticmethod
+    def _to_date(value: Any) -> date:
+        """Привести результат func.date() к date (SQLite возвращает строку)."""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return date.fromisoformat(str(value)[:10])
+    
+    @staticmethod
+    def _day_total(counts: Dict[Tuple[date, Optional[int]], int], day: date) -> int:
+        """Сумма счётчиков за день по всем тематикам."""
+        return sum(n for (d, _), n in counts.items() if d == day)
     
-    def _get_topic_stats(self, topic_id: int, report_date: datetime) -> Dict[str, Any]:
-        """Получить статистику по тематике."""
-        found = self.db.query(func.count(Video.id)).filter(
-            Video.topic_id == topic_id,
-            func.date(Video.found_at) == report_date.date()
-        ).scalar() or 0
-        
-        downloaded = self.db.query(func.count(Video.id)).filter(
-            Video.topic_id == topic_id,
-            func.date(Video.downloaded_at) == report_date.date()
-        ).scalar() or 0
-        
-        processed = self.db.query(func.count(Video.id)).filter(
-            Video.topic_id == topic_id,
-            func.date(Video.processed_at) == report_date.date()
-        ).scalar() or 0
-        
-        published = self.db.query(func.count(Publication.id)).join(Video).filter(
-            Video.topic_id == topic_id,
-            func.date(Publication.published_at) == report_date.date(),
-            Publication.status == "published"
-        ).scalar() or 0
-        
-        return {
-            "found": found,
-            "downloaded": downloaded,
-            "processed": processed,
-            "published": published
-        }
+    def _count_by_day_and_topic(
+        self, column_name: str, range_start: datetime, range_end: datetime
+    ) -> Dict[Tuple[date, int], int]:
+        """Количество видео (с архивом) по (день, тематика) для временной метки column_name."""
+        counts: Dict[Tuple[date, int], int] = defaultdict(int)
+        for model in (Video, VideoArchive):
+            column = getattr(model, column_name)
+            day = func.date(column)
+            rows = self.db.query(day, model.topic_id, func.count(model.id)).filter(
+                column >= range_start,
+                column < range_end,
+            ).group_by(day, model.topic_id).all()
+            for d, topic_id, n in rows:
+                counts[(self._to_date(d), topic_id)] += n
+        return dict(counts)
     
-    def _get_errors(self, report_date: datetime) -> List[Dict[str, Any]]:
-        """Получить список ошибок за день."""
-        errors = []
+    def _count_published_by_day_and_topic(
+        self, range_start: datetime, range_end: datetime
+    ) -> Dict[Tuple[date, int], int]:
+        """Количество успешных публикаций (с архивом) по (день, тематика видео)."""
+        counts: Dict[Tuple[date, int], int] = defaultdict(int)
+        # Публикации уходят в архив вместе со своим видео
+        for publication_model, video_model in ((Publication, Video), (PublicationArchive, VideoArchive)):
+            day = func.date(publication_model.published_at)
+            rows = self.db.query(day, video_model.topic_id, func.count(publication_model.id)).join(
+                video_model, publication_model.video_id == video_model.id
+            ).filter(
+                publication_model.status == "published",
+                publication_model.published_at >= range_start,
+                publication_model.published_at < range_end,
+            ).group_by(day, video_model.topic_id).all()
+            for d, topic_id, n in rows:
+                counts[(self._to_date(d), topic_id)] += n
+        return dict(counts)
+    
+    def _get_errors(
+        self, range_start: datetime, range_end: datetime
+    ) -> Dict[date, List[Dict[str, Any]]]:
+        """Получить ошибки за период (с архивом), сгруппированные по дням."""
+        errors: Dict[date, List[Dict[str, Any]]] = defaultdict(list)
         
         # Ошибки видео
-        error_videos = self.db.query(Video).filter(
-            Video.status == VideoStatus.ERROR,
-            func.date(Video.updated_at) == report_date.date()
-        ).all()
+        error_videos = []
+        for model in (Video, VideoArchive):
+            error_videos.extend(self.db.query(model).filter(
+                model.status == VideoStatus.ERROR,
+                model.updated_at >= range_start,
+                model.updated_at < range_end,
+            ).all())
         
         for video in error_videos:
-            errors.append({
+            errors[video.updated_at.date()].append({
                 "type": "video_error",
                 "video_id": video.id,
                 "message": video.error_message,
@@ -142,13 +213,16 @@ class Analytics:
             })
         
         # Ошибки публикаций
-        failed_publications = self.db.query(Publication).filter(
-            Publication.status == "failed",
-            func.date(Publication.updated_at) == report_date.date()
-        ).all()
+        failed_publications = []
+        for model in (Publication, PublicationArchive):
+            failed_publications.extend(self.db.query(model).filter(
+                model.status == "failed",
+                model.updated_at >= range_start,
+                model.updated_at < range_end,
+            ).all())
         
         for pub in failed_publications:
-            errors.append({
+            errors[pub.updated_at.date()].append({
                 "type": "publication_error",
                 "publication_id": pub.id,
                 "video_id": pub.video_id,
@@ -159,26 +233,23 @@ class Analytics:
         
         return errors
     
-    def _get_warnings(self, report_date: datetime) -> List[Dict[str, Any]]:
-        """Получить предупреждения за день."""
+    def _get_warnings(self) -> List[Dict[str, Any]]:
+        """Получить предупреждения о нехватке контента (текущее состояние очередей)."""
         warnings = []
         
-        # Проверяем нехватку контента
+        ready_by_topic = dict(self.db.query(Video.topic_id, func.count(Video.id)).filter(
+            Video.status == VideoStatus.PROCESSED
+        ).group_by(Video.topic_id).all())
+        
+        schedules_by_topic = dict(self.db.query(Schedule.topic_id, func.count(Schedule.id)).filter(
+            Schedule.is_active == True
+        ).group_by(Schedule.topic_id).all())
+        
         topics = self.db.query(Topic).filter(Topic.is_active == True).all()
         
         for topic in topics:
-            # Количество готовых к публикации видео
-            ready_videos = self.db.query(func.count(Video.id)).filter(
-                Video.topic_id == topic.id,
-                Video.status == VideoStatus.PROCESSED
-            ).scalar() or 0
-            
-            # Количество запланированных публикаций на завтра
-            tomorrow = report_date + timedelta(days=1)
-            schedules = self.db.query(Schedule).filter(
-                Schedule.topic_id == topic.id,
-                Schedule.is_active == True
-            ).count()
+            ready_videos = ready_by_topic.get(topic.id, 0)
+            schedules = schedules_by_topic.get(topic.id, 0)
             
             if ready_videos < schedules:
                 warnings.append({
@@ -210,8 +281,9 @@ class Analytics:
             text += "📂 По тематикам:\n"
             topics = self.db.query(Topic).all()
             for topic in topics:
-                if topic.id in report.topics_stats:
-                    stats = report.topics_stats[topic.id]
+                # После сохранения в JSON ключи становятся строками
+                stats = report.topics_stats.get(topic.id) or report.topics_stats.get(str(topic.id))
+                if stats:
                     text += f"   {topic.name}:\n"
                     text += f"      Найдено: {stats['found']}, Обработано: {stats['processed']}, Опубликовано: {stats['published']}\n"
         
@@ -229,49 +301,247 @@ class Analytics:
         
         return text
     
-    def update_publication_metrics(self):
-        """Обновить метрики всех публикаций."""
-        from database.models import PlatformType
+    def get_stage_latency(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        by_topic: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Латентность стадий конвейера по журналу video_events.
+        
+        Учитываются только завершённые замеры (duration не NULL, без ошибки).
+        На PostgreSQL перцентили считаются в SQL (percentile_cont), на остальных
+        БД — в Python по выборке за период.
+        
+        Args:
+            since: Начало периода (по умолчанию — последние 7 дней)
+            until: Конец периода, не включительно (по умолчанию — сейчас)
+            by_topic: Разбивать по тематикам (иначе только по стадиям)
+            
+        Returns:
+            Список {"stage", "topic_id", "count", "p50", "p95", "max"},
+            отсортированный по убыванию p95 — узкое место первым
+        """
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=7)
+        group_cols = [VideoEvent.stage] + ([VideoEvent.topic_id] if by_topic else [])
+        filters = [
+            VideoEvent.created_at >= since,
+            VideoEvent.created_at < until,
+            VideoEvent.duration.isnot(None),
+            VideoEvent.error_message.is_(None),
+        ]
+        
+        rows: List[Dict[str, Any]] = []
+        if self.db.get_bind().dialect.name == "postgresql":
+            query = self.db.query(
+                *group_cols,
+                func.count(VideoEvent.id),
+                func.percentile_cont(0.5).within_group(VideoEvent.duration),
+                func.percentile_cont(0.95).within_group(VideoEvent.duration),
+                func.max(VideoEvent.duration),
+            ).filter(*filters).group_by(*group_cols)
+            for row in query.all():
+                stage, topic_id = row[0], (row[1] if by_topic else None)
+                count, p50, p95, max_duration = row[-4:]
+                rows.append({
+                    "stage": stage, "topic_id": topic_id, "count": count,
+                    "p50": float(p50), "p95": float(p95), "max": float(max_duration),
+                })
+        else:
+            samples: Dict[Tuple[str, Optional[int]], List[float]] = defaultdict(list)
+            query = self.db.query(VideoEvent.stage, VideoEvent.topic_id, VideoEvent.duration).filter(*filters)
+            for stage, topic_id, duration in query.all():
+                samples[(stage, topic_id if by_topic else None)].append(duration)
+            for (stage, topic_id), durations in samples.items():
+                durations.sort()
+                rows.append({
+                    "stage": stage, "topic_id": topic_id, "count": len(durations),
+                    "p50": _percentile(durations, 0.5), "p95": _percentile(durations, 0.95),
+                    "max": durations[-1],
+                })
+        
+        rows.sort(key=lambda r: r["p95"], reverse=True)
+        return rows
+    
+    def get_source_engagement(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Популярность найденного контента в источниках по тематикам.
+        
+        Считается в SQL по колонкам source_views/source_likes (без разбора metadata_json).
+        
+        Args:
+            since: Начало периода по found_at (по умолчанию — последние 7 дней)
+            until: Конец периода, не включительно (по умолчанию — сейчас)
+            
+        Returns:
+            Список {"topic_id", "videos", "avg_views", "max_views", "avg_likes",
+            "published"}, отсортированный по убыванию avg_views
+        """
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=7)
+        
+        query = self.db.query(
+            Video.topic_id,
+            func.count(Video.id),
+            func.avg(Video.source_views),
+            func.max(Video.source_views),
+            func.avg(Video.source_likes),
+            func.count(Video.published_at),
+        ).filter(
+            Video.found_at >= since,
+            Video.found_at < until
+        ).group_by(Video.topic_id)
+        
+        rows = [
+            {
+                "topic_id": topic_id,
+                "videos": videos,
+                "avg_views": float(avg_views or 0),
+                "max_views": max_views or 0,
+                "avg_likes": float(avg_likes or 0),
+                "published": published,
+            }
+            for topic_id, videos, avg_views, max_views, avg_likes, published in query.all()
+        ]
+        rows.sort(key=lambda r: r["avg_views"], reverse=True)
+        return rows
+    
+    def get_top_source_videos(
+        self,
+        topic_id: Optional[int] = None,
+        limit: int = 10,
+        since: Optional[datetime] = None,
+        min_likes: Optional[int] = None,
+    ) -> List[Video]:
+        """Самые просматриваемые в источнике видео (по индексу source_views)."""
+        query = self.db.query(Video).filter(Video.source_views.isnot(None))
+        if topic_id is not None:
+            query = query.filter(Video.topic_id == topic_id)
+        if since is not None:
+            query = query.filter(Video.source_published_at >= since)
+        if min_likes is not None:
+            query = query.filter(Video.source_likes >= min_likes)
+        return query.order_by(Video.source_views.desc()).limit(limit).all()
+    
+    def update_publication_metrics(
+        self,
+        now: Optional[datetime] = None,
+        max_workers: Optional[int] = None,
+        batch_size: int = 100,
+    ) -> int:
+        """
+        Обновить метрики публикаций, которым пора обновиться.
+        
+        Частота зависит от возраста поста (METRICS_REFRESH_TIERS): в первые сутки —
+        раз в час, до недели — раз в 6 часов, дальше — раз в сутки, а посты старше
+        METRICS_MAX_AGE_DAYS не обновляются. Публикации группируются по аккаунту
+        (один публикатор на аккаунт), запросы к API идут в пуле потоков, запись в
+        БД — из текущего потока пачками по batch_size.
+        
+        Args:
+            now: Текущее время (UTC), по умолчанию datetime.utcnow()
+            max_workers: Размер пула (по умолчанию METRICS_WORKERS из настроек)
+            batch_size: Сколько публикаций фиксировать одним commit
+            
+        Returns:
+            Количество обновлённых публикаций
+        """
+        now = now or datetime.utcnow()
+        max_workers = max_workers or int(getattr(settings, "METRICS_WORKERS", 8))
         
         publications = self.db.query(Publication).filter(
             Publication.status == "published",
-            Publication.platform_post_id.isnot(None)
-        ).all()
+            Publication.platform_post_id.isnot(None),
+            self._metrics_due_filter(now),
+        ).order_by(Publication.account_id).all()
         
-        updated_count = 0
+        if not publications:
+            logger.info("Обновлено метрик: 0")
+            return 0
         
+        # Один запрос за аккаунтами и один публикатор на аккаунт
+        by_account: Dict[int, List[Publication]] = defaultdict(list)
         for pub in publications:
-            try:
-                # Создаем публикатор
-                account = self.db.query(Account).filter(Account.id == pub.account_id).first()
-                if not account:
-                    continue
-                
-                publisher = None
-                if account.platform == PlatformType.PLATFORM_A:
-                    publisher = TikTokPublisher(account)
-                elif account.platform == PlatformType.PLATFORM_B:
-                    publisher = YouTubePublisher(account)
-                elif account.platform == PlatformType.PLATFORM_C:
-                    publisher = InstagramPublisher(account)
-                
-                if not publisher:
+            by_account[pub.account_id].append(pub)
+        accounts = self.db.query(Account).filter(Account.id.in_(list(by_account))).all()
+        publishers = {}
+        for account in accounts:
+            publisher = self._create_publisher(account)
+            if publisher:
+                publishers[account.id] = publisher
+        
+        jobs = [
+            (pub, publishers[account_id], pub.platform_post_id)
+            for account_id, pubs in by_account.items() if account_id in publishers
+            for pub in pubs
+        ]
+        
+        updated_count = 0
+        pending = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(publisher.get_metrics, post_id): pub
+                for pub, publisher, post_id in jobs
+            }
+            for future in as_completed(futures):
+                pub = futures[future]
+                try:
+                    metrics = future.result()
+                except Exception as e:
+                    logger.error(f"Ошибка обновления метрик публикации {pub.id}: {e}")
                     continue
                 
-                # Получаем метрики
-                metrics = publisher.get_metrics(pub.platform_post_id)
-                
                 if metrics:
                     pub.views = metrics.get("views", 0)
                     pub.likes = metrics.get("likes", 0)
                     pub.comments = metrics.get("comments", 0)
                     pub.shares = metrics.get("shares", 0)
-                    pub.last_metrics_update = datetime.utcnow()
+                    pub.last_metrics_update = now
                     updated_count += 1
-            
-            except Exception as e:
-                logger.error(f"Ошибка обновления метрик публикации {pub.id}: {e}")
+                    pending += 1
+                
+                if pending >= batch_size:
+                    self.db.commit()
+                    pending = 0
         
         self.db.commit()
-        logger.info(f"Обновлено метрик: {updated_count}")
+        logger.info(f"Обновлено метрик: {updated_count} из {len(jobs)} к обновлению")
         return updated_count
+    
+    @staticmethod
+    def _metrics_due_filter(now: datetime):
+        """Условие SQL: публикация попадает в свой возрастной интервал обновления."""
+        max_age = timedelta(days=int(getattr(settings, "METRICS_MAX_AGE_DAYS", 30)))
+        conditions = []
+        newer_than = now
+        for tier_age, interval in METRICS_REFRESH_TIERS + [(max_age, timedelta(days=1))]:
+            older_than = now - min(tier_age, max_age)
+            if older_than >= newer_than:
+                continue
+            conditions.append(and_(
+                Publication.published_at < newer_than,
+                Publication.published_at >= older_than,
+                or_(
+                    Publication.last_metrics_update.is_(None),
+                    Publication.last_metrics_update < now - interval,
+                ),
+            ))
+            newer_than = older_than
+        return or_(*conditions)
+    
+    @staticmethod
+    def _create_publisher(account: Account):
+        """Создать публикатор для аккаунта."""
+        if account.platform == PlatformType.PLATFORM_A:
+            return TikTokPublisher(account)
+        elif account.platform == PlatformType.PLATFORM_B:
+            return YouTubePublisher(account)
+        elif account.platform == PlatformType.PLATFORM_C:
+            return InstagramPublisher(account)
+        return None
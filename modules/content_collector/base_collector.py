@@ -3,11 +3,25 @@ from abc import ABC, abstractmethod
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from database.models import VideoStatus, ContentSource
+from modules.monitoring import profiled, traced
+
+
+def _collector_tags(self, *args, **kwargs) -> Dict[str, Any]:
+    return {"topic": self.source.topic_id, "source": self.source.id}
 
 
 class BaseCollector(ABC):
     """Базовый класс для всех сборщиков контента."""
     
+    def __init_subclass__(cls, **kwargs):
+        """Обернуть collect_videos/download_video подкласса профилировщиком и спаном трассы."""
+        super().__init_subclass__(**kwargs)
+        for method in ("collect_videos", "download_video"):
+            func = cls.__dict__.get(method)
+            if func is not None and not getattr(func, "__isabstractmethod__", False) and not getattr(func, "__profiled__", False):
+                name = f"{cls.__name__}.{method}"
+                setattr(cls, method, traced(name)(profiled(name, tags=_collector_tags)(func)))
+    
     def __init__(self, source: ContentSource):
         """
         Инициализация сборщика.
@@ -553,6 +553,7 @@ class InstagramCollector(BaseCollector):
                                     "likes": info.get('like_count', 0),
                                     "comments": info.get('comment_count', 0),
                                     "view_count": info.get('view_count', 0),
+                                    "timestamp": info.get('timestamp'),
                                 }
                             }
                             videos.append(video_info)
@@ -848,6 +849,7 @@ class InstagramCollector(BaseCollector):
                                             "likes": entry.get('like_count', 0),
                                             "comments": entry.get('comment_count', 0),
                                             "view_count": entry.get('view_count', 0),
+                                            "timestamp": entry.get('timestamp'),
                                         }
                                     }
                                     videos.append(video_info)
@@ -138,6 +138,10 @@ class TikTokCollector(BaseCollector):
 
         def process_entries(entries: list) -> bool:
             nonlocal results, seen_ids
+            # Проверить всю страницу одним запросом, если exclude умеет (KnownSourceIds)
+            prefetch = getattr(exclude, "prefetch", None)
+            if prefetch:
+                prefetch(e.get("id") for e in entries if isinstance(e, dict))
             for e in entries:
                 if e is None or not isinstance(e, dict):
                     continue
@@ -184,6 +188,8 @@ class TikTokCollector(BaseCollector):
                         "view_count": view_count,
                         "likes": like_count,
                         "like_count": like_count,
+                        "timestamp": e.get("timestamp"),
+                        "upload_date": e.get("upload_date"),
                     },
                 })
                 return True
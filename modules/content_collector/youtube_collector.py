@@ -110,6 +110,10 @@ class YouTubeShortsCollector(BaseCollector):
         def process_entries(entries: list) -> bool:
             """Обработать entries, добавить первого подходящего. Возврат: добавили ли."""
             nonlocal results, seen_ids
+            # Проверить всю страницу одним запросом, если exclude умеет (KnownSourceIds)
+            prefetch = getattr(exclude, "prefetch", None)
+            if prefetch:
+                prefetch(e.get("id") for e in entries if isinstance(e, dict))
             for e in entries:
                 if e is None or not isinstance(e, dict):
                     continue
@@ -151,6 +155,8 @@ class YouTubeShortsCollector(BaseCollector):
                         "view_count": view_count,
                         "likes": like_count,
                         "like_count": like_count,
+                        "timestamp": e.get("timestamp"),
+                        "upload_date": e.get("upload_date"),
                     },
                 })
                 return True
@@ -1,4 +1,4 @@
 """Модуль управления тематиками и контентом."""
-from .manager import ContentManager
+from .manager import ContentManager, source_platform
 
-__all__ = ["ContentManager"]
+__all__ = ["ContentManager", "source_platform"]
@@ -0,0 +1,142 @@
+"""Пакетная запись найденных видео в БД."""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import exists, or_, select
+from sqlalchemy.orm import Session
+
+from database.counters import apply_status_deltas, count_inserted
+from database.models import ArchivedSourceKey, Video
+from database.sql import dialect_insert
+
+# Ограничение на число параметров в одном IN (...) — с запасом для старых SQLite (999).
+IN_CHUNK_SIZE = 500
+
+
+class KnownSourceIds:
+    """
+    Ленивый набор source_post_id, уже сохранённых в тематике (включая архив).
+
+    Вместо загрузки всех ID тематики в память проверяет кандидатов пачками:
+    ``prefetch(ids)`` — один запрос ``IN (...)`` на страницу поиска. Поддерживает
+    ``in`` и ``bool()``, поэтому передаётся в сборщики вместо обычного set
+    (параметр ``exclude_source_ids``).
+    """
+
+    def __init__(self, db: Session, topic_id: int):
+        self.db = db
+        self.topic_id = topic_id
+        self._known: Set[str] = set()
+        self._checked: Set[str] = set()
+        self._has_any: Optional[bool] = None
+
+    def prefetch(self, source_ids: Iterable[Optional[str]]) -> Set[str]:
+        """
+        Проверить пачку ID одним запросом (на чанк) и закешировать результат.
+
+        Returns:
+            Подмножество переданных ID, которые уже есть в БД
+        """
+        ids = {str(s) for s in source_ids if s}
+        pending = [sid for sid in ids if sid not in self._checked]
+        for i in range(0, len(pending), IN_CHUNK_SIZE):
+            chunk = pending[i:i + IN_CHUNK_SIZE]
+            rows = self.db.execute(
+                select(Video.source_post_id).where(
+                    Video.topic_id == self.topic_id,
+                    Video.source_post_id.in_(chunk),
+                )
+            ).scalars().all()
+            archived = self.db.execute(
+                select(ArchivedSourceKey.source_post_id).where(
+                    ArchivedSourceKey.topic_id == self.topic_id,
+                    ArchivedSourceKey.source_post_id.in_(chunk),
+                )
+            ).scalars().all()
+            self._known.update(rows)
+            self._known.update(archived)
+            self._checked.update(chunk)
+        return ids & self._known
+
+    def __contains__(self, source_id: object) -> bool:
+        if source_id is None:
+            return False
+        source_id = str(source_id)
+        if source_id not in self._checked:
+            self.prefetch([source_id])
+        return source_id in self._known
+
+    def __bool__(self) -> bool:
+        if self._has_any is None:
+            self._has_any = self.db.execute(select(or_(
+                exists().where(Video.topic_id == self.topic_id),
+                exists().where(ArchivedSourceKey.topic_id == self.topic_id),
+            ))).scalar()
+        return bool(self._has_any)
+
+
+def bulk_insert_videos(db: Session, rows: List[Dict[str, Any]]) -> List[Video]:
+    """
+    Вставить пачку видео одним INSERT ... ON CONFLICT DO NOTHING ... RETURNING.
+
+    На PostgreSQL и SQLite (3.35+) конфликт по уникальному индексу
+    (topic_id, source_post_id, source_platform) молча пропускается — это защищает
+    от гонки между параллельными сборщиками. Коммит остаётся за вызывающим.
+
+    Args:
+        db: Сессия БД
+        rows: Словари со значениями колонок Video (одинаковый набор ключей)
+
+    Returns:
+        Созданные объекты Video (без пропущенных дублей)
+    """
+    if not rows:
+        return []
+    # NULL в уникальном индексе ни с чем не совпадает — «без платформы» пишем как ""
+    rows = [{**row, "source_platform": row.get("source_platform") or ""} for row in rows]
+
+    insert = dialect_insert(db.get_bind().dialect.name)
+    if insert is None:
+        videos = [Video(**row) for row in rows]
+        db.add_all(videos)
+        db.flush()
+        return videos
+
+    stmt = insert(Video).on_conflict_do_nothing().returning(Video)
+    videos = list(db.scalars(stmt, rows).all())
+    # Массовый INSERT идёт мимо flush — счётчики статусов обновляем явно
+    apply_status_deltas(db.connection(), count_inserted(videos))
+    return videos
+
+
+def _find_video(db: Session, topic_id: int, source_id: str) -> Optional[Video]:
+    return db.execute(
+        select(Video).where(Video.topic_id == topic_id, Video.source_post_id == source_id)
+    ).scalars().first()
+
+
+def save_found_video(db: Session, row: Dict[str, Any]) -> Optional[Video]:
+    """
+    Сохранить одно найденное видео (тематические сборщики по одному URL).
+
+    Правила те же, что у пакетного сбора: уже сохранённое видео возвращается
+    как есть, ушедшее в архив (ArchivedSourceKey) заново не добавляется.
+    Коммит остаётся за вызывающим.
+
+    Args:
+        db: Сессия БД
+        row: Значения колонок Video (обязательны topic_id и source_post_id)
+
+    Returns:
+        Video из БД или None, если видео уже в архиве
+    """
+    topic_id, source_id = row["topic_id"], str(row["source_post_id"])
+    if source_id in KnownSourceIds(db, topic_id):
+        # None — видео осталось только в архиве
+        return _find_video(db, topic_id, source_id)
+    created = bulk_insert_videos(db, [row])
+    if created:
+        return created[0]
+    # Параллельный сборщик успел вставить это видео раньше
+    return _find_video(db, topic_id, source_id)
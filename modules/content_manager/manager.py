@@ -2,11 +2,15 @@
 from __future__ import annotations
 
 import os
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 from sqlalchemy.orm import Session
 from loguru import logger
 
+from database.events import file_size, record_video_event
+from database.leases import claim_videos, lease_heartbeat, lease_seconds, release_lease
+from database.source_metrics import source_metric_columns
 from database.models import (
     Topic, Account, ContentSource, Video, Schedule,
     VideoStatus, PlatformType
@@ -14,8 +18,23 @@ from database.models import (
 from modules.content_collector import InstagramCollector
 from modules.content_collector.tiktok_collector import TikTokCollector
 from modules.content_collector.youtube_collector import YouTubeShortsCollector
+from modules.monitoring import observe_download, profile_tags, record_span, span, video_trace_id
 from modules.video_processor import VideoProcessor
 from config import settings
+from .ingest import KnownSourceIds, bulk_insert_videos
+
+INSTAGRAM_SOURCE_TYPES = ("profile", "hashtag", "reels", "url_list", "keywords")
+
+
+def source_platform(source_type: str) -> Optional[str]:
+    """Платформа сбора для типа источника: instagram / youtube / tiktok (None — не поддерживается)."""
+    if source_type in INSTAGRAM_SOURCE_TYPES:
+        return "instagram"
+    if source_type == "youtube_shorts":
+        return "youtube"
+    if source_type == "tiktok":
+        return "tiktok"
+    return None
 
 
 class ContentManager:
@@ -176,35 +195,26 @@ class ContentManager:
         if not source or not source.is_active:
             return []
         
-        collector = None
-        platform = "instagram"
-        if source.source_type in ["profile", "hashtag", "reels", "url_list", "keywords"]:
+        platform = source_platform(source.source_type)
+        if platform == "instagram":
             collector = InstagramCollector(source)
-        elif source.source_type == "youtube_shorts":
+        elif platform == "youtube":
             proxy = getattr(settings, "YOUTUBE_PROXY", None) or settings.INSTAGRAM_PROXY
             collector = YouTubeShortsCollector(source, proxy=proxy)
-            platform = "youtube"
-        elif source.source_type == "tiktok":
+        elif platform == "tiktok":
             proxy = getattr(settings, "TIKTOK_PROXY", None) or getattr(settings, "YOUTUBE_PROXY", None) or settings.INSTAGRAM_PROXY
             collector = TikTokCollector(source, proxy=proxy)
-            platform = "tiktok"
         else:
             logger.warning(f"Неподдерживаемый тип источника: {source.source_type}")
             return []
 
-        exclude_ids: set[str] = set()
+        known_ids = KnownSourceIds(self.db, source.topic_id)
+        collect_started = time.time()
         if platform in ("youtube", "tiktok"):
-            rows = self.db.query(Video.source_post_id).filter(
-                Video.topic_id == source.topic_id,
-                Video.source_post_id.isnot(None),
-            ).all()
-            exclude_ids = {r[0] for r in rows if r[0]}
-
-        if platform in ("youtube", "tiktok") and exclude_ids:
-            videos_info = collector.collect_videos(limit=limit, exclude_source_ids=exclude_ids)
+            videos_info = collector.collect_videos(limit=limit, exclude_source_ids=known_ids)
         else:
             videos_info = collector.collect_videos(limit=limit)
-        created_videos = []
+        collector_finished = time.time()
 
         min_views = source.min_views
         min_likes = source.min_likes
@@ -220,6 +230,7 @@ class ContentManager:
             min_views = min_views or 1_000_000
             min_likes = min_likes if min_likes is not None else 10000
 
+        candidates = []
         for video_info in videos_info:
             is_valid, error_msg = collector.validate_video(
                 video_info, min_views=min_views, min_likes=min_likes
@@ -227,36 +238,50 @@ class ContentManager:
             if not is_valid:
                 logger.debug(f"Видео не прошло валидацию: {error_msg}")
                 continue
+            candidates.append(video_info)
 
-            existing = self.db.query(Video).filter(
-                Video.source_post_id == video_info["source_post_id"],
-                Video.topic_id == source.topic_id,
-            ).first()
-            if existing:
+        # Один запрос IN (...) на всю пачку кандидатов вместо SELECT на каждое видео
+        existing_ids = known_ids.prefetch(v["source_post_id"] for v in candidates)
+        rows = []
+        batch_ids: set[str] = set()
+        for video_info in candidates:
+            post_id = str(video_info["source_post_id"])
+            if post_id in existing_ids or post_id in batch_ids:
                 continue
+            batch_ids.add(post_id)
+            rows.append({
+                "topic_id": source.topic_id,
+                "status": VideoStatus.FOUND,
+                "source_url": video_info["source_url"],
+                "source_platform": platform,
+                "source_post_id": post_id,
+                "source_author": video_info["source_author"],
+                "title": video_info.get("title"),
+                "description": video_info.get("description"),
+                "tags": video_info.get("tags", []),
+                "duration": video_info.get("duration"),
+                "metadata_json": video_info.get("metadata", {}),
+                **source_metric_columns(video_info.get("metadata")),
+            })
+
+        created_videos = bulk_insert_videos(self.db, rows)
 
-            video = Video(
-                topic_id=source.topic_id,
-                status=VideoStatus.FOUND,
-                source_url=video_info["source_url"],
-                source_platform=platform,
-                source_post_id=video_info["source_post_id"],
-                source_author=video_info["source_author"],
-                title=video_info.get("title"),
-                description=video_info.get("description"),
-                tags=video_info.get("tags", []),
-                duration=video_info.get("duration"),
-                metadata_json=video_info.get("metadata", {}),
-            )
-            self.db.add(video)
-            created_videos.append(video)
-        
-        self.db.commit()
-        
         # Обновляем время последней проверки источника
         source.last_check = datetime.utcnow()
         self.db.commit()
         
+        # Трасса видео начинается со сбора: спан на весь запуск источника у каждого нового видео
+        collect_finished = time.time()
+        for video in created_videos:
+            span_id = record_span(
+                "collect", video.trace_id, collect_started, collect_finished,
+                video_id=video.id, topic_id=video.topic_id, source_id=source.id, platform=platform,
+            )
+            record_span(
+                f"{type(collector).__name__}.collect_videos", video.trace_id,
+                collect_started, collector_finished, parent_id=span_id, found=len(videos_info),
+            )
+        
         return created_videos
     
     def download_video(self, video_id: int) -> bool:
@@ -297,16 +322,45 @@ class ContentManager:
         filename = f"{video.source_post_id}.mp4"
         download_path = settings.DOWNLOADS_DIR / str(video.topic_id) / filename
 
+        # Аренда видит и другие воркеры: коммитим её до начала скачивания
+        lease_for = lease_seconds("download")
+        if not claim_videos(self.db, VideoStatus.FOUND, lease_for, video_ids=[video.id]):
+            logger.warning(f"Видео {video_id} уже скачивает другой воркер")
+            return False
+        self.db.commit()
+
+        from_status = video.status
+        started = time.perf_counter()
         video.status = VideoStatus.DOWNLOADED
         video.original_file_path = str(download_path)
 
-        if collector.download_video(video.source_url, str(download_path)):
+        with span(
+            "download", video_trace_id(video),
+            video_id=video.id, topic_id=video.topic_id, platform=source_platform(source.source_type),
+        ) as download_span, profile_tags(video=video.id, topic=video.topic_id), \
+                lease_heartbeat(self.db, video.id, lease_for):
+            downloaded = collector.download_video(video.source_url, str(download_path))
+            if not downloaded:
+                download_span["error"] = "Ошибка скачивания"
+        download_seconds = time.perf_counter() - started
+        release_lease(video)
+        if downloaded:
             video.downloaded_at = datetime.utcnow()
+            size = file_size(str(download_path))
+            observe_download(source_platform(source.source_type), size, download_seconds)
+            record_video_event(
+                self.db, video, "download", from_status, started,
+                bytes_touched=size,
+            )
             self.db.commit()
             return True
         else:
             video.status = VideoStatus.ERROR
             video.error_message = "Ошибка скачивания"
+            record_video_event(
+                self.db, video, "download", from_status, started,
+                error_message=video.error_message,
+            )
             self.db.commit()
             return False
     
@@ -332,14 +386,29 @@ class ContentManager:
         filename = f"{video.source_post_id}_processed.mp4"
         processed_path = settings.PROCESSED_DIR / str(video.topic_id) / filename
         
-        # Обрабатываем
-        video.status = VideoStatus.PROCESSING
+        # Обрабатываем: DOWNLOADED → PROCESSING атомарно, вместе с арендой
+        lease_for = lease_seconds("process", video.duration)
+        if not claim_videos(
+            self.db, VideoStatus.DOWNLOADED, lease_for,
+            video_ids=[video.id], set_status=VideoStatus.PROCESSING,
+        ):
+            logger.warning(f"Видео {video_id} уже обрабатывает другой воркер")
+            return False
+        record_video_event(self.db, video, "process", VideoStatus.DOWNLOADED)
         self.db.commit()
         
-        success, error_msg = processor.process_video(
-            video.original_file_path,
-            str(processed_path)
-        )
+        started = time.perf_counter()
+        with span(
+            "process", video_trace_id(video), video_id=video.id, topic_id=video.topic_id,
+        ) as process_span, profile_tags(video=video.id, topic=video.topic_id), \
+                lease_heartbeat(self.db, video.id, lease_for):
+            success, error_msg = processor.process_video(
+                video.original_file_path,
+                str(processed_path)
+            )
+            if not success:
+                process_span["error"] = error_msg or "Ошибка обработки"
+        release_lease(video)
         
         if success:
             video.status = VideoStatus.PROCESSED
@@ -351,10 +420,18 @@ class ContentManager:
             video.duration = info.get("duration")
             video.resolution = info.get("resolution")
             
+            record_video_event(
+                self.db, video, "process", VideoStatus.PROCESSING, started,
+                bytes_touched=(file_size(video.original_file_path) or 0) + (file_size(str(processed_path)) or 0),
+            )
             self.db.commit()
             return True
         else:
             video.status = VideoStatus.ERROR
             video.error_message = error_msg or "Ошибка обработки"
+            record_video_event(
+                self.db, video, "process", VideoStatus.PROCESSING, started,
+                error_message=video.error_message,
+            )
             self.db.commit()
             return False
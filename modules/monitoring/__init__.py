@@ -0,0 +1,24 @@
+"""Модуль мониторинга: метрики Prometheus, выборочное профилирование и трассировка."""
+from .metrics import counter, histogram, register_collector, render, start_metrics_server
+from .instruments import install_metrics, observe_download, observe_encode
+from .profiling import profile_tags, profiled
+from .tracing import SpanExporter, record_span, set_exporter, span, traced, video_trace_id
+
+__all__ = [
+    "counter",
+    "histogram",
+    "register_collector",
+    "render",
+    "start_metrics_server",
+    "install_metrics",
+    "observe_download",
+    "observe_encode",
+    "profile_tags",
+    "profiled",
+    "SpanExporter",
+    "record_span",
+    "set_exporter",
+    "span",
+    "traced",
+    "video_trace_id",
+]
@@ -0,0 +1,238 @@
+"""Метрики конвейера и хуки, которые их наполняют.
+
+Стадии видео (download/process/publish) меряются по событиям video_events,
+запросы к БД — событиями движка SQLAlchemy, задачи — сигналами Celery.
+Скорость кодирования и скачивания сообщают VideoProcessor и ContentManager
+через :func:`observe_encode` и :func:`observe_download`.
+"""
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import event
+
+from .metrics import counter, histogram, register_collector, start_metrics_server
+
+STAGE_DURATION = histogram(
+    "content_zavod_stage_duration_seconds",
+    "Длительность стадии видео (по журналу video_events)",
+    ["stage", "outcome"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600),
+)
+ENCODE_FPS = histogram(
+    "content_zavod_encode_fps",
+    "Скорость кодирования VideoProcessor, кадров в секунду",
+    ["topic"],
+    buckets=(2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240),
+)
+OUTPUT_BITRATE = histogram(
+    "content_zavod_output_bitrate_bps",
+    "Средний битрейт обработанного файла, бит/с",
+    ["topic"],
+    buckets=(5e5, 1e6, 2e6, 4e6, 6e6, 8e6, 12e6, 16e6, 24e6),
+)
+DOWNLOAD_BYTES = counter(
+    "content_zavod_download_bytes_total",
+    "Скачано сборщиками, байт",
+    ["platform"],
+)
+DOWNLOAD_SPEED = histogram(
+    "content_zavod_download_bytes_per_second",
+    "Скорость скачивания одного видео сборщиком, байт/с",
+    ["platform"],
+    buckets=(64e3, 256e3, 1e6, 2e6, 4e6, 8e6, 16e6, 32e6, 64e6),
+)
+TASKS = counter(
+    "content_zavod_celery_tasks_total",
+    "Завершённые задачи Celery по итоговому состоянию",
+    ["task", "state"],
+)
+TASK_FAILURES = counter(
+    "content_zavod_celery_task_failures_total",
+    "Задачи Celery, завершившиеся исключением",
+    ["task"],
+)
+TASK_DURATION = histogram(
+    "content_zavod_celery_task_duration_seconds",
+    "Время выполнения задачи Celery",
+    ["task"],
+    buckets=(0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+DB_QUERIES = counter(
+    "content_zavod_db_queries_total",
+    "Запросы к БД по типу оператора",
+    ["operation"],
+)
+DB_QUERY_DURATION = histogram(
+    "content_zavod_db_query_duration_seconds",
+    "Время выполнения запроса к БД",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+CELERY_QUEUES = ("celery", "download", "encode", "youtube", "tiktok", "instagram")
+
+_installed = False
+_task_started: dict = {}
+
+
+def observe_encode(topic_id: object, frames: float, encode_seconds: float, output_path: str, duration: Optional[float]) -> None:
+    """
+    Учесть кодирование одного ролика.
+
+    Args:
+        topic_id: Тематика (метка topic)
+        frames: Закодировано кадров
+        encode_seconds: Время записи файла
+        output_path: Готовый файл (для битрейта)
+        duration: Длительность ролика, секунды
+    """
+    if encode_seconds > 0 and frames:
+        ENCODE_FPS.observe(frames / encode_seconds, topic=topic_id)
+    try:
+        size = Path(output_path).stat().st_size
+    except OSError:
+        return
+    if duration:
+        OUTPUT_BITRATE.observe(size * 8 / duration, topic=topic_id)
+
+
+def observe_download(platform: Optional[str], bytes_downloaded: Optional[int], seconds: float) -> None:
+    """Учесть одно скачивание сборщиком."""
+    if not bytes_downloaded:
+        return
+    platform = platform or "unknown"
+    DOWNLOAD_BYTES.inc(bytes_downloaded, platform=platform)
+    if seconds > 0:
+        DOWNLOAD_SPEED.observe(bytes_downloaded / seconds, platform=platform)
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def instrument_engine(engine) -> None:
+    """Считать запросы движка и их время."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if not started:
+            return
+        operation = _operation(statement)
+        DB_QUERIES.inc(operation=operation)
+        DB_QUERY_DURATION.observe(time.perf_counter() - started.pop(), operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def _instrument_video_events() -> None:
+    from database.models import VideoEvent
+
+    @event.listens_for(VideoEvent, "after_insert")
+    def _stage_finished(mapper, connection, target):
+        if target.duration is None:
+            return
+        outcome = target.to_status.value if target.to_status is not None else "unknown"
+        STAGE_DURATION.observe(target.duration, stage=target.stage, outcome=outcome)
+
+
+def instrument_celery() -> None:
+    """Время и исход задач Celery; экспортёр — в главном процессе воркера."""
+    from celery import signals
+
+    @signals.task_prerun.connect(weak=False)
+    def _task_prerun(task_id=None, **kwargs):
+        _task_started[task_id] = time.perf_counter()
+
+    @signals.task_postrun.connect(weak=False)
+    def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+        started = _task_started.pop(task_id, None)
+        name = getattr(task, "name", "unknown")
+        TASKS.inc(task=name, state=state or "UNKNOWN")
+        if started is not None:
+            TASK_DURATION.observe(time.perf_counter() - started, task=name)
+
+    @signals.task_failure.connect(weak=False)
+    def _task_failure(sender=None, **kwargs):
+        TASK_FAILURES.inc(task=getattr(sender, "name", "unknown"))
+
+    @signals.worker_ready.connect(weak=False)
+    def _worker_ready(**kwargs):
+        start_metrics_server()
+
+
+def _video_status_samples():
+    from database import SessionLocal, get_status_counts
+
+    db = SessionLocal()
+    try:
+        counts = get_status_counts(db)
+    finally:
+        db.close()
+    return [((str(topic_id), status.value), n) for (topic_id, status), n in counts.items()]
+
+
+def _queue_length_samples():
+    from modules.scheduler.locks import get_redis
+
+    client = get_redis()
+    if client is None:
+        return []
+    return [((queue,), client.llen(queue)) for queue in CELERY_QUEUES]
+
+
+def _lock_stat_samples():
+    from modules.scheduler.locks import get_lock_stats
+
+    return [
+        ((scope, name), value)
+        for scope, stats in get_lock_stats().items()
+        for name, value in stats.items()
+    ]
+
+
+def install_metrics(celery: bool = False) -> None:
+    """
+    Подключить хуки метрик (повторный вызов ничего не делает).
+
+    Args:
+        celery: Мерить задачи Celery и поднимать экспортёр при старте воркера
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    from database import engine
+
+    instrument_engine(engine)
+    _instrument_video_events()
+    if celery:
+        instrument_celery()
+
+    register_collector(
+        "content_zavod_videos", "Видео по тематикам и статусам (video_status_counters)",
+        ["topic", "status"], _video_status_samples,
+    )
+    register_collector(
+        "content_zavod_celery_queue_length", "Задач в очереди брокера (Redis)",
+        ["queue"], _queue_length_samples,
+    )
+    register_collector(
+        "content_zavod_lock_stats", "Статистика распределённых блокировок (см. get_lock_stats)",
+        ["scope", "stat"], _lock_stat_samples,
+    )
+    logger.debug("Метрики подключены")
@@ -0,0 +1,442 @@
+"""Реестр метрик и HTTP-экспортёр в текстовом формате Prometheus.
+
+Без внешних зависимостей: счётчики и гистограммы копятся в памяти процесса.
+Процессов у системы несколько (main.py, beat, родитель и дочерние процессы
+воркеров Celery), поэтому каждый раз в несколько секунд сбрасывает снимок
+своих значений в ``METRICS_DIR/<pid>-<время старта>.json`` (время старта
+отличает процесс, получивший pid умершего). Экспортёр на запрос ``/metrics``
+складывает снимки всех процессов и добавляет значения, снятые в момент
+запроса (:func:`register_collector` — например, видео по статусам из БД).
+Снимки завершившихся процессов он переносит в ``aggregate.json`` и удаляет,
+так что каталог не растёт, а счётчики умерших процессов не теряются.
+Каталог должен быть своим у каждой машины (контейнера): живость процесса
+проверяется по pid.
+
+Экспортёр поднимает тот процесс, что первым занял ``METRICS_PORT``; остальные
+только пишут снимки, так что main.py и воркеры на одной машине не конфликтуют.
+"""
+from __future__ import annotations
+
+import atexit
+import bisect
+import json
+import multiprocessing.util
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from config import settings
+
+AGGREGATE_FILE = "aggregate.json"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[LabelValues, float]
+# Снятие значений в момент запроса: () -> [(значения меток, число)]
+CollectorFunc = Callable[[], Iterable[Sample]]
+
+
+def get_metrics_dir() -> Path:
+    """Каталог снимков процессов (METRICS_DIR или LOGS_DIR/metrics)."""
+    path = getattr(settings, "METRICS_DIR", None)
+    path = Path(path) if path else Path(settings.LOGS_DIR) / "metrics"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _process_token() -> int:
+    return int(time.time() * 1000)
+
+
+def _pid_alive(pid: int, started_ms: Optional[int]) -> bool:
+    """Жив ли процесс снимка (не умер и pid не достался другому процессу)."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            created = psutil.Process(pid).create_time()
+        except psutil.NoSuchProcess:
+            return False
+        except psutil.Error:
+            return True
+        # Процесс создан позже, чем был записан снимок, — pid уже чужой
+        return started_ms is None or created <= started_ms / 1000 + 1
+    if os.name == "nt":
+        # os.kill(pid, 0) на Windows завершает процесс; без psutil не проверяем
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _label_values(metric: "_Metric", labels: Dict[str, object]) -> LabelValues:
+    return tuple(str(labels.get(name, "")) for name in metric.labels)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, object] = {}
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.kind,
+            "help": self.help,
+            "labels": list(self.labels),
+            "samples": [[list(key), value] for key, value in self._values.items()],
+        }
+
+
+class Counter(_Metric):
+    """Монотонный счётчик."""
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_values(self, labels)
+        with REGISTRY.lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        REGISTRY.touch()
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными границами корзин."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_values(self, labels)
+        # Последняя корзина — +Inf
+        index = bisect.bisect_left(self.buckets, value)
+        with REGISTRY.lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+        REGISTRY.touch()
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """Метрики процесса и их периодический сброс на диск."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, _Metric] = {}
+        self.collectors: List[Tuple[str, str, str, Tuple[str, ...], CollectorFunc]] = []
+        self._dirty = False
+        self._flusher_pid: Optional[int] = None
+        self._started_ms = _process_token()
+
+    def register(self, metric: _Metric) -> _Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def touch(self) -> None:
+        """Отметить изменение и запустить фоновый сброс (один поток на процесс)."""
+        self._dirty = True
+        if self._flusher_pid != os.getpid():
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+            # Дочерние процессы multiprocessing выходят через os._exit, минуя atexit
+            multiprocessing.util.Finalize(self, self.flush_if_dirty, exitpriority=10)
+
+    def _flush_loop(self) -> None:
+        interval = float(getattr(settings, "METRICS_FLUSH_SECONDS", 5))
+        while True:
+            time.sleep(interval)
+            self.flush_if_dirty()
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def flush_if_dirty(self) -> None:
+        if self._dirty:
+            self.flush()
+
+    def flush(self) -> None:
+        """Записать снимок процесса в METRICS_DIR (атомарно, через временный файл)."""
+        try:
+            self._dirty = False
+            path = get_metrics_dir() / f"{os.getpid()}-{self._started_ms}.json"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить снимок метрик: {e}")
+
+    def reset_after_fork(self) -> None:
+        """В дочернем процессе — с нуля: значения родителя уже учтены в его снимке."""
+        self.lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric._values = {}
+        self._dirty = False
+        self._flusher_pid = None
+        self._started_ms = _process_token()
+
+
+REGISTRY = MetricsRegistry()
+os.register_at_fork(after_in_child=REGISTRY.reset_after_fork)
+atexit.register(REGISTRY.flush_if_dirty)
+
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    """Объявить счётчик (повторное объявление возвращает уже созданный)."""
+    return REGISTRY.register(Counter(name, help_text, labels))
+
+
+def histogram(
+    name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    """Объявить гистограмму (повторное объявление возвращает уже созданную)."""
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))
+
+
+def register_collector(
+    name: str, help_text: str, labels: Sequence[str], func: CollectorFunc, kind: str = "gauge"
+) -> None:
+    """
+    Метрика, снимаемая экспортёром в момент запроса.
+
+    Args:
+        name: Имя метрики
+        help_text: Описание
+        labels: Имена меток
+        func: () -> [(значения меток, число)]
+        kind: Тип для Prometheus (gauge / counter)
+    """
+    if any(existing[0] == name for existing in REGISTRY.collectors):
+        return
+    REGISTRY.collectors.append((name, help_text, kind, tuple(labels), func))
+
+
+def _merge(total: Dict[str, dict], snapshot: Dict[str, dict]) -> None:
+    for name, data in snapshot.items():
+        merged = total.setdefault(name, {**data, "samples": {}})
+        if merged["type"] != data["type"]:
+            continue
+        for labels, value in data["samples"]:
+            key = tuple(labels)
+            if data["type"] == "histogram":
+                if merged.get("buckets") != data.get("buckets"):
+                    continue
+                current = merged["samples"].get(key)
+                if current is None:
+                    merged["samples"][key] = {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]}
+                else:
+                    current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+            else:
+                merged["samples"][key] = merged["samples"].get(key, 0.0) + value
+
+
+def _to_snapshot(total: Dict[str, dict]) -> Dict[str, dict]:
+    """Обратно из результата _merge в формат снимка процесса."""
+    return {
+        name: {**data, "samples": [[list(key), value] for key, value in data["samples"].items()]}
+        for name, data in total.items()
+    }
+
+
+def _read_snapshot(path: Path) -> Optional[Dict[str, dict]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Пропущен повреждённый снимок метрик {path.name}: {e}")
+        return None
+
+
+def _snapshot_owner(path: Path) -> Optional[Tuple[int, Optional[int]]]:
+    """(pid, время старта в мс) из имени снимка; старые снимки — <pid>.json."""
+    pid, _, started = path.stem.partition("-")
+    if not pid.isdigit():
+        return None
+    return int(pid), int(started) if started.isdigit() else None
+
+
+_FOLD_LOCK = threading.Lock()
+
+
+def fold_dead_snapshots(metrics_dir: Optional[Path] = None) -> int:
+    """
+    Перенести снимки завершившихся процессов в AGGREGATE_FILE и удалить их.
+
+    Как mark_process_dead в prometheus_client: значения умерших процессов
+    остаются в сумме, а файлов не становится больше, чем живых процессов.
+
+    Returns:
+        Сколько снимков перенесено
+    """
+    metrics_dir = metrics_dir or get_metrics_dir()
+    with _FOLD_LOCK:
+        by_pid: Dict[int, List[Tuple[int, Path]]] = {}
+        for path in metrics_dir.glob("*.json"):
+            owner = _snapshot_owner(path)
+            if owner is not None:
+                pid, started = owner
+                by_pid.setdefault(pid, []).append((started or 0, path))
+        dead = []
+        for pid, snapshots in by_pid.items():
+            snapshots.sort()
+            # У pid жив не больше чем последний запустившийся процесс
+            dead.extend(path for _, path in snapshots[:-1])
+            started, path = snapshots[-1]
+            if not _pid_alive(pid, started or None):
+                dead.append(path)
+        if not dead:
+            return 0
+
+        aggregate_path = metrics_dir / AGGREGATE_FILE
+        total: Dict[str, dict] = {}
+        if aggregate_path.exists():
+            aggregate = _read_snapshot(aggregate_path)
+            if aggregate is None:
+                # Повреждённый итог не перезаписываем — разбираться вручную
+                return 0
+            _merge(total, aggregate)
+        folded = []
+        for path in dead:
+            snapshot = _read_snapshot(path)
+            if snapshot is not None:
+                _merge(total, snapshot)
+                folded.append(path)
+        tmp = aggregate_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(_to_snapshot(total)), encoding="utf-8")
+        os.replace(tmp, aggregate_path)
+        for path in folded:
+            path.unlink(missing_ok=True)
+    return len(folded)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render() -> str:
+    """Текст для /metrics: снимки всех процессов плюс значения в момент запроса."""
+    REGISTRY.flush()
+    metrics_dir = get_metrics_dir()
+    try:
+        fold_dead_snapshots(metrics_dir)
+    except Exception as e:
+        logger.warning(f"Не удалось свернуть снимки завершившихся процессов: {e}")
+    total: Dict[str, dict] = {}
+    for path in sorted(metrics_dir.glob("*.json")):
+        snapshot = _read_snapshot(path)
+        if snapshot is not None:
+            _merge(total, snapshot)
+
+    lines: List[str] = []
+    for name in sorted(total):
+        data = total[name]
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        labels = data["labels"]
+        for key, value in sorted(data["samples"].items()):
+            if data["type"] == "histogram":
+                cumulative = 0
+                bounds = list(data["buckets"]) + [float("inf")]
+                for bound, count in zip(bounds, value["counts"]):
+                    cumulative += count
+                    le = _format_number(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels, key, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels, key)} {_format_number(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels, key)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels, key)} {_format_number(value)}")
+
+    for name, help_text, kind, labels, func in REGISTRY.collectors:
+        try:
+            samples = list(func())
+        except Exception as e:
+            logger.warning(f"Метрика {name} не снята: {e}")
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in samples:
+            lines.append(f"{name}{_format_labels(labels, key)} {_format_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Поднять экспортёр /metrics в фоновом потоке.
+
+    Args:
+        port: Порт (по умолчанию METRICS_PORT, 9464; 0 — экспортёр выключен)
+        host: Адрес (по умолчанию METRICS_HOST, 127.0.0.1)
+
+    Returns:
+        Сервер или None, если порт уже занят (метрики отдаёт другой процесс) либо экспортёр выключен
+    """
+    port = int(getattr(settings, "METRICS_PORT", 9464) if port is None else port)
+    host = host or getattr(settings, "METRICS_HOST", "127.0.0.1")
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.info(f"Экспортёр метрик не запущен ({host}:{port}: {e}) — снимки отдаёт другой процесс")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Метрики Prometheus: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,132 @@
+"""Выборочное профилирование горячих путей (cProfile).
+
+Включается переменной окружения ``PROFILE_SAMPLE_RATE`` (или одноимённой
+настройкой): доля профилируемых вызовов от 0 до 1, по умолчанию 0 — выключено.
+При 0.01 профилируется примерно каждый сотый вызов, остальные идут без накладных
+расходов, поэтому профилировщик можно держать включённым в продакшене.
+
+Каждый профилированный вызов — отдельный файл pstats в ``PROFILE_DIR``
+(по умолчанию LOGS_DIR/profiles)::
+
+    <имя>/<время>_video<id>_topic<id>_<pid>.prof
+
+Смотреть: ``python -m pstats файл`` или snakeviz. ``PROFILE_MIN_SECONDS``
+отбрасывает быстрые вызовы. Метки video/topic берутся из
+:func:`profile_tags` (его выставляют ContentManager и пакетная обработка)
+и из функции ``tags`` декоратора.
+
+Одновременно профилируется только один вызов в процессе (cProfile не
+допускает вложенных и параллельных профилировщиков) — остальные в это время
+просто выполняются.
+"""
+from __future__ import annotations
+
+import cProfile
+import functools
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from loguru import logger
+
+from config import settings
+
+# Метки текущего вызова (video, topic), выставляются выше по стеку
+_tags: ContextVar[Dict[str, Any]] = ContextVar("profile_tags", default={})
+_profiler_lock = threading.Lock()
+
+
+def _setting(name: str, default: Any) -> Any:
+    return os.environ.get(name) or getattr(settings, name, None) or default
+
+
+def sample_rate() -> float:
+    """Доля профилируемых вызовов (PROFILE_SAMPLE_RATE, 0 — выключено)."""
+    try:
+        return float(_setting("PROFILE_SAMPLE_RATE", 0))
+    except ValueError:
+        return 0.0
+
+
+def get_profile_dir() -> Path:
+    """Каталог файлов профилей (PROFILE_DIR или LOGS_DIR/profiles)."""
+    return Path(_setting("PROFILE_DIR", Path(settings.LOGS_DIR) / "profiles"))
+
+
+@contextmanager
+def profile_tags(**tags: Any) -> Iterator[None]:
+    """Добавить метки (video=..., topic=...) профилям вызовов внутри блока."""
+    token = _tags.set({**_tags.get(), **{k: v for k, v in tags.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def _file_name(tags: Dict[str, Any]) -> str:
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S_%f")
+    parts = [stamp] + [f"{key}{tags[key]}" for key in sorted(tags)] + [str(os.getpid())]
+    return re.sub(r"[^\w.-]", "-", "_".join(parts)) + ".prof"
+
+
+def _save(profiler: cProfile.Profile, name: str, tags: Dict[str, Any], elapsed: float) -> None:
+    if elapsed < float(_setting("PROFILE_MIN_SECONDS", 0)):
+        return
+    try:
+        directory = get_profile_dir() / name
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / _file_name(tags)
+        profiler.dump_stats(str(path))
+        logger.debug(f"Профиль {name} ({elapsed:.2f} с) сохранён: {path}")
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить профиль {name}: {e}")
+
+
+def profiled(name: str, tags: Optional[Callable[..., Dict[str, Any]]] = None) -> Callable:
+    """
+    Декоратор: выборочно профилировать вызовы функции.
+
+    Args:
+        name: Имя профиля (подкаталог в PROFILE_DIR)
+        tags: (*args, **kwargs) -> метки вызова, например {"topic": self.topic.id}
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rate = sample_rate()
+            if rate <= 0 or random.random() >= rate or not _profiler_lock.acquire(blocking=False):
+                return func(*args, **kwargs)
+            try:
+                call_tags = dict(_tags.get())
+                if tags is not None:
+                    try:
+                        call_tags.update({k: v for k, v in tags(*args, **kwargs).items() if v is not None})
+                    except Exception:
+                        pass
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Профилировщик уже включён кем-то ещё (отладчик, coverage)
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profiler.disable()
+                    _save(profiler, name, call_tags, time.perf_counter() - started)
+            finally:
+                _profiler_lock.release()
+
+        wrapper.__profiled__ = True
+        return wrapper
+
+    return decorator
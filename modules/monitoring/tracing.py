@@ -0,0 +1,353 @@
+"""Трассировка жизненного цикла видео: сбор → скачивание → обработка → публикация.
+
+У каждого видео есть ``trace_id`` (колонка videos.trace_id, задаётся при вставке).
+Стадии открывают спаны через :func:`span`; вложенные спаны (скачивание
+сборщиком, кодирование) берут трассу и родителя из контекста, а без открытой
+трассы ничего не пишут. Стадии, замеренные задним числом (сбор — одним вызовом
+на всю пачку, пакетная обработка — в дочернем процессе), пишутся через
+:func:`record_span`.
+
+Готовые спаны уходят экспортёру. По умолчанию — JSON Lines в ``TRACE_DIR``
+(LOGS_DIR/traces), файл на сутки UTC. Свой экспортёр: ``TRACE_EXPORTER =
+"пакет.модуль:Класс"`` (класс с методом ``export(span: dict)``), ``"none"`` —
+трассировка выключена. Разбор трасс — scripts/trace_report.py.
+"""
+from __future__ import annotations
+
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+from database.events import get_worker_id
+from database.models import new_trace_id
+
+SpanDict = Dict[str, Any]
+
+# (trace_id, span_id) открытого спана текущего контекста
+_current: ContextVar[Optional[Tuple[str, str]]] = ContextVar("trace_span", default=None)
+
+
+class SpanExporter:
+    """Получатель готовых спанов."""
+
+    def export(self, span: SpanDict) -> None:
+        raise NotImplementedError
+
+
+class NullExporter(SpanExporter):
+    """Трассировка выключена."""
+
+    def export(self, span: SpanDict) -> None:
+        pass
+
+
+class JsonlExporter(SpanExporter):
+    """Спаны строками JSON в файлах ``spans-YYYYMMDD.jsonl`` (дописываются, O_APPEND)."""
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else get_trace_dir()
+        self._lock = threading.Lock()
+
+    def export(self, span: SpanDict) -> None:
+        day = datetime.utcfromtimestamp(span["start"]).strftime("%Y%m%d")
+        line = json.dumps(span, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / f"spans-{day}.jsonl", "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def get_trace_dir() -> Path:
+    """Каталог JSONL-файлов трасс (TRACE_DIR или LOGS_DIR/traces)."""
+    path = getattr(settings, "TRACE_DIR", None)
+    return Path(path) if path else Path(settings.LOGS_DIR) / "traces"
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def _load_exporter() -> SpanExporter:
+    name = os.environ.get("TRACE_EXPORTER") or getattr(settings, "TRACE_EXPORTER", None) or "jsonl"
+    if name == "jsonl":
+        return JsonlExporter()
+    if name == "none":
+        return NullExporter()
+    module_name, _, class_name = name.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), class_name)()
+    except Exception as e:
+        logger.warning(f"Экспортёр трасс {name} не загружен ({e}) — пишу в JSONL")
+        return JsonlExporter()
+
+
+def get_exporter() -> SpanExporter:
+    """Текущий экспортёр (из TRACE_EXPORTER при первом обращении)."""
+    global _exporter
+    if _exporter is None:
+        _exporter = _load_exporter()
+    return _exporter
+
+
+def set_exporter(exporter: Optional[SpanExporter]) -> None:
+    """Заменить экспортёр (None — снова взять из настроек)."""
+    global _exporter
+    _exporter = exporter
+
+
+def _export(
+    name: str,
+    trace_id: str,
+    span_id: str,
+    parent_id: Optional[str],
+    start: float,
+    end: float,
+    error: Optional[str],
+    attrs: Dict[str, Any],
+) -> None:
+    try:
+        get_exporter().export({
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "name": name,
+            "start": start,
+            "end": end,
+            "duration": end - start,
+            "status": "error" if error else "ok",
+            "error": error,
+            "worker": get_worker_id(),
+            "attrs": {k: v for k, v in attrs.items() if v is not None},
+        })
+    except Exception as e:
+        logger.warning(f"Спан {name} не экспортирован: {e}")
+
+
+def video_trace_id(video) -> str:
+    """trace_id видео; у видео, собранных до трассировки, заводится здесь (сохранит commit стадии)."""
+    if not video.trace_id:
+        video.trace_id = new_trace_id()
+    return video.trace_id
+
+
+def record_span(
+    name: str,
+    trace_id: Optional[str],
+    start: float,
+    end: float,
+    parent_id: Optional[str] = None,
+    error: Optional[str] = None,
+    **attrs: Any,
+) -> Optional[str]:
+    """
+    Записать уже завершённый спан.
+
+    Args:
+        name: Имя спана (collect, download, process, publish, ...)
+        trace_id: Трасса (None — ничего не пишется)
+        start: Начало, unix-время
+        end: Конец, unix-время
+        parent_id: Родительский спан
+        error: Текст ошибки
+        **attrs: Атрибуты (video_id, topic_id, ...)
+
+    Returns:
+        span_id или None
+    """
+    if not trace_id:
+        return None
+    span_id = uuid.uuid4().hex[:16]
+    _export(name, trace_id, span_id, parent_id, start, end, error, attrs)
+    return span_id
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Открыть спан на время блока.
+
+    Без trace_id продолжает трассу открытого спана (становится его потомком);
+    если открытого нет — ничего не пишет. Исключение помечает спан ошибкой.
+    В возвращаемый словарь можно дописать атрибуты, а ключ ``error`` — пометить
+    спан ошибкой без исключения.
+    """
+    parent = _current.get()
+    parent_id = None
+    if trace_id is None and parent is not None:
+        trace_id, parent_id = parent
+    elif parent is not None and parent[0] == trace_id:
+        parent_id = parent[1]
+
+    extra: Dict[str, Any] = dict(attrs)
+    if not trace_id:
+        yield extra
+        return
+
+    span_id = uuid.uuid4().hex[:16]
+    token = _current.set((trace_id, span_id))
+    start = time.time()
+    error = None
+    try:
+        yield extra
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        error = error or extra.pop("error", None)
+        _export(name, trace_id, span_id, parent_id, start, time.time(), error, extra)
+
+
+def traced(name: str) -> Callable:
+    """Декоратор: дочерний спан вокруг вызова (только внутри открытой трассы)."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def read_spans(
+    since: Optional[datetime] = None,
+    trace_ids: Optional[Iterable[str]] = None,
+    directory: Optional[Path] = None,
+) -> List[SpanDict]:
+    """
+    Прочитать спаны из JSONL-файлов.
+
+    С since трассы отбираются целиком: берутся трассы, у которых хоть один спан
+    закончился после since, и все их спаны, включая более ранние. Поэтому
+    читаются все файлы, но в памяти копятся только спаны отобранных трасс.
+
+    Args:
+        since: Только трассы, активные после этого момента (UTC)
+        trace_ids: Только эти трассы
+        directory: Каталог (по умолчанию TRACE_DIR)
+    """
+    directory = Path(directory) if directory else get_trace_dir()
+    wanted = set(trace_ids) if trace_ids is not None else None
+    min_ts = (since - datetime(1970, 1, 1)).total_seconds() if since else None
+    min_day = since.strftime("%Y%m%d") if since else None
+    paths = sorted(directory.glob("spans-*.jsonl"))
+
+    if min_ts is not None:
+        # Трасса активна в окне, если у неё есть спан, закончившийся после since;
+        # такие спаны лежат только в файлах суток since и позже
+        active = set()
+        for item in _iter_spans(p for p in paths if _path_day(p) >= min_day):
+            if item.get("end", 0) >= min_ts and (wanted is None or item.get("trace_id") in wanted):
+                active.add(item.get("trace_id"))
+        wanted = active
+
+    return [
+        item for item in _iter_spans(paths)
+        if wanted is None or item.get("trace_id") in wanted
+    ]
+
+
+def _path_day(path: Path) -> str:
+    """Сутки файла спанов (YYYYMMDD) по имени spans-YYYYMMDD.jsonl."""
+    return path.stem.split("-", 1)[1]
+
+
+def _iter_spans(paths: Iterable[Path]) -> Iterator[SpanDict]:
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def critical_path(spans: List[SpanDict]) -> List[Dict[str, Any]]:
+    """
+    Критический путь трассы.
+
+    Стадии верхнего уровня идут по времени, между ними — ожидание (очередь,
+    расписание). Внутри спана путь — цепочка потомков, заканчивающихся позже
+    всех, от конца к началу.
+
+    Returns:
+        [{"span", "depth", "offset" (от начала трассы), "wait" (простой перед спаном)}]
+    """
+    if not spans:
+        return []
+    by_id = {s["span_id"]: s for s in spans}
+    children: Dict[str, List[SpanDict]] = {}
+    roots = []
+    for s in spans:
+        if s.get("parent_id") in by_id:
+            children.setdefault(s["parent_id"], []).append(s)
+        else:
+            roots.append(s)
+    trace_start = min(s["start"] for s in spans)
+
+    rows: List[Dict[str, Any]] = []
+
+    def walk(node: SpanDict, depth: int, wait: float) -> None:
+        rows.append({"span": node, "depth": depth, "offset": node["start"] - trace_start, "wait": max(wait, 0.0)})
+        chain = []
+        cursor = node["end"]
+        for child in sorted(children.get(node["span_id"], []), key=lambda c: c["end"], reverse=True):
+            if child["end"] <= cursor + 1e-6:
+                chain.append(child)
+                cursor = child["start"]
+        previous_end = node["start"]
+        for child in reversed(chain):
+            walk(child, depth + 1, child["start"] - previous_end)
+            previous_end = child["end"]
+
+    previous_end = trace_start
+    for root in sorted(roots, key=lambda r: r["start"]):
+        walk(root, 0, root["start"] - previous_end)
+        previous_end = max(previous_end, root["end"])
+    return rows
+
+
+def slowest_traces(spans: List[SpanDict], limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Самые долгие трассы (от первого до последнего спана).
+
+    Returns:
+        [{"trace_id", "video_id", "total", "stages": {имя: секунды}, "errors"}] по убыванию total
+    """
+    traces: Dict[str, List[SpanDict]] = {}
+    for s in spans:
+        traces.setdefault(s["trace_id"], []).append(s)
+    result = []
+    for trace_id, items in traces.items():
+        stages: Dict[str, float] = {}
+        video_id = None
+        for s in items:
+            video_id = video_id or s.get("attrs", {}).get("video_id")
+            if not s.get("parent_id"):
+                stages[s["name"]] = stages.get(s["name"], 0.0) + s["duration"]
+        result.append({
+            "trace_id": trace_id,
+            "video_id": video_id,
+            "total": max(s["end"] for s in items) - min(s["start"] for s in items),
+            "stages": stages,
+            "errors": sum(1 for s in items if s.get("status") == "error"),
+        })
+    result.sort(key=lambda t: t["total"], reverse=True)
+    return result[:limit]
+
@@ -1,14 +1,38 @@
 """Модуль планировщика публикаций."""
+from .locks import get_lock_stats
+from .planner import DemandPlanner
 from .scheduler import (
     PublicationScheduler, 
     celery_app, 
     collect_content_task, 
-    process_publication_queue
+    collect_source_task,
+    record_collection_run_task,
+    download_video_task,
+    process_video_task,
+    dispatch_pipeline_task,
+    reap_expired_leases_task,
+    process_publication_queue,
+    materialize_publication_slots_task,
+    reconcile_status_counters_task,
+    update_publication_metrics_task,
+    archive_finished_videos_task
 )
 
 __all__ = [
     "PublicationScheduler",
+    "DemandPlanner",
+    "get_lock_stats",
     "celery_app",
     "collect_content_task",
-    "process_publication_queue"
+    "collect_source_task",
+    "record_collection_run_task",
+    "download_video_task",
+    "process_video_task",
+    "dispatch_pipeline_task",
+    "reap_expired_leases_task",
+    "process_publication_queue",
+    "materialize_publication_slots_task",
+    "reconcile_status_counters_task",
+    "update_publication_metrics_task",
+    "archive_finished_videos_task"
 ]
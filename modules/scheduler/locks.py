@@ -0,0 +1,205 @@
+"""Распределённые блокировки задач на Redis (брокер из settings.REDIS_URL).
+
+Блокировка — аренда: ``SET key token NX PX ttl``. Снимает и продлевает её
+только владелец (Lua-скрипт сверяет токен), а упавший воркер отпускает её
+по истечении ttl. Долгие блоки берут её с ``renew=True``: фоновый поток
+продлевает аренду, пока блок выполняется.
+Гранулярность задаётся областью ключа: ``task`` (периодическая задача целиком),
+``source`` (источник контента), ``topic`` (тематика).
+
+Время удержания копится в Redis (hash ``content_zavod:lock_stats:<область>``),
+поэтому :func:`get_lock_stats` видит статистику всех воркеров. Если Redis
+недоступен, блокировки не берутся и задачи выполняются как раньше.
+"""
+import functools
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from loguru import logger
+
+from config import settings
+
+KEY_PREFIX = "content_zavod:lock"
+STATS_PREFIX = "content_zavod:lock_stats"
+
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_HOLD_STATS_SCRIPT = """
+redis.call("hincrbyfloat", KEYS[1], "hold_seconds_total", ARGV[1])
+redis.call("hincrby", KEYS[1], "released", 1)
+local current = tonumber(redis.call("hget", KEYS[1], "hold_seconds_max") or "0")
+if tonumber(ARGV[1]) > current then
+    redis.call("hset", KEYS[1], "hold_seconds_max", ARGV[1])
+end
+return 1
+"""
+
+_client = None
+_client_failed = False
+
+
+def get_redis():
+    """Клиент Redis по settings.REDIS_URL (None, если Redis недоступен)."""
+    global _client, _client_failed
+    if _client is None and not _client_failed:
+        try:
+            import redis
+            _client = redis.from_url(settings.REDIS_URL, socket_timeout=5)
+            _client.ping()
+        except Exception as e:
+            logger.warning(f"Redis недоступен, распределённые блокировки отключены: {e}")
+            _client = None
+            _client_failed = True
+    return _client
+
+
+class RedisLock:
+    """Аренда в Redis с токеном владельца."""
+    
+    def __init__(self, scope: str, key: Any, ttl: int, client=None):
+        """
+        Args:
+            scope: Область (task / source / topic)
+            key: Имя задачи или ID
+            ttl: Срок аренды, секунды (должен перекрывать время работы)
+            client: Клиент Redis (по умолчанию из settings.REDIS_URL)
+        """
+        self.scope = scope
+        self.name = f"{KEY_PREFIX}:{scope}:{key}"
+        self.ttl = ttl
+        self.client = client if client is not None else get_redis()
+        self.token = uuid.uuid4().hex
+        self.acquired_at: Optional[float] = None
+    
+    def acquire(self) -> bool:
+        """Взять блокировку без ожидания; False — её держит кто-то другой."""
+        if self.client is None:
+            return True
+        try:
+            acquired = bool(self.client.set(self.name, self.token, nx=True, px=self.ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Ошибка Redis при взятии блокировки {self.name}: {e}")
+            return True
+        if acquired:
+            self.acquired_at = time.perf_counter()
+        self._record(acquired)
+        return acquired
+    
+    def extend(self) -> bool:
+        """Продлить блокировку ещё на ttl; False — она уже не наша."""
+        if self.client is None or self.acquired_at is None:
+            return True
+        try:
+            return bool(self.client.eval(_EXTEND_SCRIPT, 1, self.name, self.token, self.ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Ошибка Redis при продлении блокировки {self.name}: {e}")
+            return True
+    
+    def release(self) -> None:
+        """Снять блокировку, если она всё ещё наша."""
+        if self.client is None or self.acquired_at is None:
+            return
+        held = time.perf_counter() - self.acquired_at
+        self.acquired_at = None
+        try:
+            self.client.eval(_RELEASE_SCRIPT, 1, self.name, self.token)
+            self.client.eval(_HOLD_STATS_SCRIPT, 1, f"{STATS_PREFIX}:{self.scope}", f"{held:.6f}")
+        except Exception as e:
+            logger.warning(f"Ошибка Redis при снятии блокировки {self.name}: {e}")
+    
+    def _record(self, acquired: bool) -> None:
+        try:
+            self.client.hincrby(f"{STATS_PREFIX}:{self.scope}", "acquired" if acquired else "skipped", 1)
+        except Exception:
+            pass
+
+
+def _renew_until(lock: RedisLock, stop: threading.Event) -> None:
+    while not stop.wait(max(1.0, lock.ttl / 3)):
+        if not lock.extend():
+            logger.warning(f"Блокировка {lock.name} потеряна, продление остановлено")
+            return
+
+
+@contextmanager
+def hold_lock(scope: str, key: Any, ttl: int, renew: bool = False) -> Iterator[bool]:
+    """
+    Выполнить блок под блокировкой.
+    
+    Args:
+        renew: Продлевать блокировку каждую треть ttl, пока блок выполняется
+            (ttl тогда — лишь срок, за который освободится блокировка упавшего воркера)
+    
+    Yields:
+        True — блокировка взята (или Redis недоступен), False — её держит другой воркер
+    """
+    lock = RedisLock(scope, key, ttl)
+    acquired = lock.acquire()
+    stop = threading.Event()
+    renewer = None
+    if acquired and renew and lock.client is not None:
+        renewer = threading.Thread(target=_renew_until, args=(lock, stop), name=f"lock-{scope}-{key}", daemon=True)
+        renewer.start()
+    try:
+        yield acquired
+    finally:
+        if renewer is not None:
+            stop.set()
+            renewer.join()
+        if acquired:
+            lock.release()
+
+
+def exclusive_task(ttl: int, renew: bool = False) -> Callable:
+    """
+    Декоратор периодической задачи: пока предыдущий запуск не закончился,
+    новый пропускается (возвращает None).
+    
+    Ставится под ``@celery_app.task``; имя задачи не меняется. С renew=True
+    блокировка продлевается, пока задача работает (см. hold_lock).
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with hold_lock("task", func.__name__, ttl, renew=renew) as acquired:
+                if not acquired:
+                    logger.info(f"{func.__name__}: предыдущий запуск ещё идёт — пропускаю")
+                    return None
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_lock_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Статистика блокировок по областям (со всех воркеров).
+    
+    Returns:
+        {scope: {"acquired", "skipped", "released", "hold_seconds_total", "hold_seconds_max"}}
+    """
+    client = get_redis()
+    if client is None:
+        return {}
+    stats = {}
+    for key in client.scan_iter(f"{STATS_PREFIX}:*"):
+        key = key.decode() if isinstance(key, bytes) else key
+        values = client.hgetall(key)
+        stats[key.rsplit(":", 1)[-1]] = {
+            (k.decode() if isinstance(k, bytes) else k): float(v) for k, v in values.items()
+        }
+    return stats
@@ -0,0 +1,80 @@
+"""Планирование потребности в контенте по тематикам (backpressure конвейера)."""
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from loguru import logger
+
+from config import settings
+from database.counters import get_status_counts
+from database.models import Topic, PublicationSlot, VideoStatus
+
+
+class DemandPlanner:
+    """
+    Сколько видео тематике нужно собрать, скачать и обработать.
+    
+    Целевой буфер — число слотов публикации на горизонте PLANNER_HORIZON_HOURS
+    (48 ч), умноженное на PLANNER_BUFFER_FACTOR (1.5, запас на отбраковку).
+    Из него вычитается то, что уже есть на каждой стадии конвейера:
+    готовые (PROCESSED) и обрабатываемые → скачанные → найденные.
+    """
+    
+    def __init__(self, db: Session):
+        """
+        Инициализация планировщика.
+        
+        Args:
+            db: Сессия базы данных
+        """
+        self.db = db
+    
+    def plan(self, now: Optional[datetime] = None) -> Optional[Dict[int, Dict[str, int]]]:
+        """
+        Рассчитать потребность по активным тематикам.
+        
+        Returns:
+            {topic_id: {"target", "ready", "collect", "download", "process"}} или
+            None, если календарь слотов пуст (ограничивать конвейер не по чему)
+        """
+        now = now or datetime.utcnow()
+        horizon = timedelta(hours=int(getattr(settings, "PLANNER_HORIZON_HOURS", 48)))
+        factor = float(getattr(settings, "PLANNER_BUFFER_FACTOR", 1.5))
+        
+        slots_by_topic = dict(self.db.query(
+            PublicationSlot.topic_id, func.count(PublicationSlot.id)
+        ).filter(
+            PublicationSlot.state == "pending",
+            PublicationSlot.slot_time >= now,
+            PublicationSlot.slot_time < now + horizon
+        ).group_by(PublicationSlot.topic_id).all())
+        
+        if not slots_by_topic:
+            logger.warning("Календарь слотов пуст — потребность тематик не ограничивается")
+            return None
+        
+        counts = get_status_counts(self.db)
+        topic_ids = [topic_id for (topic_id,) in self.db.query(Topic.id).filter(Topic.is_active == True).all()]
+        
+        plan = {}
+        for topic_id in topic_ids:
+            target = math.ceil(slots_by_topic.get(topic_id, 0) * factor)
+            ready = counts.get((topic_id, VideoStatus.PROCESSED), 0)
+            processing = counts.get((topic_id, VideoStatus.PROCESSING), 0)
+            downloaded = counts.get((topic_id, VideoStatus.DOWNLOADED), 0)
+            found = counts.get((topic_id, VideoStatus.FOUND), 0)
+            
+            process = max(0, target - ready - processing)
+            download = max(0, process - downloaded)
+            collect = max(0, download - found)
+            plan[topic_id] = {
+                "target": target,
+                "ready": ready,
+                "collect": collect,
+                "download": download,
+                "process": process,
+            }
+        
+        return plan
@@ -1,18 +1,70 @@
 """Планировщик публикаций."""
+import math
+import time as time_module
+from collections import Counter
 from datetime import datetime, time, timedelta
-from typing import List, Optional
+from typing import Iterable, List, Optional
+from sqlalchemy import and_, func, or_, select, update
 from sqlalchemy.orm import Session
-from celery import Celery
+from celery import Celery, chord
 from loguru import logger
 import pytz
 
-from database.models import Topic, Schedule, Video, VideoStatus, Publication, Account
-from modules.content_manager import ContentManager
+from database.events import file_size, record_video_event
+from database.models import (
+    Topic, Schedule, Video, VideoStatus, Publication, Account, PublicationSlot,
+    ContentSource, CollectionRun
+)
+from database.sql import dialect_insert
+from modules.content_manager import ContentManager, source_platform
+from modules.monitoring import install_metrics, span, video_trace_id
 from modules.publisher import TikTokPublisher, YouTubePublisher, InstagramPublisher
 from config import settings
+from .locks import exclusive_task, hold_lock
+from .planner import DemandPlanner
 
-# Создаем Celery приложение
-celery_app = Celery('content_zavod', broker=settings.REDIS_URL)
+# Создаем Celery приложение (backend нужен для chord в сборе контента)
+celery_app = Celery(
+    'content_zavod',
+    broker=settings.REDIS_URL,
+    backend=getattr(settings, "CELERY_RESULT_BACKEND", None) or settings.REDIS_URL
+)
+
+# Очереди сбора по платформам: у каждой свой воркер со своим лимитом параллельности,
+# например (Instagram — один поток, чтобы не ловить блокировки):
+#   celery -A modules.scheduler.scheduler worker -Q youtube -c 4
+#   celery -A modules.scheduler.scheduler worker -Q tiktok -c 4
+#   celery -A modules.scheduler.scheduler worker -Q instagram -c 1
+# Остальные задачи идут в очередь по умолчанию "celery".
+
+# Конвейер видео: скачивание (сеть, много потоков) и обработка (ffmpeg, по ядру
+# на задачу) идут в разных пулах, чтобы ожидание сети не простаивало кодирование:
+#   celery -A modules.scheduler.scheduler worker -Q download -P threads -c 16
+#   celery -A modules.scheduler.scheduler worker -Q encode -c <число ядер>
+celery_app.conf.task_routes = {
+    "modules.scheduler.scheduler.download_video_task": {"queue": "download"},
+    "modules.scheduler.scheduler.process_video_task": {"queue": "encode"},
+}
+
+# Задачи сбора длинные: воркер не берёт следующую, пока не закончит текущую
+celery_app.conf.worker_prefetch_multiplier = 1
+
+# Метрики задач и БД; главный процесс воркера поднимает экспортёр /metrics
+install_metrics(celery=True)
+
+
+# Срок блокировок публикации (задача и тематика); пока публикация идёт, они продлеваются
+PUBLISH_LOCK_SECONDS = 10 * 60
+
+
+def slot_claim_seconds() -> int:
+    """
+    Через сколько захват слота считается брошенным (SLOT_CLAIM_SECONDS, 30 минут).
+
+    Не меньше двух сроков PUBLISH_LOCK_SECONDS: блокировка упавшего воркера
+    к этому времени уже истекла, а у живого — продлевается.
+    """
+    return max(int(getattr(settings, "SLOT_CLAIM_SECONDS", 30 * 60)), 2 * PUBLISH_LOCK_SECONDS)
 
 
 class PublicationScheduler:
@@ -29,57 +81,205 @@ class PublicationScheduler:
         self.content_manager = ContentManager(db)
     
     def get_next_publication_time(self, topic_id: int) -> Optional[datetime]:
-        """Получить следующее время публикации для тематики."""
-        topic = self.content_manager.get_topic(topic_id)
-        if not topic:
-            return None
+        """Получить следующее время публикации для тематики (из календаря слотов)."""
+        slot_time = self.db.query(func.min(PublicationSlot.slot_time)).filter(
+            PublicationSlot.topic_id == topic_id,
+            PublicationSlot.state == "pending",
+            PublicationSlot.slot_time >= datetime.utcnow()
+        ).scalar()
         
-        schedules = self.db.query(Schedule).filter(
-            Schedule.topic_id == topic_id,
-            Schedule.is_active == True
-        ).all()
-        
-        if not schedules:
+        if slot_time is None:
             return None
         
-        # Получаем текущее время в часовом поясе тематики
         tz = pytz.timezone(settings.DEFAULT_TIMEZONE)
-        now = datetime.now(tz)
+        return pytz.utc.localize(slot_time).astimezone(tz)
+    
+    def materialize_slots(self, days: Optional[int] = None, now: Optional[datetime] = None) -> int:
+        """
+        Развернуть активные расписания в слоты публикации на несколько дней вперёд.
         
-        # Находим ближайший слот
-        next_time = None
+        Слоты вставляются одним INSERT ... ON CONFLICT DO NOTHING, поэтому повторный
+        запуск безопасен. Будущие pending-слоты, которых больше нет в расписании
+        (расписание отключено или изменено), удаляются.
         
-        for schedule in schedules:
-            # Парсим время слота
-            hour, minute = map(int, schedule.time_slot.split(':'))
-            slot_time = time(hour, minute)
+        Args:
+            days: Размер окна в днях (по умолчанию SLOT_WINDOW_DAYS, 3)
+            now: Текущее время (UTC)
             
-            # Проверяем день недели
-            if schedule.day_of_week is not None:
-                if now.weekday() != schedule.day_of_week:
+        Returns:
+            Количество слотов в окне по расписанию
+        """
+        now = now or datetime.utcnow()
+        days = days or int(getattr(settings, "SLOT_WINDOW_DAYS", 3))
+        until = now + timedelta(days=days)
+        tz = pytz.timezone(settings.DEFAULT_TIMEZONE)
+        local_today = pytz.utc.localize(now).astimezone(tz).date()
+        
+        schedules = []
+        for schedule in self.db.query(Schedule).join(Topic, Topic.id == Schedule.topic_id).filter(
+            Schedule.is_active == True,
+            Topic.is_active == True
+        ).all():
+            try:
+                hour, minute = map(int, schedule.time_slot.split(':'))
+                schedules.append((schedule, time(hour, minute)))
+            except ValueError:
+                logger.warning(f"Некорректный time_slot в расписании {schedule.id}: {schedule.time_slot}")
+        
+        rows = {}
+        for day_offset in range(days + 1):
+            day = local_today + timedelta(days=day_offset)
+            for schedule, slot_clock in schedules:
+                if schedule.day_of_week is not None and day.weekday() != schedule.day_of_week:
                     continue
-            
-            # Создаем datetime для слота сегодня
-            slot_datetime = tz.localize(
-                datetime.combine(now.date(), slot_time)
+                local_slot = tz.localize(datetime.combine(day, slot_clock))
+                slot_time = local_slot.astimezone(pytz.utc).replace(tzinfo=None)
+                if now <= slot_time <= until:
+                    rows[(schedule.topic_id, slot_time)] = {
+                        "topic_id": schedule.topic_id,
+                        "schedule_id": schedule.id,
+                        "slot_time": slot_time,
+                        "state": "pending",
+                        "created_at": now,
+                    }
+        
+        existing = self.db.query(
+            PublicationSlot.id, PublicationSlot.topic_id, PublicationSlot.slot_time, PublicationSlot.state
+        ).filter(
+            PublicationSlot.slot_time >= now,
+            PublicationSlot.slot_time <= until
+        ).all()
+        
+        stale_ids = [
+            slot_id for slot_id, topic_id, slot_time, state in existing
+            if state == "pending" and (topic_id, slot_time) not in rows
+        ]
+        if stale_ids:
+            self.db.query(PublicationSlot).filter(
+                PublicationSlot.id.in_(stale_ids)
+            ).delete(synchronize_session=False)
+        
+        insert = dialect_insert(self.db.get_bind().dialect.name)
+        if insert is not None and rows:
+            self.db.execute(insert(PublicationSlot).on_conflict_do_nothing(), list(rows.values()))
+        elif rows:
+            known = {(topic_id, slot_time) for _, topic_id, slot_time, _ in existing}
+            self.db.add_all(
+                PublicationSlot(**row) for key, row in rows.items() if key not in known
             )
-            
-            # Если слот уже прошел сегодня, берем на завтра
-            if slot_datetime <= now:
-                slot_datetime += timedelta(days=1)
-            
-            if next_time is None or slot_datetime < next_time:
-                next_time = slot_datetime
         
-        return next_time
+        self.db.commit()
+        logger.info(f"Календарь публикаций: {len(rows)} слотов на {days} дн., удалено устаревших: {len(stale_ids)}")
+        return len(rows)
+    
+    def claim_due_slots(
+        self,
+        now: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        exclude_topics: Iterable[int] = (),
+    ) -> List[PublicationSlot]:
+        """
+        Захватить наступившие слоты одним UPDATE по индексу (state, slot_time).
+        
+        Слоты, просроченные больше чем на SLOT_GRACE_MINUTES (30 минут), помечаются
+        missed и не публикуются. Захват атомарен: параллельный воркер тех же слотов
+        не получит. Захват старше slot_claim_seconds() считается брошенным
+        (воркер упал) — слот возвращается в pending и захватывается заново, если
+        ещё не просрочен.
+        
+        Args:
+            now: Текущее время (UTC)
+            limit: Захватить не больше стольких слотов (самые ранние)
+            exclude_topics: Не захватывать слоты этих тематик
+        
+        Returns:
+            Захваченные слоты (state = "claimed")
+        """
+        now = now or datetime.utcnow()
+        grace = timedelta(minutes=int(getattr(settings, "SLOT_GRACE_MINUTES", 30)))
+        
+        abandoned = self.db.execute(
+            update(PublicationSlot)
+            .where(
+                PublicationSlot.state == "claimed",
+                or_(
+                    PublicationSlot.claimed_at.is_(None),
+                    PublicationSlot.claimed_at < now - timedelta(seconds=slot_claim_seconds()),
+                ),
+            )
+            .values(state="pending", claimed_at=None)
+        ).rowcount
+        if abandoned:
+            logger.warning(f"Возвращено брошенных слотов публикации: {abandoned}")
+        
+        missed = self.db.execute(
+            update(PublicationSlot)
+            .where(PublicationSlot.state == "pending", PublicationSlot.slot_time < now - grace)
+            .values(state="missed", finished_at=now)
+        ).rowcount
+        if missed:
+            logger.warning(f"Пропущено просроченных слотов публикации: {missed}")
+        
+        due = and_(PublicationSlot.state == "pending", PublicationSlot.slot_time <= now)
+        exclude_topics = list(exclude_topics)
+        if exclude_topics:
+            due = and_(due, PublicationSlot.topic_id.notin_(exclude_topics))
+        candidates = select(PublicationSlot.id).where(due).order_by(PublicationSlot.slot_time.asc())
+        if limit:
+            candidates = candidates.limit(limit)
+        if self.db.get_bind().dialect.name == "postgresql":
+            candidates = candidates.with_for_update(skip_locked=True)
+        # Условие due повторяется снаружи: без SKIP LOCKED подзапрос не защищает от гонки
+        slot_ids = self.db.execute(
+            update(PublicationSlot)
+            .where(PublicationSlot.id.in_(candidates.scalar_subquery()), due)
+            .values(state="claimed", claimed_at=now)
+            .returning(PublicationSlot.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        self.db.commit()
+        
+        if not slot_ids:
+            return []
+        return self.db.query(PublicationSlot).filter(
+            PublicationSlot.id.in_(slot_ids)
+        ).order_by(PublicationSlot.slot_time.asc()).all()
+    
+    def publish_slot(self, slot: PublicationSlot) -> bool:
+        """Опубликовать одно видео тематики в захваченный слот."""
+        state = "failed"
+        video_id = None
+        
+        videos = self.get_videos_for_publication(slot.topic_id, limit=1)
+        if not videos:
+            logger.warning(f"Нет видео для публикации в тематике {slot.topic_id}")
+            state = "empty"
+        else:
+            # Публикуем только на один аккаунт за раз
+            accounts = self.content_manager.get_accounts_by_topic(slot.topic_id)
+            if not accounts:
+                logger.warning(f"Нет активных аккаунтов в тематике {slot.topic_id}")
+            else:
+                video_id = videos[0].id
+                if self.publish_video(video_id, accounts[0].id):
+                    state = "published"
+        
+        slot.state = state
+        slot.video_id = video_id
+        slot.finished_at = datetime.utcnow()
+        self.db.commit()
+        return state == "published"
     
     def get_videos_for_publication(self, topic_id: int, limit: int = 1) -> List[Video]:
-        """Получить видео готовые к публикации."""
+        """Получить видео готовые к публикации (сначала самые просматриваемые в источнике)."""
         videos = self.db.query(Video).filter(
             Video.topic_id == topic_id,
             Video.status == VideoStatus.PROCESSED,
             Video.processed_file_path.isnot(None)
-        ).order_by(Video.processed_at.asc()).limit(limit).all()
+        ).order_by(
+            Video.source_views.desc().nullslast(),
+            Video.processed_at.asc()
+        ).limit(limit).all()
         
         return videos
     
@@ -111,7 +311,15 @@ class PublicationScheduler:
             return False
         
         # Публикуем
-        success, error_msg, result = publisher.publish(video, description, tags)
+        from_status = video.status
+        started = time_module.perf_counter()
+        with span(
+            "publish", video_trace_id(video),
+            video_id=video.id, topic_id=video.topic_id, account_id=account.id, platform=account.platform.value,
+        ) as publish_span:
+            success, error_msg, result = publisher.publish(video, description, tags)
+            if not (success and result):
+                publish_span["error"] = error_msg or "Ошибка публикации"
         
         if success and result:
             # Создаем запись о публикации
@@ -129,6 +337,10 @@ class PublicationScheduler:
             # Обновляем статус видео
             video.status = VideoStatus.PUBLISHED
             video.published_at = datetime.utcnow()
+            record_video_event(
+                self.db, video, "publish", from_status, started,
+                bytes_touched=file_size(video.processed_file_path),
+            )
             
             self.db.commit()
             
@@ -144,6 +356,10 @@ class PublicationScheduler:
                 error_message=error_msg
             )
             self.db.add(publication)
+            record_video_event(
+                self.db, video, "publish", from_status, started,
+                error_message=error_msg,
+            )
             self.db.commit()
             
             logger.error(f"Ошибка публикации видео {video_id}: {error_msg}")
@@ -200,65 +416,342 @@ class PublicationScheduler:
 
 # Celery задачи
 @celery_app.task
+@exclusive_task(ttl=PUBLISH_LOCK_SECONDS, renew=True)
 def process_publication_queue():
-    """Обработать очередь публикаций."""
+    """
+    Обработать наступившие слоты публикации.
+    
+    Слоты захватываются по одному прямо перед публикацией, так что claimed_at
+    каждого — время начала его публикации, а не всего запуска.
+    """
     from database import SessionLocal
     
     db = SessionLocal()
     try:
         scheduler = PublicationScheduler(db)
+        busy_topics = set()
         
-        # Получаем все активные тематики
-        topics = db.query(Topic).filter(Topic.is_active == True).all()
-        
-        for topic in topics:
-            # Проверяем, нужно ли публиковать сейчас
-            next_time = scheduler.get_next_publication_time(topic.id)
-            if not next_time:
+        while True:
+            slots = scheduler.claim_due_slots(limit=1, exclude_topics=busy_topics)
+            if not slots:
+                break
+            slot = slots[0]
+            try:
+                with hold_lock("topic", slot.topic_id, PUBLISH_LOCK_SECONDS, renew=True) as acquired:
+                    if not acquired:
+                        # Тематику публикует другой воркер — слот вернётся в следующий запуск
+                        slot.state = "pending"
+                        slot.claimed_at = None
+                        db.commit()
+                        busy_topics.add(slot.topic_id)
+                        continue
+                    scheduler.publish_slot(slot)
+            except Exception as e:
+                logger.error(f"Ошибка публикации слота {slot.id} (тематика {slot.topic_id}): {e}")
+                db.rollback()
+                slot.state = "failed"
+                slot.finished_at = datetime.utcnow()
+                db.commit()
+    
+    finally:
+        db.close()
+
+
+@celery_app.task
+@exclusive_task(ttl=10 * 60)
+def materialize_publication_slots_task():
+    """Развернуть расписания в календарь слотов публикации."""
+    from database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        PublicationScheduler(db).materialize_slots()
+    finally:
+        db.close()
+
+
+@celery_app.task
+@exclusive_task(ttl=10 * 60)
+def collect_content_task(limit: int = 10):
+    """
+    Задача сбора контента: по отдельной задаче на источник.
+    
+    Задачи источников уходят в очереди своих платформ (youtube / tiktok / instagram), поэтому
+    медленный поиск yt-dlp не задерживает остальные тематики, а длительность
+    запуска равна самому медленному источнику. Итоги пишет record_collection_run_task.
+    
+    Объём сбора по тематике ограничен DemandPlanner: тематики с полным буфером
+    пропускаются, остальным потребность делится между их источниками (не больше
+    limit на источник).
+    """
+    from database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        plan = DemandPlanner(db).plan()
+        sources = db.query(ContentSource.id, ContentSource.source_type, ContentSource.topic_id).filter(
+            ContentSource.is_active == True
+        ).all()
+    finally:
+        db.close()
+    
+    sources_per_topic = Counter(topic_id for _, _, topic_id in sources)
+    
+    # Не копим задачи, если воркеры платформы не успевают к следующему запуску
+    expires = int(getattr(settings, "COLLECT_TASK_EXPIRES", 25 * 60))
+    header = []
+    skipped_topics = set()
+    for source_id, source_type, topic_id in sources:
+        platform = source_platform(source_type)
+        if platform is None:
+            logger.warning(f"Неподдерживаемый тип источника {source_id}: {source_type}")
+            continue
+        source_limit = limit
+        if plan is not None:
+            need = plan.get(topic_id, {}).get("collect", 0)
+            if need <= 0:
+                skipped_topics.add(topic_id)
                 continue
-            
-            tz = pytz.timezone(settings.DEFAULT_TIMEZONE)
-            now = datetime.now(tz)
-            
-            # Если время публикации наступило
-            if now >= next_time:
-                # Получаем видео для публикации
-                videos = scheduler.get_videos_for_publication(topic.id, limit=1)
-                
-                if not videos:
-                    logger.warning(f"Нет видео для публикации в тематике {topic.id}")
-                    continue
-                
-                # Получаем аккаунты тематики
-                accounts = scheduler.content_manager.get_accounts_by_topic(topic.id)
-                
-                for video in videos:
-                    for account in accounts:
-                        if account.is_active:
-                            scheduler.publish_video(video.id, account.id)
-                            break  # Публикуем только на один аккаунт за раз
+            source_limit = min(limit, math.ceil(need / sources_per_topic[topic_id]))
+        header.append(collect_source_task.signature(
+            (source_id,), {"limit": source_limit}, queue=platform, expires=expires
+        ))
+    
+    if skipped_topics:
+        logger.info(f"Сбор пропущен — буфер тематик заполнен: {sorted(skipped_topics)}")
+    if not header:
+        return
     
+    chord(header)(record_collection_run_task.s(started_at=datetime.utcnow().isoformat()))
+    logger.info(f"Сбор контента: поставлено задач по источникам — {len(header)}")
+
+
+@celery_app.task(acks_late=True)
+def collect_source_task(source_id: int, limit: int = 10) -> dict:
+    """Собрать контент из одного источника; ошибки не пробрасываются, чтобы chord завершился."""
+    from database import SessionLocal
+    
+    started = time_module.perf_counter()
+    stats = {"source_id": source_id, "platform": None, "videos": 0, "error": None}
+    ttl = int(getattr(settings, "COLLECT_TASK_EXPIRES", 25 * 60))
+    with hold_lock("source", source_id, ttl) as acquired:
+        if not acquired:
+            # Источник ещё собирается предыдущим запуском — не дублируем работу
+            stats["skipped"] = True
+            return stats
+        db = SessionLocal()
+        try:
+            source = db.query(ContentSource).filter(ContentSource.id == source_id).first()
+            if source:
+                stats["platform"] = source_platform(source.source_type)
+            videos = ContentManager(db).collect_content_from_source(source_id, limit=limit)
+            stats["videos"] = len(videos)
+            for video in videos:
+                download_video_task.delay(video.id)
+        except Exception as e:
+            logger.error(f"Ошибка сбора из источника {source_id}: {e}")
+            stats["error"] = str(e)[:500]
+        finally:
+            db.close()
+    
+    stats["seconds"] = round(time_module.perf_counter() - started, 3)
+    return stats
+
+
+@celery_app.task
+def record_collection_run_task(results: List[dict], started_at: str) -> dict:
+    """Записать итоги запуска сбора (callback chord)."""
+    from database import SessionLocal
+    
+    skipped = sum(1 for r in results if r and r.get("skipped"))
+    results = [r for r in results if r and not r.get("skipped")]
+    finished_at = datetime.utcnow()
+    started = datetime.fromisoformat(started_at)
+    
+    platform_stats = {}
+    for r in results:
+        platform = platform_stats.setdefault(
+            r.get("platform") or "unknown", {"sources": 0, "videos": 0, "errors": 0, "seconds": 0.0}
+        )
+        platform["sources"] += 1
+        platform["videos"] += r.get("videos", 0)
+        platform["errors"] += 1 if r.get("error") else 0
+        platform["seconds"] = max(platform["seconds"], r.get("seconds", 0.0))
+    
+    slowest = max(results, key=lambda r: r.get("seconds", 0.0), default=None)
+    run = CollectionRun(
+        started_at=started,
+        finished_at=finished_at,
+        wall_seconds=round((finished_at - started).total_seconds(), 3),
+        sources=len(results),
+        videos_found=sum(r.get("videos", 0) for r in results),
+        errors=sum(1 for r in results if r.get("error")),
+        slowest_source_id=slowest["source_id"] if slowest else None,
+        slowest_seconds=slowest.get("seconds") if slowest else None,
+        platform_stats=platform_stats,
+    )
+    
+    db = SessionLocal()
+    try:
+        db.add(run)
+        db.commit()
+        logger.info(
+            f"Сбор контента завершён за {run.wall_seconds:.0f} с: источников {run.sources}, "
+            f"новых видео {run.videos_found}, ошибок {run.errors}, ещё занятых {skipped}, "
+            f"самый медленный — источник {run.slowest_source_id} ({run.slowest_seconds or 0:.0f} с)"
+        )
+        return {"run_id": run.id, "videos_found": run.videos_found, "errors": run.errors}
+    finally:
+        db.close()
+
+
+@celery_app.task(acks_late=True)
+def download_video_task(video_id: int) -> bool:
+    """Скачать видео (очередь download) и передать его на обработку."""
+    from database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        downloaded = ContentManager(db).download_video(video_id)
+    finally:
+        db.close()
+    
+    if downloaded:
+        process_video_task.delay(video_id)
+    return downloaded
+
+
+@celery_app.task(acks_late=True)
+def process_video_task(video_id: int) -> bool:
+    """
+    Обработать скачанное видео (очередь encode).
+    
+    После обработки видео в статусе PROCESSED само попадает в очередь
+    публикации: его заберёт ближайший слот тематики.
+    """
+    from database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        return ContentManager(db).process_video(video_id)
     finally:
         db.close()
 
 
 @celery_app.task
-def collect_content_task():
-    """Задача сбора контента."""
+@exclusive_task(ttl=10 * 60)
+def dispatch_pipeline_task(limit: Optional[int] = None) -> dict:
+    """
+    Поставить в конвейер зависшие видео FOUND/DOWNLOADED.
+    
+    Новые видео уходят в конвейер сразу после сбора; здесь подбираются те, чьи
+    задачи потерялись (перезапуск брокера, ошибки до постановки), и те, что ждали,
+    пока у тематики освободится буфер. Берутся только видео, не менявшиеся
+    дольше PIPELINE_STALE_MINUTES, чтобы не дублировать задачи, которые ещё ждут
+    в очереди, и не больше, чем тематике нужно по DemandPlanner.
+    """
     from database import SessionLocal
     
+    limit = limit or int(getattr(settings, "PIPELINE_DISPATCH_BATCH", 100))
+    stale_before = datetime.utcnow() - timedelta(minutes=int(getattr(settings, "PIPELINE_STALE_MINUTES", 30)))
+    
     db = SessionLocal()
     try:
-        manager = ContentManager(db)
-        
-        # Получаем все активные источники
-        sources = db.query(ContentSource).filter(ContentSource.is_active == True).all()
-        
-        for source in sources:
-            try:
-                manager.collect_content_from_source(source.id, limit=10)
-            except Exception as e:
-                logger.error(f"Ошибка сбора из источника {source.id}: {e}")
+        plan = DemandPlanner(db).plan()
+        query = db.query(Video.id, Video.topic_id, Video.status).filter(
+            Video.status.in_([VideoStatus.FOUND, VideoStatus.DOWNLOADED]),
+            Video.updated_at < stale_before
+        )
+        if plan is not None:
+            needy_topics = [
+                topic_id for topic_id, demand in plan.items()
+                if demand["download"] or demand["process"]
+            ]
+            query = query.filter(Video.topic_id.in_(needy_topics))
+        rows = query.order_by(Video.updated_at.asc()).limit(limit).all()
+    finally:
+        db.close()
+    
+    budget = Counter()
+    if plan is not None:
+        for topic_id, demand in plan.items():
+            budget[(topic_id, VideoStatus.FOUND)] = demand["download"]
+            budget[(topic_id, VideoStatus.DOWNLOADED)] = demand["process"]
+    
+    dispatched = {"download": 0, "process": 0}
+    for video_id, topic_id, status in rows:
+        if plan is not None:
+            if budget[(topic_id, status)] <= 0:
+                continue
+            budget[(topic_id, status)] -= 1
+        if status == VideoStatus.FOUND:
+            download_video_task.delay(video_id)
+            dispatched["download"] += 1
+        else:
+            process_video_task.delay(video_id)
+            dispatched["process"] += 1
+    
+    if dispatched["download"] or dispatched["process"]:
+        logger.info(f"Конвейер: поставлено на скачивание {dispatched['download']}, на обработку {dispatched['process']}")
+    return dispatched
+
+
+@celery_app.task
+@exclusive_task(ttl=5 * 60)
+def reap_expired_leases_task() -> dict:
+    """Вернуть в конвейер видео с просроченной арендой (упавшие воркеры)."""
+    from database import SessionLocal
+    from database.leases import reap_expired_leases
     
+    db = SessionLocal()
+    try:
+        requeued = reap_expired_leases(db)
+    finally:
+        db.close()
+    
+    for video_id in requeued.get(VideoStatus.FOUND, []):
+        download_video_task.delay(video_id)
+    for video_id in requeued.get(VideoStatus.DOWNLOADED, []):
+        process_video_task.delay(video_id)
+    return {status.value: len(ids) for status, ids in requeued.items()}
+
+
+@celery_app.task
+@exclusive_task(ttl=30 * 60)
+def reconcile_status_counters_task():
+    """Сверить счётчики статусов видео с таблицей videos."""
+    from database import SessionLocal, reconcile_status_counters
+    
+    db = SessionLocal()
+    try:
+        reconcile_status_counters(db)
+    finally:
+        db.close()
+
+
+@celery_app.task
+@exclusive_task(ttl=30 * 60)
+def update_publication_metrics_task():
+    """Обновить метрики публикаций по возрастному расписанию."""
+    from database import SessionLocal
+    from modules.analytics import Analytics
+    
+    db = SessionLocal()
+    try:
+        Analytics(db).update_publication_metrics()
+    finally:
+        db.close()
+
+
+@celery_app.task
+@exclusive_task(ttl=2 * 60 * 60)
+def archive_finished_videos_task():
+    """Перенести завершённые старые видео в архив."""
+    from database import SessionLocal
+    from database.archive import archive_finished_videos
+    
+    db = SessionLocal()
+    try:
+        archive_finished_videos(db)
     finally:
         db.close()
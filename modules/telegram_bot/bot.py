@@ -9,7 +9,10 @@ from telegram.ext import (
 )
 from loguru import logger
 
+from sqlalchemy import func
+
 from config import settings
+from database.counters import get_status_counts, totals_by_status
 from database.models import Topic, Account, Video, VideoStatus, PlatformType, ContentSource
 from modules.content_manager import ContentManager
 from modules.scheduler import PublicationScheduler
@@ -202,12 +205,14 @@ class TelegramBot:
         # Статистика по тематикам
         topics = self.content_manager.get_all_topics(active_only=True)
         
-        total_videos = self.db.query(Video).count()
-        found = self.db.query(Video).filter(Video.status == VideoStatus.FOUND).count()
-        downloaded = self.db.query(Video).filter(Video.status == VideoStatus.DOWNLOADED).count()
-        processed = self.db.query(Video).filter(Video.status == VideoStatus.PROCESSED).count()
-        published = self.db.query(Video).filter(Video.status == VideoStatus.PUBLISHED).count()
-        errors = self.db.query(Video).filter(Video.status == VideoStatus.ERROR).count()
+        # Счётчики статусов — одно чтение вместо COUNT(*) по videos
+        totals = totals_by_status(get_status_counts(self.db))
+        total_videos = sum(totals.values())
+        found = totals[VideoStatus.FOUND]
+        downloaded = totals[VideoStatus.DOWNLOADED]
+        processed = totals[VideoStatus.PROCESSED]
+        published = totals[VideoStatus.PUBLISHED]
+        errors = totals[VideoStatus.ERROR]
 
         total_accounts = self.db.query(Account).count()
         active_accounts = self.db.query(Account).filter(Account.is_active == True).count()
@@ -237,14 +242,15 @@ class TelegramBot:
         lines = ["📊 Статистика по темам\n"]
         total_queue = 0
         total_errors = 0
+        counts = get_status_counts(self.db)
+        errors_24_by_topic = dict(self.db.query(Video.topic_id, func.count(Video.id)).filter(
+            Video.status == VideoStatus.ERROR,
+            Video.updated_at >= since,
+        ).group_by(Video.topic_id).all())
         for t in topics:
-            vq = self.db.query(Video).filter(Video.topic_id == t.id, Video.status == VideoStatus.PROCESSED).count()
-            err = self.db.query(Video).filter(Video.topic_id == t.id, Video.status == VideoStatus.ERROR).count()
-            err_24 = self.db.query(Video).filter(
-                Video.topic_id == t.id,
-                Video.status == VideoStatus.ERROR,
-                Video.updated_at >= since,
-            ).count()
+            vq = counts.get((t.id, VideoStatus.PROCESSED), 0)
+            err = counts.get((t.id, VideoStatus.ERROR), 0)
+            err_24 = errors_24_by_topic.get(t.id, 0)
             total_queue += vq
             total_errors += err
             lines.append(f"📂 {t.name}: в очереди {vq}, ошибок {err} (за 24ч: {err_24})")
@@ -258,7 +264,7 @@ class TelegramBot:
             return
         ALERT_QUEUE_MIN = 5
         since = datetime.utcnow() - timedelta(hours=24)
-        ready = self.db.query(Video).filter(Video.status == VideoStatus.PROCESSED).count()
+        ready = totals_by_status(get_status_counts(self.db))[VideoStatus.PROCESSED]
         errors_24 = self.db.query(Video).filter(
             Video.status == VideoStatus.ERROR,
             Video.updated_at >= since,
@@ -291,14 +297,15 @@ class TelegramBot:
             await query.edit_message_text("Тематика не найдена.")
             return
         
-        videos_count = self.db.query(Video).filter(Video.topic_id == topic_id).count()
+        totals = totals_by_status(get_status_counts(self.db, topic_id=topic_id))
+        videos_count = sum(totals.values())
         accounts_count = self.db.query(Account).filter(Account.topic_id == topic_id).count()
         sources_count = self.db.query(ContentSource).filter(ContentSource.topic_id == topic_id).count()
-        found = self.db.query(Video).filter(Video.topic_id == topic_id, Video.status == VideoStatus.FOUND).count()
-        downloaded = self.db.query(Video).filter(Video.topic_id == topic_id, Video.status == VideoStatus.DOWNLOADED).count()
-        processed = self.db.query(Video).filter(Video.topic_id == topic_id, Video.status == VideoStatus.PROCESSED).count()
-        published = self.db.query(Video).filter(Video.topic_id == topic_id, Video.status == VideoStatus.PUBLISHED).count()
-        errors = self.db.query(Video).filter(Video.topic_id == topic_id, Video.status == VideoStatus.ERROR).count()
+        found = totals[VideoStatus.FOUND]
+        downloaded = totals[VideoStatus.DOWNLOADED]
+        processed = totals[VideoStatus.PROCESSED]
+        published = totals[VideoStatus.PUBLISHED]
+        errors = totals[VideoStatus.ERROR]
 
         text = f"""
 📂 {topic.name}
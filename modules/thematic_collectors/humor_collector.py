@@ -14,6 +14,8 @@ import json
 import re
 
 from database.models import Topic, Video, VideoStatus
+from database.source_metrics import source_metric_columns
+from modules.content_manager.ingest import save_found_video
 from modules.content_collector.instagram_downloader import extract_shortcode, download_video_combined
 from modules.content_collector.instagram_graph_api import InstagramGraphAPI
 from modules.thematic_collectors.browser_cookies_helper import (
@@ -2688,18 +2690,8 @@ class HumorCollector:
                 logger.warning(f"Не удалось извлечь shortcode из {video_url}")
                 return None
             
-            # Проверяем, не существует ли уже такое видео
-            existing = self.db.query(Video).filter(
-                Video.source_post_id == shortcode,
-                Video.topic_id == self.topic.id
-            ).first()
-            
-            if existing:
-                logger.debug(f"Видео {shortcode} уже существует в БД")
-                return existing
-            
-            # Создаем запись в БД
-            video = Video(
+            # Уже сохранённое видео вернётся как есть, ушедшее в архив — не добавится
+            video = save_found_video(self.db, dict(
                 topic_id=self.topic.id,
                 status=VideoStatus.FOUND,
                 source_url=video_url,
@@ -2710,14 +2702,16 @@ class HumorCollector:
                 description=metadata.get("description") if metadata else None,
                 tags=metadata.get("tags", []) if metadata else [],
                 duration=metadata.get("duration") if metadata else None,
-                metadata_json=metadata or {}
-            )
+                metadata_json=metadata or {},
+                **source_metric_columns(metadata)
+            ))
             
-            self.db.add(video)
             self.db.commit()
-            self.db.refresh(video)
+            if video is None:
+                logger.debug(f"Видео {shortcode} уже в архиве")
+                return None
             
-            logger.info(f"Видео {shortcode} сохранено в БД (ID: {video.id})")
+            logger.info(f"Видео {shortcode} в БД (ID: {video.id})")
             return video
             
         except Exception as e:
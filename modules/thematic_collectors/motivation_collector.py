@@ -8,6 +8,8 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 
 from database.models import Topic, Video, VideoStatus
+from database.source_metrics import source_metric_columns
+from modules.content_manager.ingest import save_found_video
 from modules.content_collector.instagram_video_finder import InstagramVideoFinder
 from modules.content_collector.instagram_downloader import extract_shortcode, download_video_combined
 
@@ -57,15 +59,7 @@ class MotivationCollector:
             if not shortcode:
                 return None
             
-            existing = self.db.query(Video).filter(
-                Video.source_post_id == shortcode,
-                Video.topic_id == self.topic.id
-            ).first()
-            
-            if existing:
-                return existing
-            
-            video = Video(
+            video = save_found_video(self.db, dict(
                 topic_id=self.topic.id,
                 status=VideoStatus.FOUND,
                 source_url=video_url,
@@ -76,13 +70,15 @@ class MotivationCollector:
                 description=metadata.get("description") if metadata else None,
                 tags=metadata.get("tags", []) if metadata else [],
                 duration=metadata.get("duration") if metadata else None,
-                metadata_json=metadata or {}
-            )
+                metadata_json=metadata or {},
+                **source_metric_columns(metadata)
+            ))
             
-            self.db.add(video)
             self.db.commit()
-            self.db.refresh(video)
-            logger.info(f"Видео {shortcode} сохранено в БД (ID: {video.id})")
+            if video is None:
+                logger.debug(f"Видео {shortcode} уже в архиве")
+                return None
+            logger.info(f"Видео {shortcode} в БД (ID: {video.id})")
             return video
         except Exception as e:
             logger.error(f"Ошибка сохранения в БД: {e}")
@@ -1,4 +1,5 @@
 """Модуль обработки видео."""
-from .processor import VideoProcessor
+from .processor import VideoProcessor, TopicProcessingSettings
+from .batch import BatchProcessor
 
-__all__ = ["VideoProcessor"]
+__all__ = ["VideoProcessor", "TopicProcessingSettings", "BatchProcessor"]
@@ -0,0 +1,248 @@
+"""Пакетная обработка скачанных видео на всех ядрах.
+
+Кодирование одного ролика (moviepy + libx264) не загружает большую машину,
+поэтому видео раздаются пулу процессов. Чтобы процессы не дрались за ядра,
+число потоков ffmpeg на процесс ограничено: процессы × потоки ≈ число ядер.
+В процессы уходят только пути и снимок настроек тематики
+(TopicProcessingSettings); с БД работает родитель — он берёт видео в аренду
+перед отправкой в пул, продлевает аренды всех видео в пуле, пока ждёт
+результатов, и записывает каждый результат сразу по готовности.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import cv2
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from config import settings
+from database.events import file_size, get_worker_id, record_video_event
+from database.leases import claim_videos, extend_lease, lease_seconds, release_lease
+from database.models import Topic, Video, VideoStatus
+from modules.monitoring import profile_tags, record_span, video_trace_id
+from .processor import TopicProcessingSettings, VideoProcessor
+
+
+def plan_workers(workers: Optional[int] = None, threads: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Подобрать число процессов и потоков ffmpeg на процесс под число ядер.
+    
+    По умолчанию на процесс BATCH_FFMPEG_THREADS (2) потока.
+    
+    Returns:
+        (процессов, потоков на процесс)
+    """
+    cores = os.cpu_count() or 1
+    if workers is None:
+        threads = threads or int(getattr(settings, "BATCH_FFMPEG_THREADS", 2))
+        workers = max(1, cores // threads)
+    threads = threads or max(1, cores // workers)
+    return workers, threads
+
+
+def _init_worker() -> None:
+    # Параллелизм уже на уровне процессов: OpenCV в кадровых фильтрах — в один поток
+    cv2.setNumThreads(1)
+
+
+def _process_job(
+    video_id: int,
+    input_path: str,
+    output_path: str,
+    topic_settings: TopicProcessingSettings,
+    threads: int,
+) -> Dict[str, Any]:
+    """Обработать одно видео в дочернем процессе (без доступа к БД)."""
+    started = time.perf_counter()
+    processor = VideoProcessor(topic_settings, threads=threads)
+    with profile_tags(video=video_id, topic=topic_settings.id):
+        success, error_msg = processor.process_video(input_path, output_path)
+    info = processor.get_video_info(output_path) if success else {}
+    return {
+        "video_id": video_id,
+        "output_path": output_path,
+        "success": success,
+        "error": error_msg,
+        "seconds": time.perf_counter() - started,
+        "duration": info.get("duration"),
+        "resolution": info.get("resolution"),
+    }
+
+
+class BatchProcessor:
+    """Обработка всех скачанных видео (или одной тематики) пулом процессов."""
+    
+    def __init__(self, db: Session, workers: Optional[int] = None, threads: Optional[int] = None):
+        """
+        Args:
+            db: Сессия базы данных
+            workers: Процессов в пуле (по умолчанию — по ядрам, см. plan_workers)
+            threads: Потоков ffmpeg на процесс
+        """
+        self.db = db
+        self.workers, self.threads = plan_workers(workers, threads)
+        self._topic_settings: Dict[int, TopicProcessingSettings] = {}
+    
+    def run(self, topic_id: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Обработать видео в статусе DOWNLOADED.
+        
+        Args:
+            topic_id: Только эта тематика
+            limit: Максимум видео за запуск
+            
+        Returns:
+            {"videos", "processed", "failed", "seconds", "videos_per_minute", "workers", "threads"}
+        """
+        query = self.db.query(Video.id).filter(
+            Video.status == VideoStatus.DOWNLOADED,
+            Video.original_file_path.isnot(None)
+        )
+        if topic_id is not None:
+            query = query.filter(Video.topic_id == topic_id)
+        query = query.order_by(Video.updated_at.asc())
+        if limit:
+            query = query.limit(limit)
+        pending = iter([video_id for (video_id,) in query.all()])
+        
+        stats = {"videos": 0, "processed": 0, "failed": 0}
+        started = time.perf_counter()
+        logger.info(f"Пакетная обработка: {self.workers} процессов × {self.threads} потоков ffmpeg")
+        
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            # future -> (id видео, срок аренды)
+            in_flight: Dict[Any, Tuple[int, int]] = {}
+            
+            def submit_next() -> bool:
+                for video_id in pending:
+                    claimed = self._claim(video_id)
+                    if claimed is not None:
+                        job, lease_for = claimed
+                        in_flight[pool.submit(_process_job, *job, self.threads)] = (video_id, lease_for)
+                        return True
+                return False
+            
+            # Держим очередь пула чуть длиннее числа процессов, чтобы они не простаивали
+            while len(in_flight) < self.workers * 2 and submit_next():
+                pass
+            
+            renewed = time.monotonic()
+            while in_flight:
+                # Аренды видео в очереди и в работе продлеваются раз в треть срока
+                renew_every = max(1.0, min(lease_for for _, lease_for in in_flight.values()) / 3)
+                done, _ = wait(
+                    in_flight, timeout=max(0.0, renewed + renew_every - time.monotonic()),
+                    return_when=FIRST_COMPLETED,
+                )
+                if time.monotonic() - renewed >= renew_every:
+                    self._renew_leases(job for future, job in in_flight.items() if future not in done)
+                    renewed = time.monotonic()
+                for future in done:
+                    video_id, _ = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"video_id": video_id, "success": False, "error": str(e), "seconds": None}
+                    self._save_result(result)
+                    stats["videos"] += 1
+                    stats["processed" if result["success"] else "failed"] += 1
+                    submit_next()
+        
+        elapsed = time.perf_counter() - started
+        stats.update({
+            "seconds": round(elapsed, 1),
+            "videos_per_minute": round(stats["videos"] / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "workers": self.workers,
+            "threads": self.threads,
+        })
+        logger.info(
+            f"Пакетная обработка завершена: {stats['processed']} обработано, {stats['failed']} ошибок "
+            f"за {stats['seconds']} с ({stats['videos_per_minute']} видео/мин)"
+        )
+        return stats
+    
+    def _get_topic_settings(self, topic_id: int) -> Optional[TopicProcessingSettings]:
+        if topic_id not in self._topic_settings:
+            topic = self.db.query(Topic).filter(Topic.id == topic_id).first()
+            if topic is None:
+                return None
+            self._topic_settings[topic_id] = TopicProcessingSettings.from_topic(topic)
+        return self._topic_settings[topic_id]
+    
+    def _claim(self, video_id: int) -> Optional[Tuple[Tuple[int, str, str, TopicProcessingSettings], int]]:
+        """
+        Взять видео в аренду (DOWNLOADED → PROCESSING) и собрать задание для пула.
+        
+        Returns:
+            (задание для _process_job, срок аренды) или None
+        """
+        video = self.db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            return None
+        topic_settings = self._get_topic_settings(video.topic_id)
+        if topic_settings is None:
+            return None
+        lease_for = lease_seconds("process", video.duration)
+        if not claim_videos(
+            self.db, VideoStatus.DOWNLOADED, lease_for,
+            video_ids=[video_id], set_status=VideoStatus.PROCESSING,
+        ):
+            return None
+        record_video_event(self.db, video, "process", VideoStatus.DOWNLOADED)
+        self.db.commit()
+        
+        filename = f"{video.source_post_id}_processed.mp4"
+        processed_path = settings.PROCESSED_DIR / str(video.topic_id) / filename
+        return (video_id, video.original_file_path, str(processed_path), topic_settings), lease_for
+    
+    def _renew_leases(self, leases: Iterable[Tuple[int, int]]) -> None:
+        """Продлить аренды видео, ещё не вернувшихся из пула."""
+        for video_id, lease_for in leases:
+            try:
+                if not extend_lease(self.db, video_id, lease_for):
+                    logger.warning(f"Аренда видео {video_id} потеряна, результат обработки не будет записан")
+            except Exception as e:
+                logger.warning(f"Не удалось продлить аренду видео {video_id}: {e}")
+    
+    def _save_result(self, result: Dict[str, Any]) -> None:
+        """Записать результат одного видео (свой commit на каждое)."""
+        video = self.db.query(Video).filter(Video.id == result["video_id"]).first()
+        if not video:
+            return
+        if video.status != VideoStatus.PROCESSING or video.lease_owner != get_worker_id():
+            # Аренду успели снять и видео обрабатывает кто-то другой — его результат не трогаем
+            logger.warning(f"Видео {video.id} больше не в нашей аренде, результат пакетной обработки отброшен")
+            return
+        
+        release_lease(video)
+        # Замер сделан в дочернем процессе — переносим его на часы родителя
+        started = time.perf_counter() - result["seconds"] if result.get("seconds") is not None else None
+        if result.get("seconds") is not None:
+            finished = time.time()
+            record_span(
+                "process", video_trace_id(video), finished - result["seconds"], finished,
+                error=None if result["success"] else (result.get("error") or "Ошибка обработки"),
+                video_id=video.id, topic_id=video.topic_id, batch=True,
+            )
+        if result["success"]:
+            processed_path = result["output_path"]
+            video.status = VideoStatus.PROCESSED
+            video.processed_file_path = processed_path
+            video.processed_at = datetime.utcnow()
+            video.duration = result.get("duration")
+            video.resolution = result.get("resolution")
+            record_video_event(
+                self.db, video, "process", VideoStatus.PROCESSING, started,
+                bytes_touched=(file_size(video.original_file_path) or 0) + (file_size(processed_path) or 0),
+            )
+        else:
+            video.status = VideoStatus.ERROR
+            video.error_message = result.get("error") or "Ошибка обработки"
+            record_video_event(
+                self.db, video, "process", VideoStatus.PROCESSING, started,
+                error_message=video.error_message,
+            )
+        self.db.commit()
@@ -0,0 +1,316 @@
+"""Обработка видео одним процессом ffmpeg (filtergraph), без кадров в Python.
+
+Настройки тематики переводятся в один filtergraph с теми же шагами, что и путь
+moviepy в processor.py. Обрезка идёт раньше поточечных фильтров — результат тот
+же, а пикселей на них меньше:
+
+- скорость — ``setpts`` для видео и цепочка ``atempo`` для звука;
+- обрезка — ``crop``;
+- яркость — усиление ``lutyuv`` (как множитель ImageEnhance.Brightness);
+- контраст — ``eq`` (contrast/saturation вокруг середины шкалы; PIL тянет
+  к средней яркости кадра, так что на очень тёмных/светлых кадрах результат
+  слегка отличается);
+- логотип или плашка — PNG вторым входом и ``overlay``. Плашку рисует тот же
+  код, что и для moviepy;
+- автозатирка водяного знака (inpaint по маске в moviepy) приближается
+  ``delogo`` по запасной области в правом нижнем углу.
+
+Сравнение результата и скорости с moviepy — benchmarks/video_backends.py.
+"""
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from loguru import logger
+from PIL import Image
+
+from config import settings
+from modules.monitoring import observe_encode, span
+
+from .kernel import crop_box
+
+
+@dataclass
+class MediaInfo:
+    """Параметры файла по выводу ``ffmpeg -i``."""
+    width: int
+    height: int
+    fps: float
+    duration: float
+    has_audio: bool
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+
+
+def find_ffmpeg() -> Optional[str]:
+    """Путь к ffmpeg: FFMPEG_BINARY, PATH или бинарник imageio-ffmpeg (его же использует moviepy)."""
+    configured = getattr(settings, "FFMPEG_BINARY", None)
+    if configured:
+        return configured
+    found = shutil.which("ffmpeg")
+    if found:
+        return found
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO_RE = re.compile(r"Stream #\d+:\d+.*?: Video: (\w+).*?, (\d{2,5})x(\d{2,5})")
+_FPS_RE = re.compile(r"(\d+(?:\.\d+)?) (?:fps|tbr)")
+_AUDIO_RE = re.compile(r"Stream #\d+:\d+.*?: Audio: (\w+)")
+_ROTATION_RE = re.compile(r"(?:rotation of|rotate\s*:)\s*(-?\d+(?:\.\d+)?)")
+
+
+def probe_media(path: str, ffmpeg: Optional[str] = None) -> MediaInfo:
+    """
+    Размер (с учётом поворота), fps, длительность и кодеки файла.
+
+    Raises:
+        ValueError: Видеопоток не найден
+    """
+    ffmpeg = ffmpeg or find_ffmpeg()
+    result = subprocess.run(
+        [ffmpeg, "-hide_banner", "-nostdin", "-i", str(path)],
+        capture_output=True, text=True, errors="replace", timeout=60,
+    )
+    output = result.stderr
+    video = _VIDEO_RE.search(output)
+    if not video:
+        raise ValueError(f"Видеопоток не найден: {path}")
+    width, height = int(video.group(2)), int(video.group(3))
+    rotation = _ROTATION_RE.search(output)
+    if rotation and abs(round(float(rotation.group(1)))) % 180 == 90:
+        # ffmpeg поворачивает кадры при декодировании — размер после поворота
+        width, height = height, width
+    line_end = output.find("\n", video.start())
+    fps = _FPS_RE.search(output[video.start():line_end if line_end != -1 else None])
+    duration = _DURATION_RE.search(output)
+    audio = _AUDIO_RE.search(output)
+    return MediaInfo(
+        width=width,
+        height=height,
+        fps=float(fps.group(1)) if fps else 30.0,
+        duration=(
+            int(duration.group(1)) * 3600 + int(duration.group(2)) * 60 + float(duration.group(3))
+            if duration else 0.0
+        ),
+        has_audio=audio is not None,
+        video_codec=video.group(1),
+        audio_codec=audio.group(1) if audio else None,
+    )
+
+
+def _run(command: List[str]) -> None:
+    result = subprocess.run(
+        command, capture_output=True, text=True, errors="replace",
+        timeout=int(getattr(settings, "FFMPEG_TIMEOUT_SECONDS", 1800)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError((result.stderr.strip().splitlines() or [f"ffmpeg: код {result.returncode}"])[-1])
+
+
+def remux(input_path: str, output_path: str, info: MediaInfo, ffmpeg: Optional[str] = None) -> None:
+    """
+    Переложить потоки в новый mp4 без перекодирования видео.
+
+    Звук AAC копируется, другой кодек перекодируется в AAC.
+
+    Raises:
+        RuntimeError: ffmpeg завершился с ошибкой
+    """
+    command = [
+        ffmpeg or find_ffmpeg(), "-hide_banner", "-nostdin", "-y", "-loglevel", "error",
+        "-i", str(input_path), "-map", "0:v:0", "-c:v", "copy",
+    ]
+    if info.has_audio:
+        command += ["-map", "0:a:0", "-c:a", "copy" if info.audio_codec == "aac" else "aac"]
+    _run(command + ["-movflags", "+faststart", str(output_path)])
+
+
+def mux_audio(video_path: str, audio_source: str, output_path: str, ffmpeg: Optional[str] = None) -> None:
+    """
+    Видео из video_path и звук из audio_source — оба потока копируются.
+
+    Raises:
+        RuntimeError: ffmpeg завершился с ошибкой
+    """
+    _run([
+        ffmpeg or find_ffmpeg(), "-hide_banner", "-nostdin", "-y", "-loglevel", "error",
+        "-i", str(video_path), "-i", str(audio_source),
+        "-map", "0:v:0", "-map", "1:a:0", "-c", "copy",
+        "-movflags", "+faststart", str(output_path),
+    ])
+
+
+def atempo_chain(multiplier: float) -> str:
+    """atempo принимает 0.5–2.0 — большие изменения раскладываются в цепочку."""
+    parts = []
+    while multiplier > 2.0:
+        parts.append("atempo=2.0")
+        multiplier /= 2.0
+    while multiplier < 0.5:
+        parts.append("atempo=0.5")
+        multiplier /= 0.5
+    parts.append(f"atempo={multiplier:.6f}")
+    return ",".join(parts)
+
+
+class FfmpegGraphBackend:
+    """Перевод настроек тематики в filtergraph и запуск ffmpeg."""
+
+    def __init__(self, processor):
+        """
+        Args:
+            processor: VideoProcessor (тематика, потоки, отрисовка плашки)
+        """
+        self.processor = processor
+        self.topic = processor.topic
+        self.ffmpeg = find_ffmpeg()
+
+    def _watermark_filter(self, width: int, height: int) -> Optional[str]:
+        """delogo по запасной области moviepy (эллипс в правом нижнем углу ROI)."""
+        if not getattr(settings, "WATERMARK_FALLBACK_BOTTOM_RIGHT", True):
+            return None
+        roi_pct = getattr(settings, "WATERMARK_ROI_PERCENT", 0.08)
+        rw = max(40, int(width * roi_pct))
+        rh = max(40, int(height * roi_pct))
+        ax, ay = max(4, rw // 4), max(4, rh // 4)
+        x = width - rw + rw // 2 - ax
+        y = height - rh + rh // 2 - ay
+        if x <= 0 or y <= 0 or x + 2 * ax >= width or y + 2 * ay >= height:
+            return None
+        return f"delogo=x={x}:y={y}:w={2 * ax}:h={2 * ay}"
+
+    def build_command(
+        self, input_path: str, output_path: str, info: MediaInfo, overlay_dir: Path
+    ) -> List[str]:
+        """
+        Команда ffmpeg для тематики.
+
+        Args:
+            input_path: Исходный файл
+            output_path: Результат
+            info: Параметры исходного файла
+            overlay_dir: Каталог для PNG плашки (живёт до конца запуска ffmpeg)
+        """
+        topic = self.topic
+        filters: List[str] = []
+        speed = 1 + (topic.video_speed_change or 0) / 100
+        if topic.video_speed_change:
+            filters.append(f"setpts=PTS/{speed:.6f}")
+
+        width, height = info.width, info.height
+        box = crop_box(topic.crop_settings, width, height)
+        if box:
+            x, y, width, height = box
+            filters.append(f"crop={width}:{height}:{x}:{y}")
+
+        brightness = 1 + (topic.brightness_adjustment or 0) / 100
+        contrast = 1 + (topic.contrast_adjustment or 0) / 100
+        if topic.brightness_adjustment:
+            filters.append(
+                f"lutyuv=y='clip((val-16)*{brightness:.6f}+16,16,235)'"
+                f":u='clip((val-128)*{brightness:.6f}+128,16,240)'"
+                f":v='clip((val-128)*{brightness:.6f}+128,16,240)'"
+            )
+        if topic.contrast_adjustment:
+            filters.append(f"eq=contrast={contrast:.6f}:saturation={contrast:.6f}")
+
+        inputs = ["-i", str(input_path)]
+        overlay: Optional[Tuple[str, int, int]] = None
+        if topic.branding_enabled:
+            logo_path = Path(topic.branding_logo_path) if topic.branding_logo_path else None
+            if logo_path and logo_path.exists():
+                size = topic.branding_size or 100
+                x, y = self.processor._logo_position(width, height, size)
+                overlay = (f"scale={size}:{size}", x, y)
+                inputs += ["-i", str(logo_path)]
+            else:
+                if logo_path:
+                    logger.warning(f"Логотип не найден: {logo_path}")
+                delogo = self._watermark_filter(width, height)
+                if delogo:
+                    filters.append(delogo)
+                tile, (x, y) = self.processor._text_plashka_overlay(width, height)
+                plashka_path = overlay_dir / "plashka.png"
+                Image.fromarray(tile.rgba).save(plashka_path)
+                overlay = ("null", x, y)
+                inputs += ["-i", str(plashka_path)]
+
+        graph = f"[0:v]{','.join(filters) or 'null'}"
+        if overlay:
+            scale, x, y = overlay
+            graph += f"[base];[1:v]{scale}[logo];[base][logo]overlay={x}:{y}:format=auto"
+        graph += ",format=yuv420p[vout]"
+
+        audio_args: List[str] = []
+        if info.has_audio:
+            if topic.video_speed_change:
+                graph += f";[0:a]{atempo_chain(speed)}[aout]"
+                audio_args = ["-map", "[aout]", "-c:a", "aac"]
+            else:
+                # Скорость не менялась — AAC копируется как есть
+                audio_args = ["-map", "0:a:0", "-c:a", "copy" if info.audio_codec == "aac" else "aac"]
+
+        quick = os.environ.get("STAGE1_QUICK") == "1"
+        command = [
+            self.ffmpeg, "-hide_banner", "-nostdin", "-y", "-loglevel", "error",
+            *inputs,
+            "-filter_complex", graph,
+            "-map", "[vout]",
+            *audio_args,
+            "-c:v", "libx264",
+            "-preset", "veryfast" if quick else "slow",
+            "-b:v", "4000k" if quick else "8000k",
+            "-r", f"{info.fps:g}",
+        ]
+        if self.processor.threads:
+            command += ["-threads", str(self.processor.threads)]
+        command += ["-movflags", "+faststart", str(output_path)]
+        return command
+
+    def process(self, input_path: str, output_path: str) -> Tuple[bool, Optional[str]]:
+        """
+        Обработать видео одним запуском ffmpeg.
+
+        Returns:
+            (success, error_message)
+        """
+        if not self.ffmpeg:
+            return False, "ffmpeg не найден"
+        try:
+            info = probe_media(input_path, self.ffmpeg)
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(prefix="ffgraph_") as tmp:
+                command = self.build_command(input_path, output_path, info, Path(tmp))
+                logger.debug(f"ffmpeg: {' '.join(command)}")
+                audio = self.processor.audio_path(info)
+                logger.info(f"Путь обработки: перекодирование видео (ffmpeg), звук — {audio}")
+                started = time.perf_counter()
+                with span("encode", topic_id=self.topic.id, backend="ffmpeg", audio=audio):
+                    result = subprocess.run(
+                        command, capture_output=True, text=True, errors="replace",
+                        timeout=int(getattr(settings, "FFMPEG_TIMEOUT_SECONDS", 1800)),
+                    )
+                elapsed = time.perf_counter() - started
+            if result.returncode != 0:
+                return False, (result.stderr.strip().splitlines() or [f"код {result.returncode}"])[-1]
+        except Exception as e:
+            logger.error(f"Ошибка обработки видео (ffmpeg): {e}")
+            return False, str(e)
+
+        duration = info.duration / (1 + (self.topic.video_speed_change or 0) / 100)
+        observe_encode(self.topic.id, duration * info.fps, elapsed, str(output_path), duration)
+        logger.info(f"Видео обработано (ffmpeg): {output_path}")
+        return True, None
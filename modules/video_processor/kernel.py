@@ -0,0 +1,109 @@
+"""Все покадровые шаги moviepy-пути одной функцией кадра.
+
+Раньше каждый шаг (яркость/контраст, обрезка, размытие углов, затирка,
+плашка) оборачивал клип ещё одним слоем и выделял под кадр новый массив.
+FrameKernel делает их за один проход в переиспользуемом буфере:
+
+1. обрезка — вид numpy на исходный кадр, без копирования;
+2. яркость/контраст — cv2.LUT из вида в буфер (это и есть единственная
+   копия кадра), контраст — вторым проходом на месте;
+3. размытие углов и затирка водяного знака — на месте в буфере;
+4. плашка или логотип — смешивание на месте в своём прямоугольнике.
+
+Если тона нет, вид копируется в буфер; если нет ничего, кроме обрезки,
+возвращается сам вид. Шаги те же, что были, и в том же порядке. Исключение из
+«одной копии» — контраст вместе с обрезкой: средняя для контраста считалась
+по всему кадру до обрезки, поэтому яркость применяется ко всему кадру во
+второй буфер.
+
+Буфер один на ядро: кадр действителен до следующего вызова. moviepy при
+записи отдаёт кадр ffmpeg сразу, так что этого достаточно.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .overlay import OverlayTile
+from .tone import ToneCurve, gray_mean
+
+CropBox = Tuple[int, int, int, int]
+FrameStep = Callable[[np.ndarray], None]
+
+
+def crop_box(crop_settings: Optional[Dict[str, int]], width: int, height: int) -> Optional[CropBox]:
+    """(x, y, ширина, высота) обрезки; прямоугольник обрезается по краю кадра, как срез numpy."""
+    if not crop_settings:
+        return None
+    x = max(0, int(crop_settings.get("x", 0)))
+    y = max(0, int(crop_settings.get("y", 0)))
+    crop_w = min(int(crop_settings.get("width", width)), width - x)
+    crop_h = min(int(crop_settings.get("height", height)), height - y)
+    return x, y, crop_w, crop_h
+
+
+class FrameKernel:
+    """Функция кадра: обрезка → тон → шаги на месте → наложение."""
+
+    def __init__(
+        self,
+        crop: Optional[CropBox] = None,
+        tone: Optional[ToneCurve] = None,
+        steps: Iterable[FrameStep] = (),
+        overlay: Optional[Tuple[OverlayTile, int, int]] = None,
+    ):
+        """
+        Args:
+            crop: Прямоугольник обрезки (см. crop_box)
+            tone: Яркость/контраст
+            steps: Шаги, меняющие кадр uint8 на месте (после тона, до наложения)
+            overlay: (тайл, x, y) плашки или логотипа в координатах обрезанного кадра
+        """
+        self.crop = crop
+        self.tone = tone if tone is not None and tone.enabled else None
+        self.steps: List[FrameStep] = list(steps)
+        self.overlay = overlay
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    @property
+    def identity(self) -> bool:
+        """Кадр не меняется — ядро можно не подключать."""
+        return not (self.crop or self.tone or self.steps or self.overlay)
+
+    def _buffer(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape, dtype=np.uint8)
+        return buffer
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        if frame.dtype != np.uint8:
+            frame = np.clip(frame, 0, 255).astype(np.uint8)
+        view = frame
+        if self.crop:
+            x, y, w, h = self.crop
+            view = frame[y:y + h, x:x + w]
+        if not (self.tone or self.steps or self.overlay):
+            return view
+
+        out = self._buffer("out", view.shape)
+        if self.tone and self.crop and self.tone.contrast_enabled:
+            # Средняя для контраста — по всему кадру, как до обрезки
+            adjusted = frame
+            if self.tone.brightness_lut is not None:
+                adjusted = cv2.LUT(frame, self.tone.brightness_lut, dst=self._buffer("full", frame.shape))
+            x, y, w, h = self.crop
+            lut = self.tone.contrast_lut(gray_mean(adjusted))
+            cv2.LUT(adjusted[y:y + h, x:x + w], lut, dst=out)
+        elif self.tone:
+            self.tone.apply(view, out=out)
+        else:
+            np.copyto(out, view)
+        for step in self.steps:
+            step(out)
+        if self.overlay:
+            tile, x, y = self.overlay
+            tile.blend(out, x, y)
+        return out
@@ -0,0 +1,146 @@
+"""Готовые плашки и логотипы для наложения на кадры.
+
+Плашка (значок + ник) и логотип рисуются один раз и хранятся в LRU-кэше
+процесса (``OVERLAY_CACHE_SIZE`` записей, по умолчанию 32). Ключ — всё, от чего
+зависит картинка: текст, шрифт и размеры для плашки, путь, время изменения
+и размер для логотипа. Поэтому видео одной тематики (и тематики с одинаковой
+плашкой) не перебирают шрифты и не перечитывают PNG заново, а замена файла
+логотипа сбрасывает запись сама.
+
+Тайл хранит цвет, уже умноженный на альфу, и 1 − альфа, так что наложение —
+одно умножение и сложение только в прямоугольнике тайла; остальной кадр
+не трогается (CompositeVideoClip переводил весь кадр в RGBA и смешивал целиком).
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Hashable, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageFont
+
+from config import settings
+
+FONT_CANDIDATES = (
+    "C:/Windows/Fonts/segoeui.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "arial.ttf",
+)
+
+
+@dataclass(frozen=True)
+class OverlayTile:
+    """Картинка RGBA, подготовленная к смешиванию с кадром."""
+    rgba: np.ndarray
+    premultiplied: np.ndarray
+    inverse_alpha: np.ndarray
+
+    @classmethod
+    def from_rgba(cls, rgba: np.ndarray) -> "OverlayTile":
+        rgba = np.ascontiguousarray(rgba, dtype=np.uint8)
+        alpha = rgba[:, :, 3:4].astype(np.float32) / 255
+        premultiplied = rgba[:, :, :3].astype(np.float32) * alpha
+        inverse_alpha = 1 - alpha
+        for array in (rgba, premultiplied, inverse_alpha):
+            array.flags.writeable = False
+        return cls(rgba=rgba, premultiplied=premultiplied, inverse_alpha=inverse_alpha)
+
+    @property
+    def width(self) -> int:
+        return self.rgba.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.rgba.shape[0]
+
+    def blend(self, frame: np.ndarray, x: int, y: int) -> np.ndarray:
+        """
+        Наложить тайл левым верхним углом в (x, y).
+
+        Меняет только прямоугольник тайла (обрезанный по краю кадра) и прямо
+        в frame. Кадр только для чтения (так его отдаёт читатель moviepy)
+        сначала копируется.
+
+        Returns:
+            Кадр с наложенным тайлом
+        """
+        fh, fw = frame.shape[:2]
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(fw, x + self.width), min(fh, y + self.height)
+        if x0 >= x1 or y0 >= y1:
+            return frame
+        if frame.dtype != np.uint8:
+            frame = np.clip(frame, 0, 255).astype(np.uint8)
+        elif not frame.flags.writeable:
+            frame = frame.copy()
+        tile = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        region = frame[y0:y1, x0:x1, :3]
+        blended = region.astype(np.float32)
+        blended *= self.inverse_alpha[tile]
+        blended += self.premultiplied[tile]
+        blended += 0.5
+        region[...] = blended.astype(np.uint8)
+        return frame
+
+
+class OverlayCache:
+    """LRU тайлов, общий для потоков процесса."""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, OverlayTile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, factory: Callable[[], np.ndarray]) -> OverlayTile:
+        """Тайл по ключу; при промахе factory() рисует RGBA."""
+        with self._lock:
+            tile = self._items.get(key)
+            if tile is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+        tile = OverlayTile.from_rgba(factory())
+        with self._lock:
+            self._items[key] = tile
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return tile
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+OVERLAY_CACHE = OverlayCache(int(getattr(settings, "OVERLAY_CACHE_SIZE", 32)))
+
+
+@lru_cache(maxsize=None)
+def find_font(size: int) -> Tuple[ImageFont.ImageFont, Optional[str]]:
+    """Первый доступный шрифт из FONT_CANDIDATES (или встроенный) и его путь."""
+    for path in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(path, size), path
+        except Exception:
+            continue
+    return ImageFont.load_default(), None
+
+
+def logo_tile(path: Path, size: int) -> OverlayTile:
+    """Логотип, приведённый к size×size (LANCZOS, как resized в moviepy)."""
+    path = Path(path)
+    key = ("logo", str(path.resolve()), path.stat().st_mtime_ns, size)
+
+    def render() -> np.ndarray:
+        with Image.open(path) as img:
+            return np.array(img.convert("RGBA").resize((size, size), Image.Resampling.LANCZOS))
+
+    return OVERLAY_CACHE.get(key, render)
@@ -1,41 +1,91 @@
 """Обработчик видео."""
 import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 import cv2
 import numpy as np
 
 # Опциональный импорт moviepy (2.x: from moviepy; 1.x: from moviepy.editor)
 try:
     try:
-        from moviepy import VideoFileClip, CompositeVideoClip, ImageClip
+        from moviepy import VideoFileClip
     except ImportError:
-        from moviepy.editor import VideoFileClip, CompositeVideoClip, ImageClip
+        from moviepy.editor import VideoFileClip
     MOVIEPY_AVAILABLE = True
 except ImportError:
     MOVIEPY_AVAILABLE = False
     VideoFileClip = None
-    CompositeVideoClip = None
-    ImageClip = None
 
-from PIL import Image, ImageEnhance, ImageDraw, ImageFont, ImageFilter
+from PIL import Image, ImageDraw, ImageFont, ImageFilter
 from loguru import logger
 from config import settings
 from database.models import Topic
+from modules.monitoring import observe_encode, profiled, span
+from .kernel import FrameKernel, crop_box
+from .overlay import OVERLAY_CACHE, OverlayTile, find_font, logo_tile
+from .tone import ToneCurve
+
+
+@dataclass(frozen=True)
+class TopicProcessingSettings:
+    """
+    Снимок настроек обработки тематики.
+    
+    В отличие от ORM-объекта Topic не привязан к сессии и сериализуется pickle,
+    поэтому передаётся в дочерние процессы пакетной обработки (batch.py).
+    Имена полей совпадают с колонками Topic, так что VideoProcessor принимает любой из них.
+    """
+    id: int
+    name: str
+    video_speed_change: float = 0.0
+    brightness_adjustment: float = 0.0
+    contrast_adjustment: float = 0.0
+    crop_settings: Optional[Dict[str, int]] = None
+    branding_enabled: bool = True
+    branding_logo_path: Optional[str] = None
+    branding_position: Optional[str] = "bottom_right"
+    branding_size: Optional[int] = 100
+    branding_opacity: Optional[float] = 0.8
+    branding_margin: Optional[int] = 20
+    processing_backend: Optional[str] = None
+    
+    @classmethod
+    def from_topic(cls, topic: Topic) -> "TopicProcessingSettings":
+        """Снять настройки с тематики."""
+        return cls(
+            id=topic.id,
+            name=topic.name,
+            video_speed_change=topic.video_speed_change or 0.0,
+            brightness_adjustment=topic.brightness_adjustment or 0.0,
+            contrast_adjustment=topic.contrast_adjustment or 0.0,
+            crop_settings=dict(topic.crop_settings) if topic.crop_settings else None,
+            branding_enabled=bool(topic.branding_enabled),
+            branding_logo_path=topic.branding_logo_path,
+            branding_position=topic.branding_position,
+            branding_size=topic.branding_size,
+            branding_opacity=topic.branding_opacity,
+            branding_margin=topic.branding_margin,
+            processing_backend=getattr(topic, "processing_backend", None),
+        )
 
 
 class VideoProcessor:
     """Обработчик видео для уникализации и брендирования."""
     
-    def __init__(self, topic: Topic):
+    def __init__(self, topic: Union[Topic, TopicProcessingSettings], threads: Optional[int] = None):
         """
         Инициализация процессора.
         
         Args:
-            topic: Тематика с настройками обработки
+            topic: Тематика (или снимок её настроек) с настройками обработки
+            threads: Потоков ffmpeg на кодирование (по умолчанию — на усмотрение ffmpeg)
         """
         self.topic = topic
+        self.threads = threads
     
+    @profiled("VideoProcessor.process_video", tags=lambda self, *args, **kwargs: {"topic": self.topic.id})
     def process_video(
         self, 
         input_path: str, 
@@ -45,6 +95,13 @@ class VideoProcessor:
         """
         Обработать видео: уникализация + брендирование.
         
+        Если тематика не меняет видео (ни скорости, ни покадровых шагов, ни
+        брендирования), потоки перекладываются без перекодирования. Иначе
+        бэкенд — processing_backend тематики или VIDEO_PROCESSING_BACKEND:
+        "moviepy" (по умолчанию) или "ffmpeg" (один процесс ffmpeg с filtergraph,
+        см. ffmpeg_backend.py). Если ffmpeg недоступен или упал — обработка через moviepy.
+        Без смены скорости звук AAC копируется как есть. Выбранный путь пишется в лог.
+        
         Args:
             input_path: Путь к исходному видео
             output_path: Путь для сохранения обработанного видео
@@ -53,6 +110,97 @@ class VideoProcessor:
         Returns:
             (success, error_message)
         """
+        if self.video_untouched(remove_watermarks):
+            success, error = self._remux(input_path, output_path)
+            if success:
+                return success, error
+            logger.warning(f"Перекладка потоков не удалась ({error}) — перекодирую")
+        
+        if self.backend_name(remove_watermarks) == "ffmpeg":
+            from .ffmpeg_backend import FfmpegGraphBackend
+            
+            success, error = FfmpegGraphBackend(self).process(input_path, output_path)
+            if success or not MOVIEPY_AVAILABLE:
+                return success, error
+            logger.warning(f"ffmpeg-бэкенд не справился ({error}) — обрабатываю через moviepy")
+        return self._process_moviepy(input_path, output_path, remove_watermarks)
+    
+    def video_untouched(self, remove_watermarks: bool = False) -> bool:
+        """Тематика не меняет кадры и их время — видео можно не перекодировать."""
+        topic = self.topic
+        return not (
+            topic.video_speed_change
+            or topic.brightness_adjustment
+            or topic.contrast_adjustment
+            or topic.crop_settings
+            or topic.branding_enabled
+            or remove_watermarks
+        )
+    
+    def audio_path(self, info) -> str:
+        """
+        Что делать со звуком: "copy" (AAC без смены скорости), "aac" (перекодировать) или "none".
+        
+        Args:
+            info: MediaInfo исходного файла
+        """
+        if not info.has_audio:
+            return "none"
+        if not self.topic.video_speed_change and info.audio_codec == "aac":
+            return "copy"
+        return "aac"
+    
+    def _remux(self, input_path: str, output_path: str) -> tuple[bool, Optional[str]]:
+        """Переложить потоки без перекодирования видео (ffmpeg -c copy)."""
+        from .ffmpeg_backend import find_ffmpeg, probe_media, remux
+        
+        ffmpeg = find_ffmpeg()
+        if not ffmpeg:
+            return False, "ffmpeg не найден"
+        try:
+            info = probe_media(input_path, ffmpeg)
+            audio = self.audio_path(info)
+            logger.info(f"Путь обработки: копия видеопотока без перекодирования, звук — {audio}")
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            with span("encode", topic_id=self.topic.id, backend="remux", audio=audio):
+                remux(input_path, output_path, info, ffmpeg)
+        except Exception as e:
+            return False, str(e)
+        logger.info(f"Видео обработано (без перекодирования): {output_path}")
+        return True, None
+    
+    def _probe_source(self, input_path: str):
+        """MediaInfo исходника или None (нет ffmpeg, файл не разобран)."""
+        from .ffmpeg_backend import find_ffmpeg, probe_media
+        
+        ffmpeg = find_ffmpeg()
+        if not ffmpeg:
+            return None
+        try:
+            return probe_media(input_path, ffmpeg)
+        except Exception as e:
+            logger.debug(f"Не удалось разобрать {input_path}: {e}")
+            return None
+    
+    def backend_name(self, remove_watermarks: bool = False) -> str:
+        """Бэкенд обработки для тематики: ffmpeg или moviepy."""
+        from .ffmpeg_backend import find_ffmpeg
+        
+        name = getattr(self.topic, "processing_backend", None) or getattr(settings, "VIDEO_PROCESSING_BACKEND", "moviepy")
+        if name != "ffmpeg":
+            return "moviepy"
+        # Размытие углов (remove_watermarks) в filtergraph не переносилось
+        if remove_watermarks or not find_ffmpeg():
+            return "moviepy"
+        return "ffmpeg"
+    
+    def _process_moviepy(
+        self, 
+        input_path: str, 
+        output_path: str,
+        remove_watermarks: bool = False
+    ) -> tuple[bool, Optional[str]]:
+        """Обработка через moviepy: кадры проходят через Python."""
         try:
             video = VideoFileClip(str(input_path))
             # Не конвертируем в 9:16 и не ресайзим — обрезка/апскейл давали «заужено» и размытие.
@@ -62,36 +210,47 @@ class VideoProcessor:
             if self.topic.video_speed_change != 0:
                 video = self._change_speed(video, self.topic.video_speed_change)
             
-            if self.topic.brightness_adjustment != 0 or self.topic.contrast_adjustment != 0:
-                video = self._adjust_brightness_contrast(video)
-            
-            if self.topic.crop_settings:
-                video = self._crop_video(video, self.topic.crop_settings)
-            
-            # Удаление водяных знаков (по умолчанию выкл — размывало весь кадр)
-            if remove_watermarks:
-                video = self._remove_watermarks(video)
-            
-            # Брендирование: логотип или текстовая плашка (уникализация)
-            if self.topic.branding_enabled:
-                if self.topic.branding_logo_path:
-                    video = self._add_branding(video)
-                else:
-                    video = self._inpaint_watermarks_auto(video)
-                    video = self._add_text_plashka(video)
+            # Остальное — покадрово, одной функцией (kernel.py)
+            kernel = self.compile_frame_kernel(*video.size, remove_watermarks=remove_watermarks)
+            if not kernel.identity:
+                video = video.image_transform(kernel)
             
             # Сохраняем результат
             output_file = Path(output_path)
             output_file.parent.mkdir(parents=True, exist_ok=True)
+            # Звук AAC без смены скорости не перекодируем: пишем только видео и докладываем исходную дорожку
+            info = self._probe_source(input_path)
+            if info is not None:
+                audio = self.audio_path(info)
+            else:
+                audio = "aac" if video.audio is not None else "none"
+            target = output_file.with_name(output_file.stem + ".video" + output_file.suffix) if audio == "copy" else output_file
+            logger.info(f"Путь обработки: перекодирование видео (moviepy), звук — {audio}")
             quick = os.environ.get("STAGE1_QUICK") == "1"
-            video.write_videofile(
-                str(output_file),
-                codec='libx264',
-                audio_codec='aac',
-                fps=video.fps,
-                preset='veryfast' if quick else 'slow',
-                bitrate='4000k' if quick else '8000k',
-                ffmpeg_params=['-movflags', '+faststart'],
+            encode_started = time.perf_counter()
+            try:
+                with span("encode", topic_id=self.topic.id, audio=audio):
+                    video.write_videofile(
+                        str(target),
+                        codec='libx264',
+                        audio=audio == "aac",
+                        audio_codec='aac',
+                        fps=video.fps,
+                        preset='veryfast' if quick else 'slow',
+                        bitrate='4000k' if quick else '8000k',
+                        threads=self.threads,
+                        ffmpeg_params=['-movflags', '+faststart'],
+                    )
+                    if audio == "copy":
+                        from .ffmpeg_backend import mux_audio
+                        
+                        mux_audio(str(target), str(input_path), str(output_file))
+            finally:
+                if target != output_file:
+                    target.unlink(missing_ok=True)
+            observe_encode(
+                self.topic.id, (video.duration or 0) * (video.fps or 0),
+                time.perf_counter() - encode_started, str(output_file), video.duration,
             )
             
             video.close()
@@ -135,41 +294,49 @@ class VideoProcessor:
         speed_multiplier = 1 + (speed_change_percent / 100)
         return video.with_effects([MultiplySpeed(speed_multiplier)])
     
-    def _adjust_brightness_contrast(self, video: VideoFileClip) -> VideoFileClip:
-        """Корректировать яркость и контраст."""
-        brightness = self.topic.brightness_adjustment
-        contrast = self.topic.contrast_adjustment
+    def compile_frame_kernel(self, width: int, height: int, remove_watermarks: bool = False) -> FrameKernel:
+        """
+        Собрать функцию кадра из настроек тематики.
         
-        def adjust_frame(frame):
-            # Конвертируем в PIL Image
-            img = Image.fromarray(frame)
-            
-            # Яркость
-            if brightness != 0:
-                enhancer = ImageEnhance.Brightness(img)
-                img = enhancer.enhance(1 + brightness / 100)
-            
-            # Контраст
-            if contrast != 0:
-                enhancer = ImageEnhance.Contrast(img)
-                img = enhancer.enhance(1 + contrast / 100)
-            
-            return np.array(img)
+        Порядок прежний: яркость/контраст, обрезка, размытие углов,
+        затирка водяного знака и плашка (или логотип).
         
-        return video.image_transform(adjust_frame)
-    
-    def _crop_video(self, video: VideoFileClip, crop_settings: Dict[str, int]) -> VideoFileClip:
-        """Обрезать видео."""
-        x = crop_settings.get("x", 0)
-        y = crop_settings.get("y", 0)
-        w, h = video.size
-        width = crop_settings.get("width", w)
-        height = crop_settings.get("height", h)
-        return video.cropped(x1=x, y1=y, x2=x + width, y2=y + height)
+        Args:
+            width: Ширина исходного кадра
+            height: Высота исходного кадра
+            remove_watermarks: Размыть углы
+        """
+        box = crop_box(self.topic.crop_settings, width, height)
+        if box:
+            width, height = box[2], box[3]
+        tone = None
+        if self.topic.brightness_adjustment or self.topic.contrast_adjustment:
+            tone = ToneCurve(self.topic.brightness_adjustment, self.topic.contrast_adjustment)
+        
+        steps = []
+        # Удаление водяных знаков (по умолчанию выкл — размывало весь кадр)
+        if remove_watermarks:
+            steps.append(self._blur_corners)
+        
+        # Брендирование: логотип или текстовая плашка (уникализация)
+        overlay = None
+        if self.topic.branding_enabled:
+            logo_path = Path(self.topic.branding_logo_path) if self.topic.branding_logo_path else None
+            if logo_path and logo_path.exists():
+                logo_size = self.topic.branding_size or 100
+                overlay = (logo_tile(logo_path, logo_size), *self._logo_position(width, height, logo_size))
+            else:
+                if logo_path:
+                    logger.warning(f"Логотип не найден: {logo_path}")
+                else:
+                    steps.append(self._inpaint_watermarks_auto)
+                tile, (x, y) = self._text_plashka_overlay(width, height)
+                overlay = (tile, x, y)
+        return FrameKernel(box, tone, steps, overlay)
     
-    def _remove_watermarks(self, video: VideoFileClip) -> VideoFileClip:
+    def _blur_corners(self, frame: np.ndarray) -> None:
         """
-        Попытка удалить водяные знаки.
+        Попытка удалить водяные знаки: размыть углы кадра (на месте).
         
         Внимание: Это базовая реализация. Для реального удаления нужны более сложные алгоритмы.
         """
@@ -178,22 +345,21 @@ class VideoProcessor:
         # 2. ML-модели для детекции и удаления
         # 3. Размытие углов (где обычно размещаются водяные знаки)
         
-        # Размываем только углы (маска = 0 в центре, >0 в углах).
-        def blur_corners(frame):
-            h, w = frame.shape[:2]
-            corner_size = min(w, h) // 10
-            frame_blurred = cv2.GaussianBlur(frame, (15, 15), 0)
-            mask = np.zeros((h, w), dtype=np.float32)
-            mask[:corner_size, :corner_size] = 0.5
-            mask[:corner_size, -corner_size:] = 0.5
-            mask[-corner_size:, :corner_size] = 0.5
-            mask[-corner_size:, -corner_size:] = 0.5
-            if len(frame.shape) == 3:
-                mask = np.stack([mask] * frame.shape[2], axis=2)
-            out = frame.astype(np.float32) * (1 - mask) + frame_blurred.astype(np.float32) * mask
-            return np.clip(out, 0, 255).astype(frame.dtype)
-        
-        return video.image_transform(blur_corners)
+        # Углы смешиваются пополам с размытием. Размываем только углы с полями
+        # в радиус ядра (7 px) — результат тот же, что у размытия всего кадра.
+        h, w = frame.shape[:2]
+        corner_size = min(w, h) // 10
+        if not corner_size:
+            return
+        pad = 7
+        for y0, x0 in ((0, 0), (0, w - corner_size), (h - corner_size, 0), (h - corner_size, w - corner_size)):
+            py0, px0 = max(0, y0 - pad), max(0, x0 - pad)
+            py1, px1 = min(h, y0 + corner_size + pad), min(w, x0 + corner_size + pad)
+            blurred = cv2.GaussianBlur(frame[py0:py1, px0:px1], (15, 15), 0)
+            blurred = blurred[y0 - py0:y0 - py0 + corner_size, x0 - px0:x0 - px0 + corner_size]
+            region = frame[y0:y0 + corner_size, x0:x0 + corner_size]
+            out = region.astype(np.float32) * 0.5 + blurred.astype(np.float32) * 0.5
+            region[...] = np.clip(out, 0, 255).astype(frame.dtype)
 
     def _detect_watermark_in_roi(self, roi: np.ndarray) -> np.ndarray:
         """
@@ -218,9 +384,9 @@ class VideoProcessor:
         combined = cv2.morphologyEx(combined, cv2.MORPH_OPEN, kernel)
         return (combined > 0).astype(np.uint8) * 255
 
-    def _inpaint_watermarks_auto(self, video: VideoFileClip) -> VideoFileClip:
+    def _inpaint_watermarks_auto(self, frame: np.ndarray) -> None:
         """
-        Автопоиск и затирка водяных знаков: сканируем углы (по настройкам),
+        Автопоиск и затирка водяных знаков (на месте): сканируем углы (по настройкам),
         детекция по цвету/яркости, инпейнтинг только по маске.
         """
         roi_pct = getattr(settings, "WATERMARK_ROI_PERCENT", 0.08)
@@ -229,42 +395,39 @@ class VideoProcessor:
 
         corners = ["tl", "tr", "bl", "br"] if corners_cfg == "all" else ["br"]
 
-        def inpaint_frame(frame: np.ndarray) -> np.ndarray:
-            fh, fw = frame.shape[:2]
-            if len(frame.shape) != 3:
-                return frame
-            rw = max(40, int(fw * roi_pct))
-            rh = max(40, int(fh * roi_pct))
-            full_mask = np.zeros((fh, fw), dtype=np.uint8)
-
-            if "tl" in corners:
-                roi = frame[0:rh, 0:rw].copy()
-                m = self._detect_watermark_in_roi(roi)
-                full_mask[0:rh, 0:rw] = np.maximum(full_mask[0:rh, 0:rw], m)
-            if "tr" in corners:
-                roi = frame[0:rh, -rw:].copy()
-                m = self._detect_watermark_in_roi(roi)
-                full_mask[0:rh, -rw:] = np.maximum(full_mask[0:rh, -rw:], m)
-            if "bl" in corners:
-                roi = frame[-rh:, 0:rw].copy()
-                m = self._detect_watermark_in_roi(roi)
-                full_mask[-rh:, 0:rw] = np.maximum(full_mask[-rh:, 0:rw], m)
-            if "br" in corners:
-                roi = frame[-rh:, -rw:].copy()
-                m = self._detect_watermark_in_roi(roi)
-                if fallback_br and m.sum() == 0:
-                    cx, cy = rw // 2, rh // 2
-                    ax, ay = max(4, rw // 4), max(4, rh // 4)
-                    m = np.zeros((rh, rw), dtype=np.uint8)
-                    cv2.ellipse(m, (cx, cy), (ax, ay), 0, 0, 360, 255, -1)
-                full_mask[-rh:, -rw:] = np.maximum(full_mask[-rh:, -rw:], m)
+        fh, fw = frame.shape[:2]
+        if len(frame.shape) != 3:
+            return
+        rw = max(40, int(fw * roi_pct))
+        rh = max(40, int(fh * roi_pct))
+        full_mask = np.zeros((fh, fw), dtype=np.uint8)
 
-            if full_mask.sum() == 0:
-                return frame
-            radius = max(2, min(rw, rh) // 8)
-            return cv2.inpaint(frame, full_mask, radius, cv2.INPAINT_TELEA)
+        if "tl" in corners:
+            roi = frame[0:rh, 0:rw].copy()
+            m = self._detect_watermark_in_roi(roi)
+            full_mask[0:rh, 0:rw] = np.maximum(full_mask[0:rh, 0:rw], m)
+        if "tr" in corners:
+            roi = frame[0:rh, -rw:].copy()
+            m = self._detect_watermark_in_roi(roi)
+            full_mask[0:rh, -rw:] = np.maximum(full_mask[0:rh, -rw:], m)
+        if "bl" in corners:
+            roi = frame[-rh:, 0:rw].copy()
+            m = self._detect_watermark_in_roi(roi)
+            full_mask[-rh:, 0:rw] = np.maximum(full_mask[-rh:, 0:rw], m)
+        if "br" in corners:
+            roi = frame[-rh:, -rw:].copy()
+            m = self._detect_watermark_in_roi(roi)
+            if fallback_br and m.sum() == 0:
+                cx, cy = rw // 2, rh // 2
+                ax, ay = max(4, rw // 4), max(4, rh // 4)
+                m = np.zeros((rh, rw), dtype=np.uint8)
+                cv2.ellipse(m, (cx, cy), (ax, ay), 0, 0, 360, 255, -1)
+            full_mask[-rh:, -rw:] = np.maximum(full_mask[-rh:, -rw:], m)
 
-        return video.image_transform(inpaint_frame)
+        if full_mask.sum() == 0:
+            return
+        radius = max(2, min(rw, rh) // 8)
+        cv2.inpaint(frame, full_mask, radius, cv2.INPAINT_TELEA, dst=frame)
 
     def _draw_instagram_icon(self, size: int) -> Image.Image:
         """Рисует иконку Instagram (скруглённый квадрат + объектив + точка). Не прозрачная."""
@@ -284,34 +447,30 @@ class VideoProcessor:
         d.ellipse([cx + rad - dot, cy - rad, cx + rad + dot, cy - rad + 2 * dot], fill=(255, 255, 255))
         return img
 
-    def _add_text_plashka(self, video: VideoFileClip) -> VideoFileClip:
-        """Только значок Instagram + ник, без рамок. Чуть выше, тень чтобы не сливалось."""
-        w, h = video.size
+    def _text_plashka_overlay(self, w: int, h: int) -> tuple[OverlayTile, tuple[int, int]]:
+        """Плашка для кадра w×h (из кэша) и позиция её левого верхнего угла.
+        
+        Только значок Instagram + ник, без рамок. Чуть выше, тень чтобы не сливалось.
+        """
         margin = max(16, min(w, h) // 40)
         lift = 56  # поднять выше от низа
         font_size = max(18, min(24, h // 40))
+        text = (getattr(settings, "BRANDING_DEFAULT_TEXT", None) or "Rise_motivation.7").strip() or "Rise_motivation.7"
+        font, font_path = find_font(font_size)
+        tile = OVERLAY_CACHE.get(
+            ("text", text, font_path, font_size),
+            lambda: self._render_text_plashka(text, font, font_size),
+        )
+        return tile, (w - tile.width - margin, h - tile.height - margin - lift)
+
+    def _render_text_plashka(self, text: str, font: ImageFont.ImageFont, font_size: int) -> np.ndarray:
+        """Нарисовать плашку (RGBA): значок Instagram и ник с тенью."""
         icon_size = max(20, font_size + 4)
         gap = 8
         pad_v = 4
         pad_h = 4
         text_pad_right = 12  # запас, чтобы ник не залезал за край
 
-        font = None
-        for path in (
-            "C:/Windows/Fonts/segoeui.ttf",
-            "C:/Windows/Fonts/arial.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-            "arial.ttf",
-        ):
-            try:
-                font = ImageFont.truetype(path, font_size)
-                break
-            except Exception:
-                continue
-        if font is None:
-            font = ImageFont.load_default()
-
-        text = (getattr(settings, "BRANDING_DEFAULT_TEXT", None) or "Rise_motivation.7").strip() or "Rise_motivation.7"
         tmp = Image.new("RGB", (1, 1))
         dd = ImageDraw.Draw(tmp)
         try:
@@ -336,22 +495,10 @@ class VideoProcessor:
         draw.text((tx + 1, ty + 1), text, fill=(0, 0, 0), font=font)
         draw.text((tx, ty), text, fill=(255, 255, 255), font=font)
 
-        arr = np.array(canvas)
-        clip = ImageClip(arr, duration=video.duration)
-        clip = clip.with_position((w - bw - margin, h - bh - margin - lift))
-        return CompositeVideoClip([video, clip])
+        return np.array(canvas)
 
-    def _add_branding(self, video: VideoFileClip) -> VideoFileClip:
-        """Добавить брендированную плашку (логотип)."""
-        logo_path = Path(self.topic.branding_logo_path)
-        if not logo_path.exists():
-            logger.warning(f"Логотип не найден: {logo_path}")
-            return self._add_text_plashka(video)
-        
-        logo = ImageClip(str(logo_path), duration=video.duration)
-        logo_size = self.topic.branding_size or 100
-        logo = logo.resized(new_size=(logo_size, logo_size))
-        w, h = video.size
+    def _logo_position(self, w: int, h: int, logo_size: int) -> tuple[int, int]:
+        """Позиция логотипа в кадре w×h по branding_position и branding_margin."""
         margin = self.topic.branding_margin or 20
         position_map = {
             "top_left": (margin, margin),
@@ -359,12 +506,10 @@ class VideoProcessor:
             "bottom_left": (margin, h - logo_size - margin),
             "bottom_right": (w - logo_size - margin, h - logo_size - margin),
         }
-        pos = position_map.get(
+        return position_map.get(
             getattr(self.topic, "branding_position", None) or "bottom_right",
             position_map["bottom_right"],
         )
-        logo = logo.with_position(pos)
-        return CompositeVideoClip([video, logo])
     
     def get_video_info(self, video_path: str) -> Dict[str, Any]:
         """Получить информацию о видео."""
@@ -0,0 +1,77 @@
+"""Яркость и контраст кадра таблицами подстановки (LUT) вместо PIL.
+
+Повторяет ImageEnhance.Brightness и ImageEnhance.Contrast: обе — смешивание
+(Image.blend) с «вырожденным» изображением, ``out = base + factor * (v - base)``
+во float32 с отбрасыванием дробной части и обрезкой до 0–255. У яркости base = 0,
+у контраста — округлённая средняя яркость кадра в оттенках серого после
+изменения яркости. Поэтому таблица яркости строится один раз на тематику,
+а таблица контраста — по средней кадра (256 вариантов, кэшируются).
+Обрезанному кадру среднюю даёт весь кадр (см. kernel.py).
+
+Результат совпадает с PIL с точностью до ±1 при редком расхождении округления
+средней (cv2 считает серый с 14-битной, PIL — с 16-битной точностью).
+Замер — benchmarks/tone_lut.py.
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+_LEVELS = np.arange(256, dtype=np.float32)
+
+
+def blend_lut(base: float, factor: float) -> np.ndarray:
+    """Таблица ``base + factor * (v - base)`` с округлением как в Image.blend."""
+    base = np.float32(base)
+    values = base + np.float32(factor) * (_LEVELS - base)
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+def gray_mean(frame: np.ndarray) -> int:
+    """Средняя яркость кадра RGB, как в ImageEnhance.Contrast."""
+    return int(cv2.mean(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY))[0] + 0.5)
+
+
+class ToneCurve:
+    """Яркость и контраст тематики (проценты, как в Topic) для кадров uint8 RGB."""
+
+    def __init__(self, brightness: float = 0.0, contrast: float = 0.0):
+        self.brightness = 1 + (brightness or 0) / 100
+        self.contrast = 1 + (contrast or 0) / 100
+        self.brightness_lut: Optional[np.ndarray] = blend_lut(0, self.brightness) if brightness else None
+        self._contrast_luts: Dict[int, np.ndarray] = {}
+        self.contrast_enabled = bool(contrast)
+
+    @property
+    def enabled(self) -> bool:
+        return self.brightness_lut is not None or self.contrast_enabled
+
+    def contrast_lut(self, mean: int) -> np.ndarray:
+        lut = self._contrast_luts.get(mean)
+        if lut is None:
+            lut = self._contrast_luts[mean] = blend_lut(mean, self.contrast)
+        return lut
+
+    def apply(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Применить к кадру.
+
+        Args:
+            frame: Кадр uint8 RGB (не меняется, если out не он сам)
+            out: Куда писать результат (можно сам frame — тогда на месте)
+
+        Returns:
+            out или новый массив
+        """
+        if frame.dtype != np.uint8:
+            frame = np.clip(frame, 0, 255).astype(np.uint8)
+        if self.brightness_lut is not None:
+            out = cv2.LUT(frame, self.brightness_lut, dst=out)
+            frame = out
+        if self.contrast_enabled:
+            out = cv2.LUT(frame, self.contrast_lut(gray_mean(frame)), dst=out)
+        elif out is None:
+            out = frame.copy()
+        return out
@@ -3,16 +3,14 @@
 """
 import sys
 from pathlib import Path
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from loguru import logger
 
 # Настройка логирования (без эмодзи для Windows)
 logger.remove()
 logger.add(sys.stdout, format="{time:HH:mm:ss} | {level: <8} | {message}", level="INFO")
 
+from database import SessionLocal
 from database.models import Base, Topic
-from config import settings
 
 # Импортируем сборщики
 from modules.thematic_collectors.humor_collector import HumorCollector
@@ -27,10 +25,8 @@ def main():
     print("ТЕМАТИЧЕСКИЙ СБОР ВИДЕО С INSTAGRAM")
     print("="*80)
     
-    # Подключаемся к БД
-    engine = create_engine(settings.DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    db = Session()
+    # Подключаемся к БД (общий движок с WAL/busy_timeout — не конфликтует с ботом и Celery)
+    db = SessionLocal()
     
     # Получаем параметры из аргументов
     if len(sys.argv) > 1:
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Пакетная обработка скачанных видео (DOWNLOADED) на всех ядрах.
+
+Запуск:
+  python scripts/process_batch.py                     # все тематики
+  python scripts/process_batch.py --topic 3 --limit 50
+  python scripts/process_batch.py --workers 4 --threads 2
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from database import SessionLocal
+from modules.video_processor import BatchProcessor
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--topic", type=int, default=None, help="ID тематики (по умолчанию все)")
+    ap.add_argument("--limit", type=int, default=None, help="Максимум видео за запуск")
+    ap.add_argument("--workers", type=int, default=None, help="Процессов (по умолчанию по ядрам)")
+    ap.add_argument("--threads", type=int, default=None, help="Потоков ffmpeg на процесс")
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = BatchProcessor(db, workers=args.workers, threads=args.threads).run(
+            topic_id=args.topic, limit=args.limit
+        )
+    finally:
+        db.close()
+
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Разбор трасс жизненного цикла видео (спаны из TRACE_DIR, см. modules/monitoring/tracing.py).
+
+Запуск:
+  python scripts/trace_report.py --video 123          # критический путь видео
+  python scripts/trace_report.py --slowest 10         # самые долгие трассы за сутки
+  python scripts/trace_report.py --slowest 20 --hours 6
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from database import SessionLocal
+from database.models import Video, VideoArchive
+from modules.monitoring.tracing import critical_path, read_spans, slowest_traces
+
+
+def _fmt_seconds(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} ч"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f} мин"
+    return f"{seconds:.2f} с"
+
+
+def _find_trace_id(video_id: int):
+    db = SessionLocal()
+    try:
+        for model in (Video, VideoArchive):
+            trace_id = db.query(model.trace_id).filter(model.id == video_id).scalar()
+            if trace_id:
+                return trace_id
+        return None
+    finally:
+        db.close()
+
+
+def print_critical_path(video_id: int) -> int:
+    trace_id = _find_trace_id(video_id)
+    if not trace_id:
+        print(f"У видео {video_id} нет trace_id")
+        return 1
+    spans = read_spans(trace_ids=[trace_id])
+    if not spans:
+        print(f"Спанов трассы {trace_id} не найдено")
+        return 1
+
+    rows = critical_path(spans)
+    total = max(s["end"] for s in spans) - min(s["start"] for s in spans)
+    waited = sum(row["wait"] for row in rows if row["depth"] == 0)
+    started = datetime.utcfromtimestamp(min(s["start"] for s in spans))
+    print(f"Видео {video_id}, трасса {trace_id}: {_fmt_seconds(total)} с {started:%Y-%m-%d %H:%M:%S} UTC, "
+          f"из них ожидание между стадиями {_fmt_seconds(waited)}")
+    print(f"{'смещение':>10}  {'ожидание':>10}  {'длительность':>12}  спан")
+    for row in rows:
+        item = row["span"]
+        mark = f"  ✗ {item['error']}" if item.get("status") == "error" else ""
+        print(
+            f"{_fmt_seconds(row['offset']):>10}  {_fmt_seconds(row['wait']):>10}  "
+            f"{_fmt_seconds(item['duration']):>12}  {'  ' * row['depth']}{item['name']}"
+            f" [{item.get('worker', '')}]{mark}"
+        )
+    return 0
+
+
+def print_slowest(limit: int, hours: float) -> int:
+    # read_spans отдаёт трассы окна целиком, вместе со спанами до его начала
+    spans = read_spans(since=datetime.utcnow() - timedelta(hours=hours))
+    traces = slowest_traces(spans, limit=limit)
+    if not traces:
+        print(f"Трасс за {hours:g} ч не найдено")
+        return 0
+    print(f"Самые долгие трассы за {hours:g} ч:")
+    for trace in traces:
+        stages = ", ".join(f"{name} {_fmt_seconds(sec)}" for name, sec in trace["stages"].items())
+        errors = f", ошибок: {trace['errors']}" if trace["errors"] else ""
+        print(f"  {_fmt_seconds(trace['total']):>10}  видео {trace['video_id']}  {trace['trace_id']}  ({stages}{errors})")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--video", type=int, default=None, help="ID видео: показать критический путь")
+    ap.add_argument("--slowest", type=int, default=None, help="Показать N самых долгих трасс")
+    ap.add_argument("--hours", type=float, default=24, help="Окно для --slowest, часов")
+    args = ap.parse_args()
+
+    if args.video is not None:
+        return print_critical_path(args.video)
+    return print_slowest(args.slowest or 10, args.hours)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
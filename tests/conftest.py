@@ -0,0 +1,86 @@
+"""
+Общие фикстуры тестов.
+
+Модуля config в репозитории нет (настройки у каждого свои), поэтому тесты
+подставляют собственный: каталоги и SQLite во временной папке, так что
+рабочая БД и файлы не затрагиваются. Необязательных настроек в нём нет —
+код берёт значения по умолчанию через getattr; конкретный тест задаёт
+нужную настройку через ``monkeypatch.setattr(settings, ..., raising=False)``.
+
+Запуск из корня репозитория:
+    python -m pytest -q tests
+"""
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(__file__).resolve().parent / "data"
+_TMP = Path(tempfile.mkdtemp(prefix="content-zavod-tests-"))
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+class _Settings:
+    """Минимальные обязательные настройки (остальные — по умолчанию в коде)."""
+    DATABASE_URL = f"sqlite:///{_TMP / 'app.db'}"
+    REDIS_URL = "redis://127.0.0.1:6379/15"
+    LOGS_DIR = _TMP / "logs"
+    DOWNLOADS_DIR = _TMP / "downloads"
+    PROCESSED_DIR = _TMP / "processed"
+    DEFAULT_TIMEZONE = "Europe/Moscow"
+    VIDEO_TARGET_RESOLUTION = (1080, 1920)
+    LOG_LEVEL = "INFO"
+    TELEGRAM_BOT_TOKEN = ""
+    TELEGRAM_ADMIN_IDS = []
+    INSTAGRAM_PROXY = None
+    PROXY_LIST = []
+
+
+_config = types.ModuleType("config")
+_config.settings = _Settings()
+sys.modules["config"] = _config
+
+
+@pytest.fixture
+def settings():
+    """Настройки, которые видит код приложения."""
+    return _config.settings
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Чистая SQLite-БД в схеме текущих моделей (create_all + миграции)."""
+    from database import Base, create_db_engine
+    from database.migrations import run_migrations
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    """Сессия БД, как у приложения (SessionLocal)."""
+    from sqlalchemy.orm import sessionmaker
+
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def topic(db):
+    """Активная тематика."""
+    from database.models import Topic
+
+    topic = Topic(name="Тестовая тематика", is_active=True)
+    db.add(topic)
+    db.commit()
+    return topic
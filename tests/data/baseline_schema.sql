@@ -0,0 +1,130 @@
+CREATE TABLE accounts (
+	id INTEGER NOT NULL, 
+	topic_id INTEGER NOT NULL, 
+	platform VARCHAR(10) NOT NULL, 
+	username VARCHAR(200) NOT NULL, 
+	credentials JSON, 
+	instagram_session_username VARCHAR(200), 
+	is_active BOOLEAN, 
+	last_check DATETIME, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(topic_id) REFERENCES topics (id)
+);
+
+CREATE TABLE content_sources (
+	id INTEGER NOT NULL, 
+	topic_id INTEGER NOT NULL, 
+	source_type VARCHAR(50) NOT NULL, 
+	source_value VARCHAR(500) NOT NULL, 
+	is_active BOOLEAN, 
+	min_views INTEGER, 
+	min_likes INTEGER, 
+	instagram_account_id INTEGER, 
+	last_check DATETIME, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(topic_id) REFERENCES topics (id), 
+	FOREIGN KEY(instagram_account_id) REFERENCES accounts (id)
+);
+
+CREATE TABLE daily_reports (
+	id INTEGER NOT NULL, 
+	report_date DATETIME NOT NULL, 
+	topics_stats JSON, 
+	total_found INTEGER, 
+	total_downloaded INTEGER, 
+	total_processed INTEGER, 
+	total_published INTEGER, 
+	errors JSON, 
+	warnings JSON, 
+	created_at DATETIME, 
+	PRIMARY KEY (id)
+);
+
+CREATE TABLE publications (
+	id INTEGER NOT NULL, 
+	video_id INTEGER NOT NULL, 
+	account_id INTEGER NOT NULL, 
+	platform VARCHAR(10) NOT NULL, 
+	status VARCHAR(50), 
+	platform_post_id VARCHAR(200), 
+	platform_url VARCHAR(1000), 
+	views INTEGER, 
+	likes INTEGER, 
+	comments INTEGER, 
+	shares INTEGER, 
+	last_metrics_update DATETIME, 
+	error_message TEXT, 
+	scheduled_at DATETIME, 
+	published_at DATETIME, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(video_id) REFERENCES videos (id), 
+	FOREIGN KEY(account_id) REFERENCES accounts (id)
+);
+
+CREATE TABLE schedules (
+	id INTEGER NOT NULL, 
+	topic_id INTEGER NOT NULL, 
+	time_slot VARCHAR(10) NOT NULL, 
+	day_of_week INTEGER, 
+	is_active BOOLEAN, 
+	created_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(topic_id) REFERENCES topics (id)
+);
+
+CREATE TABLE topics (
+	id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	description TEXT, 
+	is_active BOOLEAN, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	video_speed_change FLOAT, 
+	brightness_adjustment FLOAT, 
+	contrast_adjustment FLOAT, 
+	crop_settings JSON, 
+	branding_enabled BOOLEAN, 
+	branding_logo_path VARCHAR(500), 
+	branding_position VARCHAR(50), 
+	branding_size INTEGER, 
+	branding_opacity FLOAT, 
+	branding_margin INTEGER, 
+	base_tags JSON, 
+	tag_pool JSON, 
+	description_template TEXT, 
+	PRIMARY KEY (id), 
+	UNIQUE (name)
+);
+
+CREATE TABLE videos (
+	id INTEGER NOT NULL, 
+	topic_id INTEGER NOT NULL, 
+	status VARCHAR(10), 
+	source_url VARCHAR(1000), 
+	source_platform VARCHAR(50), 
+	source_post_id VARCHAR(200), 
+	source_author VARCHAR(200), 
+	original_file_path VARCHAR(1000), 
+	processed_file_path VARCHAR(1000), 
+	title VARCHAR(500), 
+	description TEXT, 
+	tags JSON, 
+	duration FLOAT, 
+	resolution VARCHAR(50), 
+	metadata_json JSON, 
+	error_message TEXT, 
+	found_at DATETIME, 
+	downloaded_at DATETIME, 
+	processed_at DATETIME, 
+	published_at DATETIME, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(topic_id) REFERENCES topics (id)
+);
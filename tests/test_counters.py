@@ -0,0 +1,67 @@
+"""Счётчики статусов: дельты при flush, пересборка, архивация."""
+from datetime import datetime, timedelta
+
+from database.archive import archive_finished_videos
+from database.counters import get_status_counts, reconcile_status_counters
+from database.models import Video, VideoStatus, VideoStatusCounter
+
+
+def _add_videos(db, topic, *statuses):
+    videos = [
+        Video(topic_id=topic.id, status=status, source_post_id=f"p{i}", source_platform="instagram")
+        for i, status in enumerate(statuses)
+    ]
+    db.add_all(videos)
+    db.commit()
+    return videos
+
+
+def _actual_counts(db):
+    rows = db.query(Video.topic_id, Video.status).all()
+    counts = {}
+    for key in rows:
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _nonzero(counts):
+    return {key: n for key, n in counts.items() if n}
+
+
+def test_flush_applies_status_deltas(db, topic):
+    videos = _add_videos(db, topic, VideoStatus.FOUND, VideoStatus.FOUND, VideoStatus.DOWNLOADED)
+    assert get_status_counts(db) == {(topic.id, VideoStatus.FOUND): 2, (topic.id, VideoStatus.DOWNLOADED): 1}
+
+    videos[0].status = VideoStatus.DOWNLOADED
+    db.commit()
+    # Объект истёк после commit — старый статус подгружается из БД
+    videos[0].status = VideoStatus.PROCESSING
+    db.delete(videos[1])
+    db.commit()
+
+    assert _nonzero(get_status_counts(db)) == _actual_counts(db) == {
+        (topic.id, VideoStatus.DOWNLOADED): 1,
+        (topic.id, VideoStatus.PROCESSING): 1,
+    }
+
+
+def test_reconcile_rebuilds_from_videos(db, topic):
+    _add_videos(db, topic, VideoStatus.FOUND, VideoStatus.PROCESSED)
+    db.query(VideoStatusCounter).update({"count": 42})
+    db.commit()
+
+    assert reconcile_status_counters(db) == 2
+    assert get_status_counts(db) == _actual_counts(db)
+
+
+def test_archive_decrements_counters(db, topic):
+    _add_videos(db, topic, VideoStatus.PUBLISHED, VideoStatus.ERROR, VideoStatus.FOUND)
+    now = datetime.utcnow()
+    db.query(Video).update({"updated_at": now - timedelta(days=90)})
+    db.commit()
+
+    assert archive_finished_videos(db, now=now)["videos"] == 2
+    assert _nonzero(get_status_counts(db)) == _actual_counts(db) == {(topic.id, VideoStatus.FOUND): 1}
+
+    reconcile_status_counters(db)
+    assert get_status_counts(db) == {(topic.id, VideoStatus.FOUND): 1}
@@ -0,0 +1,136 @@
+"""
+Покадровая обработка: LUT яркости/контраста и FrameKernel против прежних шагов.
+
+Эталон — прежний moviepy-путь шаг за шагом: ImageEnhance (benchmarks.tone_lut.pil_adjust),
+обрезка, размытие углов по маске на весь кадр, затирка водяного знака и
+смешивание плашки по альфе.
+"""
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.tone_lut import make_frames, pil_adjust
+from modules.video_processor.kernel import FrameKernel, crop_box
+from modules.video_processor.processor import TopicProcessingSettings, VideoProcessor
+from modules.video_processor.tone import ToneCurve
+
+WIDTH, HEIGHT = 360, 640
+TONES = [(5, 5), (-10, 0), (0, 20), (15, -15), (-30, 40)]
+
+
+def _frames():
+    frames = make_frames(WIDTH, HEIGHT)
+    # «Водяной знак» в правом нижнем углу — затирке есть что искать
+    cv2.putText(frames[0], "@author", (WIDTH - 110, HEIGHT - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return frames
+
+
+def _read_only(frame):
+    frame = frame.copy()
+    frame.flags.writeable = False
+    return frame
+
+
+def old_blur_corners(frame):
+    """Прежнее размытие углов: размытие всего кадра и смешивание по маске."""
+    h, w = frame.shape[:2]
+    corner_size = min(w, h) // 10
+    frame_blurred = cv2.GaussianBlur(frame, (15, 15), 0)
+    mask = np.zeros((h, w), dtype=np.float32)
+    mask[:corner_size, :corner_size] = 0.5
+    mask[:corner_size, -corner_size:] = 0.5
+    mask[-corner_size:, :corner_size] = 0.5
+    mask[-corner_size:, -corner_size:] = 0.5
+    if len(frame.shape) == 3:
+        mask = np.stack([mask] * frame.shape[2], axis=2)
+    out = frame.astype(np.float32) * (1 - mask) + frame_blurred.astype(np.float32) * mask
+    return np.clip(out, 0, 255).astype(frame.dtype)
+
+
+def alpha_blend(frame, rgba, x, y):
+    """Наложение RGBA по альфе, как у CompositeVideoClip."""
+    out = frame.copy()
+    th, tw = rgba.shape[:2]
+    alpha = rgba[:, :, 3:4] / 255.0
+    region = out[y:y + th, x:x + tw].astype(np.float64)
+    out[y:y + th, x:x + tw] = np.round(region * (1 - alpha) + rgba[:, :, :3] * alpha).astype(np.uint8)
+    return out
+
+
+@pytest.mark.parametrize("brightness, contrast", TONES)
+def test_tone_curve_matches_pil(brightness, contrast):
+    curve = ToneCurve(brightness, contrast)
+    for frame in _frames():
+        expected = pil_adjust(frame, brightness, contrast)
+        diff = np.abs(curve.apply(frame).astype(int) - expected.astype(int))
+        assert diff.max() <= 1
+        assert diff.mean() < 0.01
+
+
+def test_tone_curve_in_place():
+    frame = _frames()[0]
+    expected = pil_adjust(frame, 10, 10)
+    out = ToneCurve(10, 10).apply(frame, out=frame)
+    assert out is frame
+    assert np.abs(frame.astype(int) - expected.astype(int)).max() <= 1
+
+
+@pytest.mark.parametrize("brightness, contrast", TONES)
+def test_kernel_crop_takes_contrast_mean_from_full_frame(brightness, contrast):
+    x, y, w, h = box = crop_box({"x": 20, "y": 40, "width": 200, "height": 300}, WIDTH, HEIGHT)
+    kernel = FrameKernel(crop=box, tone=ToneCurve(brightness, contrast))
+    for frame in _frames():
+        expected = pil_adjust(frame, brightness, contrast)[y:y + h, x:x + w]
+        out = kernel(_read_only(frame))
+        assert out.shape == expected.shape
+        assert np.abs(out.astype(int) - expected.astype(int)).max() <= 1
+
+
+def test_crop_box_clips_to_frame():
+    assert crop_box(None, WIDTH, HEIGHT) is None
+    assert crop_box({"x": 300, "y": -5, "width": 200}, WIDTH, HEIGHT) == (300, 0, 60, HEIGHT)
+
+
+def test_blur_corners_matches_full_frame_blur():
+    processor = VideoProcessor(TopicProcessingSettings(id=1, name="Тест"))
+    for frame in _frames():
+        out = frame.copy()
+        processor._blur_corners(out)
+        assert np.array_equal(out, old_blur_corners(frame))
+
+
+@pytest.mark.parametrize("crop", [None, {"x": 10, "y": 20, "width": 300, "height": 500}])
+def test_kernel_matches_sequential_steps(crop):
+    topic = TopicProcessingSettings(
+        id=1, name="Котики", brightness_adjustment=5, contrast_adjustment=5, crop_settings=crop,
+    )
+    processor = VideoProcessor(topic)
+    kernel = processor.compile_frame_kernel(WIDTH, HEIGHT, remove_watermarks=True)
+    tile, tile_x, tile_y = kernel.overlay
+
+    for frame in _frames():
+        expected = pil_adjust(frame, 5, 5)
+        if crop:
+            x, y, w, h = crop_box(crop, WIDTH, HEIGHT)
+            expected = expected[y:y + h, x:x + w]
+        expected = old_blur_corners(expected)
+        expected = np.ascontiguousarray(expected)
+        processor._inpaint_watermarks_auto(expected)
+        expected = alpha_blend(expected, tile.rgba, tile_x, tile_y)
+
+        source = _read_only(frame)
+        out = kernel(source)
+        assert np.array_equal(source, frame)
+        assert out.shape == expected.shape
+        assert np.abs(out.astype(int) - expected.astype(int)).max() <= 1
+
+
+def test_identity_kernel():
+    processor = VideoProcessor(TopicProcessingSettings(id=1, name="Тест", branding_enabled=False))
+    assert processor.compile_frame_kernel(WIDTH, HEIGHT).identity
+
+    kernel = FrameKernel(crop=(0, 0, 100, 100))
+    frame = _frames()[0]
+    out = kernel(frame)
+    assert not kernel.identity
+    assert np.shares_memory(out, frame) and out.shape == (100, 100, 3)
@@ -0,0 +1,72 @@
+"""Пакетная запись найденных видео: конфликты, архив, счётчики."""
+from database.counters import get_status_counts
+from database.models import ArchivedSourceKey, Video, VideoStatus
+from modules.content_manager.ingest import KnownSourceIds, bulk_insert_videos, save_found_video
+
+
+def _row(topic, post_id, platform="instagram", **values):
+    return {
+        "topic_id": topic.id,
+        "source_post_id": post_id,
+        "source_platform": platform,
+        "source_url": f"https://www.instagram.com/reel/{post_id}/",
+        "status": VideoStatus.FOUND,
+        **values,
+    }
+
+
+def test_bulk_insert_skips_conflicts(db, topic):
+    created = bulk_insert_videos(db, [_row(topic, "a"), _row(topic, "b")])
+    db.commit()
+    assert sorted(v.source_post_id for v in created) == ["a", "b"]
+
+    created = bulk_insert_videos(db, [_row(topic, "b"), _row(topic, "c"), _row(topic, "b", platform="tiktok")])
+    db.commit()
+    assert sorted((v.source_post_id, v.source_platform) for v in created) == [("b", "tiktok"), ("c", "instagram")]
+    assert db.query(Video).count() == 4
+    assert all(v.trace_id for v in created)
+
+
+def test_bulk_insert_treats_missing_platform_as_empty(db, topic):
+    bulk_insert_videos(db, [_row(topic, "a", platform=None)])
+    db.commit()
+
+    assert bulk_insert_videos(db, [_row(topic, "a", platform="")]) == []
+    assert db.query(Video).filter(Video.source_post_id == "a").one().source_platform == ""
+
+
+def test_bulk_insert_updates_counters_for_inserted_rows_only(db, topic):
+    bulk_insert_videos(db, [_row(topic, "a"), _row(topic, "b")])
+    bulk_insert_videos(db, [_row(topic, "a"), _row(topic, "c")])
+    db.commit()
+
+    assert get_status_counts(db, topic.id) == {(topic.id, VideoStatus.FOUND): 3}
+
+
+def test_known_source_ids_include_archive(db, topic):
+    known = KnownSourceIds(db, topic.id)
+    assert not known
+
+    bulk_insert_videos(db, [_row(topic, "hot")])
+    db.add(ArchivedSourceKey(topic_id=topic.id, source_post_id="old", source_platform="instagram"))
+    db.commit()
+
+    known = KnownSourceIds(db, topic.id)
+    assert known
+    assert known.prefetch(["hot", "old", "new", None]) == {"hot", "old"}
+    assert "old" in known and "new" not in known
+    assert "hot" not in KnownSourceIds(db, topic.id + 1)
+
+
+def test_save_found_video(db, topic):
+    created = save_found_video(db, _row(topic, "a"))
+    db.commit()
+    assert created.id
+
+    again = save_found_video(db, _row(topic, "a"))
+    assert again.id == created.id
+
+    db.add(ArchivedSourceKey(topic_id=topic.id, source_post_id="old", source_platform="instagram"))
+    db.commit()
+    assert save_found_video(db, _row(topic, "old")) is None
+    assert db.query(Video).count() == 1
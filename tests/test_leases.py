@@ -0,0 +1,107 @@
+"""Аренда видео воркерами: захват, продление, возврат просроченных."""
+from datetime import datetime, timedelta
+
+from database.counters import get_status_counts
+from database.leases import claim_videos, extend_lease, reap_expired_leases, release_lease
+from database.models import Video, VideoStatus
+
+
+def _add_videos(db, topic, count, status=VideoStatus.DOWNLOADED):
+    videos = [
+        Video(topic_id=topic.id, status=status, source_post_id=f"p{i}", source_platform="tiktok")
+        for i in range(count)
+    ]
+    db.add_all(videos)
+    db.commit()
+    return [v.id for v in videos]
+
+
+def test_claim_is_exclusive(db, topic):
+    ids = _add_videos(db, topic, 3)
+
+    first = claim_videos(db, VideoStatus.DOWNLOADED, 60, limit=2, worker_id="w1")
+    db.commit()
+    second = claim_videos(db, VideoStatus.DOWNLOADED, 60, limit=5, worker_id="w2")
+    db.commit()
+
+    assert len(first) == 2 and len(second) == 1
+    assert sorted(first + second) == ids
+    assert claim_videos(db, VideoStatus.DOWNLOADED, 60, video_ids=ids, worker_id="w3") == []
+    assert {v.id: v.lease_owner for v in db.query(Video)} == {
+        **{i: "w1" for i in first}, **{i: "w2" for i in second},
+    }
+
+
+def test_claim_with_status_change_moves_counters(db, topic):
+    ids = _add_videos(db, topic, 2)
+
+    claimed = claim_videos(
+        db, VideoStatus.DOWNLOADED, 60, video_ids=ids[:1], set_status=VideoStatus.PROCESSING, worker_id="w1"
+    )
+    db.commit()
+
+    assert claimed == ids[:1]
+    assert db.get(Video, ids[0]).status == VideoStatus.PROCESSING
+    assert get_status_counts(db) == {
+        (topic.id, VideoStatus.DOWNLOADED): 1,
+        (topic.id, VideoStatus.PROCESSING): 1,
+    }
+
+
+def test_expired_lease_can_be_reclaimed(db, topic):
+    ids = _add_videos(db, topic, 1)
+    now = datetime.utcnow()
+
+    claim_videos(db, VideoStatus.DOWNLOADED, 60, worker_id="w1", now=now)
+    db.commit()
+    assert claim_videos(db, VideoStatus.DOWNLOADED, 60, worker_id="w2", now=now + timedelta(seconds=30)) == []
+    assert claim_videos(db, VideoStatus.DOWNLOADED, 60, worker_id="w2", now=now + timedelta(seconds=61)) == ids
+
+
+def test_extend_lease_only_by_owner(db, topic):
+    (video_id,) = _add_videos(db, topic, 1)
+    now = datetime.utcnow()
+    claim_videos(db, VideoStatus.DOWNLOADED, 60, worker_id="w1", now=now)
+    db.commit()
+
+    assert not extend_lease(db, video_id, 600, worker_id="w2", now=now)
+    assert extend_lease(db, video_id, 600, worker_id="w1", now=now)
+    db.expire_all()
+    assert db.get(Video, video_id).lease_expires == now + timedelta(seconds=600)
+
+    release_lease(db.get(Video, video_id))
+    db.commit()
+    assert not extend_lease(db, video_id, 600, worker_id="w1", now=now)
+
+
+def test_reap_requeues_expired_processing(db, topic):
+    processing = _add_videos(db, topic, 2)
+    now = datetime.utcnow()
+    claim_videos(
+        db, VideoStatus.DOWNLOADED, 60, video_ids=processing, set_status=VideoStatus.PROCESSING,
+        worker_id="w1", now=now,
+    )
+    db.commit()
+    extend_lease(db, processing[1], 3600, worker_id="w1", now=now)
+
+    requeued = reap_expired_leases(db, now=now + timedelta(seconds=120))
+
+    assert requeued == {VideoStatus.DOWNLOADED: [processing[0]]}
+    db.expire_all()
+    reaped, alive = db.get(Video, processing[0]), db.get(Video, processing[1])
+    assert (reaped.status, reaped.lease_owner, reaped.lease_expires) == (VideoStatus.DOWNLOADED, None, None)
+    assert (alive.status, alive.lease_owner) == (VideoStatus.PROCESSING, "w1")
+    assert get_status_counts(db) == {
+        (topic.id, VideoStatus.DOWNLOADED): 1,
+        (topic.id, VideoStatus.PROCESSING): 1,
+    }
+
+
+def test_reap_requeues_stale_processing_without_lease(db, topic, settings, monkeypatch):
+    monkeypatch.setattr(settings, "PROCESS_LEASE_SECONDS", 600, raising=False)
+    (video_id,) = _add_videos(db, topic, 1, status=VideoStatus.PROCESSING)
+    now = datetime.utcnow()
+    db.query(Video).update({"updated_at": now - timedelta(seconds=601)})
+    db.commit()
+
+    assert reap_expired_leases(db, now=now) == {VideoStatus.DOWNLOADED: [video_id]}
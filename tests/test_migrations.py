@@ -0,0 +1,125 @@
+"""Миграции schema_migrations (001–015) на базе в исходной схеме."""
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect, select, text
+
+import database
+from conftest import DATA_DIR
+from database.migrations import MIGRATIONS
+from database.models import Base, Video, VideoStatus
+
+# (id, topic_id, status, source_url, source_platform, source_post_id, metadata_json)
+LEGACY_VIDEOS = [
+    (1, 1, "FOUND", None, "instagram", "p1", {"view_count": 100, "likes": 5}),
+    # Дубль видео 1 — получит суффикс в миграции 001
+    (2, 1, "DOWNLOADED", None, "instagram", "p1", None),
+    # Без платформы: определяется по URL и совпадает с видео 4 (дубль разводит 012)
+    (3, 1, "FOUND", "https://www.tiktok.com/@a/video/3", None, "p2", {"views": "7", "upload_date": "20240131"}),
+    (4, 1, "PROCESSED", None, "tiktok", "p2", None),
+    # Без URL: платформа по источникам тематики (у тематики 1 только tiktok)
+    (5, 1, "PUBLISHED", None, None, "p4", None),
+    # Тематика без источников — платформу не определить
+    (6, 2, "FOUND", None, None, "p3", None),
+]
+
+
+@pytest.fixture
+def legacy_engine(tmp_path, monkeypatch):
+    """БД в схеме до миграций с «грязными» данными; init_db() работает с ней."""
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.executescript((DATA_DIR / "baseline_schema.sql").read_text(encoding="utf-8"))
+    conn.executemany(
+        "INSERT INTO topics (id, name, is_active) VALUES (?, ?, 1)",
+        [(1, "Первая"), (2, "Вторая")],
+    )
+    conn.execute(
+        "INSERT INTO content_sources (topic_id, source_type, source_value, is_active) "
+        "VALUES (1, 'tiktok', '#cats', 1)"
+    )
+    conn.executemany(
+        "INSERT INTO videos (id, topic_id, status, source_url, source_platform, source_post_id, "
+        "metadata_json, found_at, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, '2024-02-01 10:00:00', '2024-02-01 10:00:00', '2024-02-01 10:00:00')",
+        [(*row[:6], json.dumps(row[6]) if row[6] is not None else None) for row in LEGACY_VIDEOS],
+    )
+    conn.commit()
+    conn.close()
+
+    engine = database.create_db_engine(f"sqlite:///{path}")
+    monkeypatch.setattr(database, "engine", engine)
+    yield engine
+    engine.dispose()
+
+
+def _videos(engine):
+    with engine.connect() as conn:
+        return {row.id: row for row in conn.execute(select(Video.__table__).order_by(Video.id))}
+
+
+def test_init_db_upgrades_legacy_schema(legacy_engine):
+    database.init_db()
+
+    with legacy_engine.connect() as conn:
+        versions = conn.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+    assert versions == [version for version, _, _ in MIGRATIONS]
+
+    inspector = inspect(legacy_engine)
+    for table in Base.metadata.sorted_tables:
+        assert {c.name for c in table.columns} <= {c["name"] for c in inspector.get_columns(table.name)}, table.name
+        assert {ix.name for ix in table.indexes} <= {ix["name"] for ix in inspector.get_indexes(table.name)}, table.name
+    unique = {ix["name"]: ix for ix in inspector.get_indexes("videos")}["uq_videos_topic_post_platform"]
+    assert unique["unique"]
+    assert unique["column_names"] == ["topic_id", "source_post_id", "source_platform"]
+
+
+def test_init_db_dedupes_and_backfills(legacy_engine):
+    database.init_db()
+    videos = _videos(legacy_engine)
+
+    assert [videos[i].source_post_id for i in sorted(videos)] == ["p1", "p1:dup:2", "p2", "p2:dup:4", "p4", "p3"]
+    assert [videos[i].source_platform for i in sorted(videos)] == [
+        "instagram", "instagram", "tiktok", "tiktok", "tiktok", "",
+    ]
+
+    assert (videos[1].source_views, videos[1].source_likes) == (100, 5)
+    assert videos[3].source_views == 7
+    assert videos[3].source_published_at.isoformat() == "2024-01-31T00:00:00"
+    assert videos[2].source_views is None
+
+    trace_ids = [row.trace_id for row in videos.values()]
+    assert all(trace_ids) and len(set(trace_ids)) == len(trace_ids)
+
+
+def test_init_db_fills_status_counters(legacy_engine):
+    database.init_db()
+
+    with legacy_engine.connect() as conn:
+        counters = set(conn.execute(text("SELECT topic_id, status, count FROM video_status_counters")).all())
+        actual = set(conn.execute(text(
+            "SELECT topic_id, status, COUNT(*) FROM videos GROUP BY topic_id, status"
+        )).all())
+    assert counters == actual
+    assert (1, VideoStatus.FOUND.name, 2) in counters
+
+
+def test_init_db_is_idempotent(legacy_engine):
+    database.init_db()
+    before = _videos(legacy_engine)
+    with legacy_engine.connect() as conn:
+        counters = set(conn.execute(text("SELECT topic_id, status, count FROM video_status_counters")).all())
+
+    assert database.migrations.run_migrations(legacy_engine) == []
+    database.init_db()
+
+    assert _videos(legacy_engine) == before
+    with legacy_engine.connect() as conn:
+        assert set(conn.execute(text("SELECT topic_id, status, count FROM video_status_counters")).all()) == counters
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_migrations")).scalar() == len(MIGRATIONS)
+
+
+def test_fresh_database_marks_all_migrations(engine):
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_migrations")).scalar() == len(MIGRATIONS)
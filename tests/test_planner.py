@@ -0,0 +1,64 @@
+"""Потребность тематик в контенте (DemandPlanner)."""
+from datetime import datetime, timedelta
+
+from database.models import PublicationSlot, Topic, Video, VideoStatus
+from modules.scheduler.planner import DemandPlanner
+
+NOW = datetime(2024, 3, 1, 12, 0)
+
+
+def _slots(db, topic, hours):
+    db.add_all(PublicationSlot(topic_id=topic.id, slot_time=NOW + timedelta(hours=h)) for h in hours)
+    db.commit()
+
+
+def _videos(db, topic, status, count):
+    db.add_all(
+        Video(topic_id=topic.id, status=status, source_post_id=f"{status.name}{i}", source_platform="tiktok")
+        for i in range(count)
+    )
+    db.commit()
+
+
+def test_empty_calendar_means_no_limit(db, topic):
+    assert DemandPlanner(db).plan(now=NOW) is None
+
+
+def test_need_is_subtracted_stage_by_stage(db, topic):
+    # 4 слота на горизонте 48 ч × 1.5 = буфер 6
+    _slots(db, topic, [1, 10, 20, 47])
+    _slots(db, topic, [49, -1])
+    _videos(db, topic, VideoStatus.PROCESSED, 1)
+    _videos(db, topic, VideoStatus.PROCESSING, 1)
+    _videos(db, topic, VideoStatus.DOWNLOADED, 1)
+    _videos(db, topic, VideoStatus.FOUND, 1)
+
+    assert DemandPlanner(db).plan(now=NOW) == {
+        topic.id: {"target": 6, "ready": 1, "collect": 2, "download": 3, "process": 4},
+    }
+
+
+def test_full_buffer_needs_nothing(db, topic):
+    _slots(db, topic, [1, 2])
+    _videos(db, topic, VideoStatus.PROCESSED, 5)
+
+    plan = DemandPlanner(db).plan(now=NOW)[topic.id]
+
+    assert (plan["target"], plan["collect"], plan["download"], plan["process"]) == (3, 0, 0, 0)
+
+
+def test_settings_and_inactive_topics(db, topic, settings, monkeypatch):
+    monkeypatch.setattr(settings, "PLANNER_HORIZON_HOURS", 12, raising=False)
+    monkeypatch.setattr(settings, "PLANNER_BUFFER_FACTOR", 2, raising=False)
+    idle = Topic(name="Без слотов", is_active=True)
+    inactive = Topic(name="Выключена", is_active=False)
+    db.add_all([idle, inactive])
+    db.commit()
+    _slots(db, topic, [1, 11, 13])
+    _slots(db, inactive, [1])
+
+    plan = DemandPlanner(db).plan(now=NOW)
+
+    assert set(plan) == {topic.id, idle.id}
+    assert plan[topic.id]["target"] == 4
+    assert plan[idle.id] == {"target": 0, "ready": 0, "collect": 0, "download": 0, "process": 0}
@@ -0,0 +1,83 @@
+"""Захват наступивших слотов публикации (PublicationScheduler.claim_due_slots)."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.models import PublicationSlot, Topic
+from modules.scheduler.scheduler import PublicationScheduler, slot_claim_seconds
+
+NOW = datetime(2024, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def topics(db):
+    topics = [Topic(name=f"Тематика {i}", is_active=True) for i in range(2)]
+    db.add_all(topics)
+    db.commit()
+    return topics
+
+
+def _slot(db, topic, minutes_ago, state="pending", claimed_at=None):
+    slot = PublicationSlot(
+        topic_id=topic.id, slot_time=NOW - timedelta(minutes=minutes_ago), state=state, claimed_at=claimed_at
+    )
+    db.add(slot)
+    db.commit()
+    return slot.id
+
+
+def _states(db):
+    db.expire_all()
+    return {slot.id: slot.state for slot in db.query(PublicationSlot)}
+
+
+def test_claims_due_slots_earliest_first(db, topics):
+    later = _slot(db, topics[0], 1)
+    earlier = _slot(db, topics[1], 5)
+    future = _slot(db, topics[0], -5)
+    scheduler = PublicationScheduler(db)
+
+    assert [s.id for s in scheduler.claim_due_slots(now=NOW, limit=1)] == [earlier]
+    assert [s.id for s in scheduler.claim_due_slots(now=NOW, limit=1)] == [later]
+    assert scheduler.claim_due_slots(now=NOW) == []
+    assert _states(db) == {later: "claimed", earlier: "claimed", future: "pending"}
+
+
+def test_claim_skips_excluded_topics(db, topics):
+    busy = _slot(db, topics[0], 5)
+    free = _slot(db, topics[1], 1)
+
+    claimed = PublicationScheduler(db).claim_due_slots(now=NOW, limit=1, exclude_topics=[topics[0].id])
+
+    assert [s.id for s in claimed] == [free]
+    assert _states(db)[busy] == "pending"
+
+
+def test_overdue_slots_are_missed(db, topics, settings, monkeypatch):
+    monkeypatch.setattr(settings, "SLOT_GRACE_MINUTES", 30, raising=False)
+    missed = _slot(db, topics[0], 31)
+    due = _slot(db, topics[0], 29)
+
+    claimed = PublicationScheduler(db).claim_due_slots(now=NOW)
+
+    assert [s.id for s in claimed] == [due]
+    assert _states(db)[missed] == "missed"
+
+
+def test_abandoned_claims_are_reclaimed(db, topics):
+    timeout = timedelta(seconds=slot_claim_seconds())
+    abandoned = _slot(db, topics[0], 1, state="claimed", claimed_at=NOW - timeout - timedelta(seconds=1))
+    active = _slot(db, topics[1], 1, state="claimed", claimed_at=NOW - timeout + timedelta(seconds=1))
+
+    claimed = PublicationScheduler(db).claim_due_slots(now=NOW)
+
+    assert [s.id for s in claimed] == [abandoned]
+    assert claimed[0].claimed_at == NOW
+    assert _states(db)[active] == "claimed"
+
+
+def test_abandon_window_outlives_publish_lock(settings, monkeypatch):
+    from modules.scheduler.scheduler import PUBLISH_LOCK_SECONDS
+
+    monkeypatch.setattr(settings, "SLOT_CLAIM_SECONDS", 60, raising=False)
+    assert slot_claim_seconds() == 2 * PUBLISH_LOCK_SECONDS